@@ -0,0 +1,63 @@
+"""Benchmark of the dependency analysis against the algorithm it replaced
+
+Usage: python benchmarks/dependencies.py [export.vql]
+
+Without a file a generated export with 600 views is analysed.
+The baseline algorithm is the one kept in tests/test_dependencies.py,
+the dependencies and dependees found by both are checked to be the same.
+"""
+import sys
+import logging
+from pathlib import Path
+from timeit import repeat
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / 'tests'))
+import vqlmanager.__main__ as vql  # noqa: E402
+from test_dependencies import generated_export, load, baseline_dependencies, dependency_names  # noqa: E402
+
+
+def clear(root_item: vql.RootItem):
+    """Clears the dependencies and dependees found
+
+    :param root_item: the root item
+    :return: None
+    """
+    for code_item in root_item.get_code_items():
+        code_item.base_data.dependencies = list()
+        code_item.base_data.dependees = list()
+
+
+def main(args: list)->int:
+    """Runs the benchmark
+
+    :param args: the command line arguments
+    :return: exit code
+    """
+    if len(args) == 1:
+        export = vql.read_export(Path(args[0]), logging.getLogger(vql.APPLICATION_NAME))
+    elif not args:
+        export = generated_export(600)
+    else:
+        print(__doc__)
+        return 2
+    root_item = load(export)
+    print(f"{len(export)} characters, {len(list(root_item.get_code_items()))} objects")
+    bar = vql.HeadlessStatusBar()
+    runs = {'get_dependencies': lambda: root_item.get_dependencies(vql.GUI_SELECT, bar),
+            'baseline': lambda: baseline_dependencies(root_item, vql.GUI_SELECT)}
+    results = list()
+    for name, run in runs.items():
+        def timed():
+            clear(root_item)
+            run()
+        best = min(repeat(timed, number=1, repeat=3))
+        results.append(dependency_names(root_item))
+        print(f"{name:20} {best * 1000:10.1f} ms")
+    assert results[0] == results[1], 'the dependencies found differ'
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""Benchmark of FastDiffMatchPatch against DiffMatchPatch
+
+Usage: python benchmarks/diff_engine.py [export.vql changed_export.vql]
+
+Without files a generated export and an edited copy are compared.
+The results of both engines are checked to be the same.
+"""
+import sys
+import random
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import vqlmanager.__main__ as vql  # noqa: E402
+
+
+def generated_exports(views: int, seed: int=0)->tuple:
+    """Returns a generated export and a copy with some lines changed
+
+    :param views: the number of views
+    :param seed: the seed of the random generator
+    :return: tuple of both exports
+    """
+    generator = random.Random(seed)
+    export = ''
+    for number in range(views):
+        columns = ',\n'.join(f"        col_{generator.randrange(40)} AS column_{i}"
+                             for i in range(generator.randrange(3, 30)))
+        export += (f"CREATE OR REPLACE VIEW v{number} FOLDER = '/views/f{number % 5}'\n"
+                   f"    AS SELECT\n{columns}\n    FROM bv{generator.randrange(10)}\n"
+                   f"    WHERE col_{generator.randrange(40)} > {generator.randrange(100)};\n\n")
+    lines = export.split('\n')
+    for _ in range(views // 10 + 1):
+        i = generator.randrange(len(lines))
+        lines[i] = lines[i].replace('col_', 'column_', 1) + ' -- changed'
+    return export, '\n'.join(lines)
+
+
+def bench(text1: str, text2: str, check_lines: bool, number: int=3)->None:
+    """Prints the best time of both engines on the texts
+
+    :param text1: the old text
+    :param text2: the new text
+    :param check_lines: run a line level diff first
+    :param number: the number of runs
+    :return: None
+    """
+    engines = {'DiffMatchPatch': vql.DiffMatchPatch(), 'FastDiffMatchPatch': vql.FastDiffMatchPatch()}
+    results = []
+    for name, engine in engines.items():
+        engine.diff_timeout = 0
+        results.append(engine.diff_main(text1, text2, check_lines))
+        best = min(repeat(lambda: engine.diff_main(text1, text2, check_lines), number=1, repeat=number))
+        print(f"{name:20} check_lines={check_lines!s:5} {best * 1000:10.1f} ms")
+    assert results[0] == results[1], 'the engines give different results'
+
+
+def main(args: list)->int:
+    """Runs the benchmark
+
+    :param args: the command line arguments
+    :return: exit code
+    """
+    if len(args) == 2:
+        text1, text2 = (Path(arg).read_text() for arg in args)
+    elif not args:
+        text1, text2 = generated_exports(300)
+    else:
+        print(__doc__)
+        return 2
+    print(f"{len(text1)} and {len(text2)} characters")
+    for check_lines in (True, False):
+        bench(text1, text2, check_lines)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
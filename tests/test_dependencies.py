@@ -0,0 +1,144 @@
+"""Equivalence test of RootItem.get_dependencies against the algorithm it replaced"""
+import random
+import logging
+
+import vqlmanager.__main__ as vql
+
+
+def generated_export(views: int, seed: int=0)->str:
+    """Returns a generated export with datasources, wrappers, base views and views referring to each other.
+    The names are in mixed case and the references in other cases, as Denodo names are case insensitive.
+
+    :param views: the number of views
+    :param seed: the seed of the random generator
+    :return: the export
+    """
+    generator = random.Random(seed)
+    sources = max(views // 20, 1)
+    base_views = max(views // 4, 1)
+
+    def case(name: str)->str:
+        """Returns the name in a random case
+
+        :param name: the name
+        :return: the name in upper, lower or the same case
+        """
+        return generator.choice((name, name.lower(), name.upper()))
+
+    export = vql.PROP_QUOTE + vql.Chapter.make_header('DATASOURCES')
+    for i in range(sources):
+        export += f"CREATE OR REPLACE DATASOURCE JDBC Ds_Source{i}\n    DRIVERCLASSNAME = 'org.Driver';\n\n"
+    export += vql.Chapter.make_header('WRAPPERS')
+    for i in range(sources):
+        export += (f"CREATE OR REPLACE WRAPPER JDBC W_Wrapper{i}\n"
+                   f"    DATASOURCENAME={case(f'Ds_Source{i}')}\n    RELATIONNAME='t{i}';\n\n")
+    export += vql.Chapter.make_header('BASE VIEWS')
+    for i in range(base_views):
+        wrapper = case(f'W_Wrapper{generator.randrange(sources)}')
+        export += (f"CREATE OR REPLACE TABLE Bv_Table{i} I18N us_pst (\n    id:int\n)\n"
+                   f"    CACHE OFF\n    WRAPPER (jdbc {wrapper});\n\n")
+    export += vql.Chapter.make_header('VIEWS')
+    for i in range(views):
+        tables = [case(f'Bv_Table{generator.randrange(base_views)}')]
+        tables += [case(f'V_View{generator.randrange(i)}') for _ in range(generator.randrange(3)) if i]
+        parentheses = '(' * generator.randrange(4)
+        joins = ''.join(f"\n    INNER JOIN {'(' * generator.randrange(3)}{table} ON (a.id = b.id)"
+                        for table in tables[1:])
+        export += (f"CREATE OR REPLACE VIEW V_View{i} FOLDER = '/views' AS SELECT id\n"
+                   f"    FROM {parentheses}{tables[0]}{joins};\n\n")
+    return export
+
+
+def load(export: str)->vql.RootItem:
+    """Loads an export without gui, this runs get_dependencies
+
+    :param export: the export
+    :return: the root item
+    """
+    logger = logging.getLogger(vql.APPLICATION_NAME)
+    root_item = vql.RootItem('Selection Pane')
+    icons = dict.fromkeys(vql.CHAPTER_NAMES, vql.QVariant())
+    root_item.parse(export, vql.BASE_FILE, vql.HeadlessStatusBar(), icons, logger)
+    return root_item
+
+
+def unique_list(items: list)->list:
+    """Returns the unique items keeping their order
+
+    :param items: the items
+    :return: the unique items
+    """
+    new_list = list()
+    for item in items:
+        if item not in new_list:
+            new_list.append(item)
+    return new_list
+
+
+def baseline_dependencies(root_item: vql.RootItem, gui: int):
+    """The dependency analysis before the code and names were lower-cased once per analysis
+
+    :param root_item: the root item with the code loaded
+    :param gui: mode flag selector indicating what code is used
+    :return: None
+    """
+    place_holder = '%&*&__&*&%'
+    searches = list()
+    searches.append(('WRAPPERS', 'DATASOURCES', f"datasourcename={place_holder}"))
+    searches.append(('BASE VIEWS', 'WRAPPERS', f"wrapper (jdbc {place_holder})"))
+    searches.append(('BASE VIEWS', 'WRAPPERS', f"wrapper (df {place_holder})"))
+    searches.append(('BASE VIEWS', 'WRAPPERS', f"wrapper (ldap {place_holder})"))
+    for underlying_chapter_name in ('BASE VIEWS', 'VIEWS'):
+        for i in range(15):
+            parentheses = '(' * i
+            searches.append(('VIEWS', underlying_chapter_name, f"from {parentheses}{place_holder}"))
+            searches.append(('VIEWS', underlying_chapter_name, f"join {parentheses}{place_holder}"))
+        searches.append(('VIEWS', underlying_chapter_name, f"set implementation {place_holder}"))
+        searches.append(('VIEWS', underlying_chapter_name, f"datamovementplan = {place_holder}"))
+
+    for chapter_name, underlying_chapter_name, search_template in searches:
+        chapter = vql.Chapter.get_chapter_by_name(root_item.chapters, chapter_name)
+        underlying_chapter = vql.Chapter.get_chapter_by_name(root_item.chapters, underlying_chapter_name)
+        underlying = [(other, other.name.lower()) for other in root_item.get_code_items(chapter=underlying_chapter)]
+        for code_item in root_item.get_code_items(chapter=chapter):
+            code = code_item.get_context_data(gui).code.lower()
+            for other_code_item, other_name in underlying:
+                if not code.find(search_template.replace(place_holder, other_name)) == -1:
+                    code_item.get_context_data(gui).dependencies.append(other_code_item)
+                    other_code_item.get_context_data(gui).dependees.append(code_item)
+
+    for code_item in root_item.get_code_items():
+        data = code_item.get_context_data(gui)
+        if code_item in data.dependencies:
+            data.dependencies.remove(code_item)
+        data.dependencies = unique_list(data.dependencies)
+        if code_item in data.dependees:
+            data.dependees.remove(code_item)
+        data.dependees = unique_list(data.dependees)
+        for item in [dependee for dependee in data.dependees if dependee in data.dependencies]:
+            data.dependees.remove(item)
+
+
+def dependency_names(root_item: vql.RootItem)->dict:
+    """Returns the names of the dependencies and dependees per code item
+
+    :param root_item: the root item
+    :return: dict with the name of a code item and tuple with lists of names
+    """
+    return {(code_item.chapter.name, code_item.name): ([item.name for item in code_item.base_data.dependencies],
+                                                       [item.name for item in code_item.base_data.dependees])
+            for code_item in root_item.get_code_items()}
+
+
+def test_get_dependencies_equals_baseline():
+    root_item = load(generated_export(200))
+    found = dependency_names(root_item)
+    for code_item in root_item.get_code_items():
+        code_item.base_data.dependencies = list()
+        code_item.base_data.dependees = list()
+    baseline_dependencies(root_item, vql.GUI_SELECT)
+    assert dependency_names(root_item) == found
+    # the generated references are found, in all chapters
+    assert all(found[('WRAPPERS', f'W_Wrapper{i}')][0] == [f'Ds_Source{i}'] for i in range(10))
+    assert all(found[('VIEWS', f'V_View{i}')][0] for i in range(200))
+    assert any(found[('VIEWS', f'V_View{i}')][1] for i in range(200))
@@ -0,0 +1,43 @@
+"""Tests for the node limit of the lazily fetched dependee tree"""
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtWidgets import QApplication, QTreeView
+
+import vqlmanager.__main__ as vql
+from test_dependencies import generated_export, load
+
+app = QApplication.instance() or QApplication([])
+
+
+def fetch_all(model: vql.DependencyModel, parent: QModelIndex=QModelIndex()):
+    """Expands the whole tree step by step, the way the tree view does
+
+    :param model: the model
+    :param parent: the index of the item to expand
+    :return: None
+    """
+    if model.canFetchMore(parent):
+        model.fetchMore(parent)
+    for row in range(model.rowCount(parent)):
+        fetch_all(model, model.index(row, 0, parent))
+
+
+def test_fetch_more_respects_the_node_limit(monkeypatch):
+    root_item = load(generated_export(200))
+    view = QTreeView()
+    model = vql.DependencyModel(view, 'Dependencies Pane')
+    data_source = max(root_item.get_code_items(), key=lambda code_item: len(code_item.base_data.dependees))
+
+    model.set_root_code_item(data_source)
+    fetch_all(model)
+    unlimited = model.node_count
+
+    monkeypatch.setattr(vql, 'DEPENDEE_PREFETCH_DEPTH', 1)
+    monkeypatch.setattr(vql, 'DEPENDEE_MAX_NODES', unlimited // 3)
+    model.set_root_code_item(data_source)
+    fetch_all(model)
+    assert unlimited // 3 > len(data_source.base_data.dependees)
+    assert model.node_count == unlimited // 3
@@ -0,0 +1,137 @@
+"""Equivalence tests of FastDiffMatchPatch against the DiffMatchPatch it optimizes"""
+import random
+
+import pytest
+
+import vqlmanager.__main__ as vql
+
+reference = vql.DiffMatchPatch()
+reference.diff_timeout = 0
+fast = vql.FastDiffMatchPatch()
+fast.diff_timeout = 0
+
+
+def random_text(generator: random.Random, length: int, alphabet: str='ab\n')->str:
+    """Returns a random text of a small alphabet, so the texts have much in common
+
+    :param generator: the random generator
+    :param length: the length
+    :param alphabet: the characters used
+    :return: the text
+    """
+    return ''.join(generator.choice(alphabet) for _ in range(length))
+
+
+def vql_view(generator: random.Random, number: int)->str:
+    """Returns the code of a generated view, like in a Denodo export
+
+    :param generator: the random generator
+    :param number: the number of the view
+    :return: the code
+    """
+    columns = ',\n'.join(f"        col_{generator.randrange(40)} AS column_{i}"
+                         for i in range(generator.randrange(3, 30)))
+    joins = ''.join(f"\n    INNER JOIN v{generator.randrange(number + 1)} ON (a.id = b.id)"
+                    for _ in range(generator.randrange(3)))
+    return (f"CREATE OR REPLACE VIEW v{number} FOLDER = '/views/f{number % 5}'\n"
+            f"    AS SELECT\n{columns}\n    FROM bv{generator.randrange(10)}{joins}\n"
+            f"    WHERE col_{generator.randrange(40)} > {generator.randrange(100)};\n\n")
+
+
+def edit(generator: random.Random, code: str)->str:
+    """Returns the code with some lines changed, removed or added
+
+    :param generator: the random generator
+    :param code: the code
+    :return: the edited code
+    """
+    lines = code.split('\n')
+    for _ in range(generator.randrange(1, 6)):
+        i = generator.randrange(len(lines))
+        choice = generator.randrange(3)
+        if choice == 0:
+            lines[i] = lines[i].replace('col_', 'column_', 1) + ' -- changed'
+        elif choice == 1:
+            del lines[i]
+        else:
+            lines.insert(i, f"        col_{generator.randrange(40)} AS extra_{i},")
+        if not lines:
+            lines = ['']
+    return '\n'.join(lines)
+
+
+def text_pairs(seed: int, count: int):
+    """Yields random text pairs with a shared part in front or at the end
+
+    :param seed: the seed of the random generator
+    :param count: the number of pairs
+    :return: iterator over pairs of texts
+    """
+    generator = random.Random(seed)
+    for _ in range(count):
+        common = random_text(generator, generator.randrange(200))
+        text1 = random_text(generator, generator.randrange(50))
+        text2 = random_text(generator, generator.randrange(50))
+        if generator.randrange(2):
+            yield common + text1, common + text2
+        else:
+            yield text1 + common, text2 + common
+
+
+@pytest.mark.parametrize('text1, text2', [('', ''), ('', 'a'), ('abc', 'abc'), ('abc', 'abd'), ('abc', 'xbc'),
+                                           ('abc', 'abcdef'), ('a' * 1000 + 'b', 'a' * 1000 + 'c'),
+                                           ('x' + 'a' * 1000, 'y' + 'a' * 1000), ('\U0001F600a', '\U0001F600b')])
+def test_common_prefix_and_suffix_cases(text1, text2):
+    assert fast.diff_common_prefix(text1, text2) == reference.diff_common_prefix(text1, text2)
+    assert fast.diff_common_suffix(text1, text2) == reference.diff_common_suffix(text1, text2)
+    assert fast.diff_common_prefix(text2, text1) == reference.diff_common_prefix(text2, text1)
+    assert fast.diff_common_suffix(text2, text1) == reference.diff_common_suffix(text2, text1)
+
+
+def test_common_prefix_and_suffix_random():
+    for text1, text2 in text_pairs(1, 3000):
+        assert fast.diff_common_prefix(text1, text2) == reference.diff_common_prefix(text1, text2)
+        assert fast.diff_common_suffix(text1, text2) == reference.diff_common_suffix(text1, text2)
+
+
+def test_lines_to_chars():
+    generator = random.Random(2)
+    cases = [('', ''), ('a', ''), ('a\nb', 'a\nb\n'), ('\n\n', '\n'), ('a\nb\nc', 'c\nb\na\n')]
+    cases += [(random_text(generator, generator.randrange(300), 'ab\n\n'),
+               random_text(generator, generator.randrange(300), 'ab\n\n')) for _ in range(500)]
+    code = ''.join(vql_view(generator, i) for i in range(30))
+    cases.append((code, edit(generator, code)))
+    for text1, text2 in cases:
+        assert fast.diff_lines_to_chars(text1, text2) == reference.diff_lines_to_chars(text1, text2)
+
+
+def test_diff_main_random():
+    generator = random.Random(3)
+    for _ in range(500):
+        text1 = random_text(generator, generator.randrange(120))
+        text2 = random_text(generator, generator.randrange(120))
+        assert fast.diff_main(text1, text2, False) == reference.diff_main(text1, text2, False)
+    for text1, text2 in text_pairs(4, 300):
+        assert fast.diff_main(text1, text2, False) == reference.diff_main(text1, text2, False)
+
+
+@pytest.mark.parametrize('check_lines', [False, True])
+def test_diff_main_vql(check_lines):
+    generator = random.Random(5)
+    for number in range(60):
+        code = vql_view(generator, number)
+        changed = edit(generator, code)
+        assert fast.diff_main(code, changed, check_lines) == reference.diff_main(code, changed, check_lines)
+    export = ''.join(vql_view(generator, i) for i in range(80))
+    changed = edit(generator, export)
+    assert fast.diff_main(export, changed, check_lines) == reference.diff_main(export, changed, check_lines)
+
+
+def test_diff_bisect_long_snakes():
+    # long equal runs are followed in chunks, the chunk boundaries must not change the result
+    generator = random.Random(6)
+    for _ in range(200):
+        common = 'x' * generator.randrange(100)
+        text1 = random_text(generator, 10) + common + random_text(generator, 10)
+        text2 = random_text(generator, 10) + common + random_text(generator, 10)
+        assert fast.diff_bisect(text1, text2, vql.maxsize) == reference.diff_bisect(text1, text2, vql.maxsize)
@@ -0,0 +1,67 @@
+"""Tests for reading exports: memory mapped exports and the headless query on files that can not be read"""
+import sys
+import logging
+import subprocess
+from pathlib import Path
+
+import vqlmanager.__main__ as vql
+
+
+def make_export(views: int)->str:
+    """Returns a small Denodo export with views
+
+    :param views: the number of views
+    :return: the export
+    """
+    content = vql.PROP_QUOTE + vql.Chapter.make_header('VIEWS')
+    for i in range(views):
+        content += f"CREATE OR REPLACE VIEW v{i} FOLDER = '/c' AS SELECT col FROM v{i + 1};\n\n"
+    return content
+
+
+def load(file: Path)->vql.RootItem:
+    """Loads an export file without gui
+
+    :param file: the export file
+    :return: the root item
+    """
+    logger = logging.getLogger(vql.APPLICATION_NAME)
+    root_item = vql.RootItem('Selection Pane')
+    icons = dict.fromkeys(vql.CHAPTER_NAMES, vql.QVariant())
+    root_item.parse(vql.read_export(file, logger), vql.BASE_FILE, vql.HeadlessStatusBar(), icons, logger)
+    return root_item
+
+
+def test_mapped_export_equals_read_export(tmp_path, monkeypatch):
+    file = tmp_path / 'export.vql'
+    file.write_text(make_export(20))
+    read = [(code_item.name, code_item.base_data.code) for code_item in load(file).get_code_items()]
+    monkeypatch.setattr(vql, 'MAPPED_FILE_SIZE', 1)
+    root_item = load(file)
+    mapped = [(code_item.name, code_item.base_data.code) for code_item in root_item.get_code_items()]
+    assert all(code_item.base_data.export is not None for code_item in root_item.get_code_items())
+    assert mapped == read
+    assert len(mapped) == 20
+
+
+def test_mapped_export_survives_changes_of_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(vql, 'MAPPED_FILE_SIZE', 1)
+    file = tmp_path / 'export.vql'
+    file.write_text(make_export(200))
+    code_items = list(load(file).get_code_items())
+    codes = [code_item.base_data.code for code_item in code_items]
+    # truncating a mapped file would crash on the next read, changing it in place would change the code
+    file.write_text('')
+    assert [code_item.base_data.code for code_item in code_items] == codes
+    file.write_text(make_export(200).replace('SELECT', 'XXXXXX'))
+    assert [code_item.base_data.code for code_item in code_items] == codes
+
+
+def test_query_on_missing_file(tmp_path):
+    missing = tmp_path / 'missing.vql'
+    assert vql.run_query('name:x', missing) == 2
+    result = subprocess.run([sys.executable, '-m', 'vqlmanager', '--query', 'name:x', str(missing)],
+                            cwd=str(Path(vql.__file__).parent.parent), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 2
+    assert 'Could not read' in result.stderr
@@ -0,0 +1,69 @@
+"""Tests for the CodeHighlighter of the plain text code view"""
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import QApplication
+
+import vqlmanager.__main__ as vql
+
+app = QApplication.instance() or QApplication([])
+
+
+def highlight(text: str, object_name: str='', hunks: list=None)->list:
+    """Highlights a document and returns the formatted ranges of its first line
+
+    :param text: the text of the document
+    :param object_name: name of the object
+    :param hunks: the diff hunks
+    :return: list of tuples (start, length, color name)
+    """
+    document = QTextDocument()
+    highlighter = vql.CodeHighlighter(document)
+    highlighter.set_content(object_name, hunks or list())
+    document.setPlainText(text)
+    highlighter.visible = set(range(document.blockCount()))
+    highlighter.rehighlight()
+    return [(part.start, part.length, part.format.foreground().color().name())
+            for part in document.firstBlock().layout().formats()]
+
+
+def test_utf16_length():
+    assert vql.utf16_length('abc') == 3
+    assert vql.utf16_length('a\U0001F600b') == 4
+    assert vql.utf16_offsets('abc') is None
+    assert vql.utf16_offsets('a\U0001F600b') == [0, 1, 3, 4]
+
+
+def test_hunks_after_emoji():
+    diffs = [(0, "-- \U0001F600 note\nSELECT "), (1, 'new'), (-1, 'old'), (0, ' FROM t')]
+    hunks = list()
+    position = 0
+    for operation, text in diffs:
+        length = vql.utf16_length(text)
+        if operation:
+            hunks.append((position, position + length, operation))
+        position += length
+    document = QTextDocument()
+    highlighter = vql.CodeHighlighter(document)
+    highlighter.set_content('', hunks)
+    document.setPlainText(''.join(text for _, text in diffs))
+    highlighter.visible = set(range(document.blockCount()))
+    highlighter.rehighlight()
+    second_line = document.firstBlock().next()
+    formats = [(part.start, part.length) for part in second_line.layout().formats()]
+    # SELECT is followed by the inserted 'new' and the deleted 'old'
+    assert formats == [(7, 3), (10, 3)]
+
+
+def test_words_after_emoji():
+    formats = highlight("SELECT '\U0001F600' AS v FROM t", object_name='t')
+    purple = vql.QColor(vql.purple).name()
+    red = vql.QColor(vql.red).name()
+    blue = vql.QColor(vql.blue).name()
+    # the string takes four UTF-16 code units: two quotes and the emoji
+    assert (7, 4, blue) in formats
+    assert (12, 2, purple) in formats
+    assert (17, 4, purple) in formats
+    assert (22, 1, red) in formats
@@ -0,0 +1,37 @@
+"""Tests for the CodeNormalizer used to compare code ignoring formatting"""
+import vqlmanager.__main__ as vql
+
+normalizer = vql.CodeNormalizer(enabled=True)
+
+
+def test_normalizer_is_disabled_by_default():
+    assert not vql.CodeNormalizer().enabled
+    assert not vql.code_normalizer.enabled
+
+
+def test_formatting_is_ignored():
+    code = "CREATE OR REPLACE VIEW v FOLDER = '/a' AS SELECT a, b FROM t WHERE a > 0;"
+    formatted = "create or replace view v folder = '/a'\n    AS SELECT a ,  b\n    FROM t\n    WHERE a>0 ;"
+    assert normalizer.fingerprint(code) == normalizer.fingerprint(formatted)
+
+
+def test_properties_are_sorted():
+    code = "CREATE OR REPLACE WRAPPER JDBC w\n    DATASOURCENAME=ds\n    RELATIONNAME='t';"
+    reordered = "CREATE OR REPLACE WRAPPER JDBC w\n    RELATIONNAME='t'\n    DATASOURCENAME=ds;"
+    assert normalizer.fingerprint(code) == normalizer.fingerprint(reordered)
+
+
+def test_literals_are_kept():
+    assert normalizer.normalize("SELECT 'a  b' FROM t") != normalizer.normalize("SELECT 'a b' FROM t")
+
+
+def test_line_comment_keeps_its_line_break():
+    filtered = "CREATE OR REPLACE VIEW v AS SELECT a FROM t\n-- WHERE id > 5\nWHERE id > 0;"
+    unfiltered = "CREATE OR REPLACE VIEW v AS SELECT a FROM t\n-- WHERE id > 5 WHERE id > 0;"
+    assert normalizer.fingerprint(filtered) != normalizer.fingerprint(unfiltered)
+    assert normalizer.fingerprint(filtered) == normalizer.fingerprint(filtered.replace('\n', '\n    '))
+
+
+def test_comments_are_kept():
+    assert normalizer.normalize("SELECT a /* x */ FROM t") != normalizer.normalize("SELECT a /* y */ FROM t")
+    assert normalizer.normalize("SELECT a -- x\nFROM t") != normalizer.normalize("SELECT a -- y\nFROM t")
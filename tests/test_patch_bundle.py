@@ -0,0 +1,72 @@
+"""Tests for applying patch bundles to code that changed after the bundle was made"""
+from io import StringIO
+
+import vqlmanager.__main__ as vql
+
+ORIGINAL = "CREATE OR REPLACE VIEW v1 FOLDER = '/c' AS SELECT col FROM v2;\n\n"
+EDITED = "CREATE OR REPLACE VIEW v1 FOLDER = '/c' AS SELECT col, other FROM v2;\n\n"
+ADDED = "CREATE OR REPLACE VIEW v1 FOLDER = '/c' AS SELECT new FROM v3;\n\n"
+
+
+def apply_to_export(bundle: vql.PatchBundle, code: str)->tuple:
+    """Applies a bundle to an export with a single view
+
+    :param bundle: the bundle
+    :param code: the code of the view
+    :return: tuple of the new export and the results
+    """
+    export = vql.PROP_QUOTE + vql.Chapter.make_header('VIEWS') + code
+    out = StringIO()
+    results = bundle.apply_to_file(StringIO(export).readlines(), out.write)
+    return out.getvalue(), results
+
+
+def remove_entry()->dict:
+    """Returns the bundle entry removing the original view
+
+    :return: the entry
+    """
+    return {'chapter': 'VIEWS', 'name': 'v1', 'op': 'remove', 'source': vql.content_fingerprint(ORIGINAL.strip())}
+
+
+def test_remove_unchanged_object():
+    export, results = apply_to_export(vql.PatchBundle([remove_entry()]), ORIGINAL)
+    assert results['removed'] == ['v1']
+    assert 'VIEW v1' not in export
+
+
+def test_remove_changed_object_is_a_conflict():
+    export, results = apply_to_export(vql.PatchBundle([remove_entry()]), EDITED)
+    assert results['failed'] == ['v1']
+    assert results['removed'] == []
+    assert EDITED in export
+
+
+def test_add_existing_object():
+    bundle = vql.PatchBundle([{'chapter': 'VIEWS', 'name': 'v1', 'op': 'add', 'code': ORIGINAL}])
+    export, results = apply_to_export(bundle, ORIGINAL)
+    assert results['unchanged'] == ['v1']
+    assert ORIGINAL in export
+
+
+def test_add_existing_object_with_other_code_is_a_conflict():
+    bundle = vql.PatchBundle([{'chapter': 'VIEWS', 'name': 'v1', 'op': 'add', 'code': ADDED}])
+    export, results = apply_to_export(bundle, EDITED)
+    assert results['failed'] == ['v1']
+    assert results['patched'] == []
+    assert EDITED in export and ADDED not in export
+
+
+def test_conflicts_in_repository(tmp_path):
+    folder = tmp_path / 'VIEWS'
+    folder.mkdir()
+    (folder / 'v1.vql').write_text(EDITED)
+    (folder / 'v2.vql').write_text(EDITED.replace('v1', 'v2'))
+    (folder / vql.LOG_FILE_NAME).write_text(f"{folder / 'v1.vql'}\n{folder / 'v2.vql'}")
+    bundle = vql.PatchBundle([remove_entry(),
+                              {'chapter': 'VIEWS', 'name': 'v2', 'op': 'add', 'code': ADDED.replace('v1', 'v2')}])
+    results = bundle.apply_to_repository(tmp_path)
+    assert sorted(results['failed']) == ['v1', 'v2']
+    assert (folder / 'v1.vql').read_text() == EDITED
+    assert (folder / 'v2.vql').read_text() == EDITED.replace('v1', 'v2')
+    assert len((folder / vql.LOG_FILE_NAME).read_text().split('\n')) == 2
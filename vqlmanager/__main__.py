@@ -55,24 +55,45 @@ limitations under the License.
 __author__ = 'andretreebus@hotmail.com (Andre Treebus)'
 
 # standard library
-from sys import exit, argv, version_info, maxsize
+from sys import exit, argv, version_info, maxsize, stderr
 from pathlib import Path
-from typing import Iterator, List, Union, Sized, Tuple, Iterable
+from os import cpu_count
+from typing import Iterator, List, Union, Sized, Tuple, Iterable, Callable
+from collections import OrderedDict, Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 from functools import partial
-from re import escape, match, compile, sub
+from hashlib import blake2b
+from bisect import bisect_left
+from itertools import chain
+from fnmatch import fnmatchcase
+from operator import lt, le, eq, ge, gt
+from argparse import ArgumentParser
+from re import escape, match, compile, sub, IGNORECASE, DOTALL, error as RegexError
 from time import time
 from urllib.parse import quote, unquote
+from io import StringIO
+from tempfile import TemporaryFile
+from shutil import copyfileobj
+from mmap import mmap, ACCESS_READ
+from locale import getpreferredencoding
 import logging
+import json
+import csv
+import gzip
 
 # other libs
 from PyQt5.QtCore import Qt, QObject, QSize, QRect, QFileInfo, QVariant, QSettings
 from PyQt5.QtCore import QModelIndex, QSortFilterProxyModel, QAbstractItemModel
-from PyQt5.QtCore import QStateMachine, QSignalTransition, QState, pyqtSignal
+from PyQt5.QtCore import QStateMachine, QSignalTransition, QState, pyqtSignal, QThread, QTimer, QPoint
 from PyQt5.QtGui import QIcon, QBrush, QColor, QFont, QPixmap, QTextOption
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QTextCursor
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QTreeView, QPushButton, QLineEdit
 from PyQt5.QtWidgets import QMenu, QLabel, QAbstractItemView, QSplitter, QVBoxLayout, QHeaderView
 from PyQt5.QtWidgets import QGridLayout, QHBoxLayout, QRadioButton, QButtonGroup
 from PyQt5.QtWidgets import QTextEdit, QStatusBar, QAction, QFileDialog, QMessageBox, QPlainTextEdit
+from PyQt5.QtWidgets import QInputDialog, QStackedWidget, QListWidget, QListWidgetItem
 import qdarkstyle
 import sqlparse
 
@@ -146,6 +167,8 @@ class DiffMatchPatch:
     # Define some regex patterns for matching boundaries.
     BLANK_LINE_END = compile(r"\n\r?\n$")
     BLANK_LINE_START = compile(r"^\r?\n\r?\n")
+    # Tokens for the token granular patience diff: a word or a run of other characters, with trailing whitespace.
+    TOKEN = compile(r"\w+\s*|[^\w\s]+\s*|\s+")
 
     def __init__(self):
         """Initializes a diff_match_patch object with default settings.
@@ -169,6 +192,10 @@ class DiffMatchPatch:
         self.patch_delete_threshold = 0.5
         # Chunk size for context length.
         self.patch_margin = 4
+        # Patience diff: changed hunks up to this size (in characters) are refined character by character.
+        self.patience_refine_size = 4000
+        # Patience diff: texts with longer lines on average are diffed per token instead of per line.
+        self.patience_max_line_length = 200
 
         # The number of bits in an int.
         # Python has no maximum, thus to disable patch splitting set to 0.
@@ -459,6 +486,196 @@ class DiffMatchPatch:
 
         return diffs_prefix + diffs_postfix
 
+    def diff_patience(self, text1: str, text2: str, deadline: int=None)->list:
+        """Find the differences between two texts with the Patience algorithm on lines or tokens.
+          Lines (or tokens) that are unique in both texts are matched as anchors via a longest increasing
+          subsequence, the parts between the anchors are handled the same way. Parts without unique lines fall back
+          to a line-level diff_main. Finally the changed hunks are refined character by character
+          if they are small enough. The cost is bounded by the number of lines, not the number of characters.
+
+        :param text1: Old string to be diffed.
+        :param text2: New string to be diffed.
+        :param deadline: Optional time when the diff should be complete by.
+        :return: Array of changes.
+        """
+        if deadline is None:
+            if self.diff_timeout <= 0:
+                deadline = maxsize
+            else:
+                deadline = time() + self.diff_timeout
+
+        lines = text1.count('\n') + text2.count('\n') + 2
+        if (len(text1) + len(text2)) / lines > self.patience_max_line_length:
+            chars1, chars2, line_array = self.diff_tokens_to_chars(text1, text2)
+        else:
+            chars1, chars2, line_array = self.diff_lines_to_chars(text1, text2)
+
+        # ranges to diff are tuples with 4 items, finished diffs tuples with 2; popped in text order
+        diffs = []
+        stack = [(0, len(chars1), 0, len(chars2))]
+        while stack:
+            entry = stack.pop()
+            if len(entry) == 2:
+                diffs.append(entry)
+                continue
+            start1, end1, start2, end2 = entry
+            parts = []
+            # common prefix and suffix
+            prefix = 0
+            while start1 + prefix < end1 and start2 + prefix < end2 and \
+                    chars1[start1 + prefix] == chars2[start2 + prefix]:
+                prefix += 1
+            suffix = 0
+            while start1 + prefix < end1 - suffix and start2 + prefix < end2 - suffix and \
+                    chars1[end1 - suffix - 1] == chars2[end2 - suffix - 1]:
+                suffix += 1
+            if prefix:
+                parts.append((self.DIFF_EQUAL, chars1[start1:start1 + prefix]))
+            start1 += prefix
+            start2 += prefix
+            end1 -= suffix
+            end2 -= suffix
+
+            if start1 == end1:
+                if start2 < end2:
+                    parts.append((self.DIFF_INSERT, chars2[start2:end2]))
+            elif start2 == end2:
+                parts.append((self.DIFF_DELETE, chars1[start1:end1]))
+            else:
+                anchors = self.diff_patience_anchors(chars1, chars2, start1, end1, start2, end2)
+                if anchors:
+                    for anchor1, anchor2 in anchors:
+                        parts.append((start1, anchor1, start2, anchor2))
+                        parts.append((self.DIFF_EQUAL, chars1[anchor1]))
+                        start1 = anchor1 + 1
+                        start2 = anchor2 + 1
+                    parts.append((start1, end1, start2, end2))
+                else:
+                    parts.extend(self.diff_main(chars1[start1:end1], chars2[start2:end2], False, deadline))
+
+            if suffix:
+                parts.append((self.DIFF_EQUAL, chars1[end1:end1 + suffix]))
+            stack.extend(reversed(parts))
+
+        self.diff_chars_to_lines(diffs, line_array)
+        self.diff_cleanup_merge(diffs)
+        self.diff_patience_refine(diffs, deadline)
+        return diffs
+
+    @staticmethod
+    def diff_patience_anchors(chars1: str, chars2: str, start1: int, end1: int, start2: int,
+                              end2: int)->List[Tuple[int, int]]:
+        """Find the anchors of the Patience algorithm: the longest increasing sequence of lines
+          that occur exactly once in both ranges.
+
+        :param chars1: Encoded old text.
+        :param chars2: Encoded new text.
+        :param start1: Start of the range in chars1.
+        :param end1: End of the range in chars1.
+        :param start2: Start of the range in chars2.
+        :param end2: End of the range in chars2.
+        :return: List of tuples with the positions of the anchors in chars1 and chars2.
+        """
+        def unique_positions(chars: str, start: int, end: int)->dict:
+            """Returns the position of every line that occurs once in a range, -1 for the other lines
+
+            :param chars: Encoded text.
+            :param start: Start of the range.
+            :param end: End of the range.
+            :return: dict with the lines as key and positions as value
+            """
+            positions = {}
+            for i in range(start, end):
+                char = chars[i]
+                positions[char] = -1 if char in positions else i
+            return positions
+
+        unique1 = unique_positions(chars1, start1, end1)
+        unique2 = unique_positions(chars2, start2, end2)
+        matches = []
+        for i in range(start1, end1):
+            char = chars1[i]
+            if unique1[char] == i and unique2.get(char, -1) != -1:
+                matches.append((i, unique2[char]))
+        if not matches:
+            return []
+
+        # patience sorting: pile tops hold the smallest end of an increasing sequence per length
+        tops = []
+        top_indices = []
+        previous = [-1] * len(matches)
+        for k, (_, position2) in enumerate(matches):
+            pile = bisect_left(tops, position2)
+            if pile == len(tops):
+                tops.append(position2)
+                top_indices.append(k)
+            else:
+                tops[pile] = position2
+                top_indices[pile] = k
+            previous[k] = top_indices[pile - 1] if pile else -1
+        anchors = []
+        k = top_indices[-1]
+        while k != -1:
+            anchors.append(matches[k])
+            k = previous[k]
+        anchors.reverse()
+        return anchors
+
+    def diff_patience_refine(self, diffs: list, deadline: int):
+        """Re-diff the replacement blocks of a line-level diff character by character,
+          as long as they are not too big and the deadline is not reached.
+
+        :param diffs: Array of diff tuples, modified in place.
+        :param deadline: Time when the diff should be complete by.
+        :return: None
+        """
+        pointer = 0
+        while pointer < len(diffs) - 1:
+            if diffs[pointer][0] == self.DIFF_DELETE and diffs[pointer + 1][0] == self.DIFF_INSERT:
+                text_delete = diffs[pointer][1]
+                text_insert = diffs[pointer + 1][1]
+                if len(text_delete) + len(text_insert) <= self.patience_refine_size and time() < deadline:
+                    refined = self.diff_main(text_delete, text_insert, False, deadline)
+                    self.diff_cleanup_semantic(refined)
+                    diffs[pointer:pointer + 2] = refined
+                    pointer += len(refined)
+                    continue
+            pointer += 1
+
+    @staticmethod
+    def diff_tokens_to_chars(text1: str, text2: str)->Tuple[str, str, list]:
+        """Split two texts into tokens, words or runs of other characters with their trailing whitespace.
+        Reduce the texts to a string of hashes where each Unicode character represents one token.
+        Used like diff_lines_to_chars for texts with very long lines.
+
+        :param text1: First string.
+        :param text2: Second string.
+        :return: Three element tuple, containing the encoded text1, the encoded text2 and
+          the array of unique strings.  The zeroth element of the array of unique
+          strings is intentionally blank.
+        """
+        token_array = ['']
+        token_hash = {}
+
+        def diff_tokens_to_chars_munge(text: str)->str:
+            """Reduce a text to a string of hashes, one character per token.
+            Modifies token_array and token_hash through being a closure.
+
+            :param text: String to encode.
+            :return: Encoded string.
+            """
+            chars = []
+            for token in DiffMatchPatch.TOKEN.findall(text):
+                if token not in token_hash:
+                    token_array.append(token)
+                    token_hash[token] = len(token_array) - 1
+                chars.append(chr(token_hash[token]))
+            return ''.join(chars)
+
+        chars1 = diff_tokens_to_chars_munge(text1)
+        chars2 = diff_tokens_to_chars_munge(text2)
+        return chars1, chars2, token_array
+
     @staticmethod
     def diff_lines_to_chars(text1: str, text2: str)->Tuple[str, str, list]:
         """Split two texts into an array of strings.  Reduce the texts to a string
@@ -1808,12 +2025,244 @@ class DiffMatchPatch:
         return patches
 
 
-diff_engine = DiffMatchPatch()
+class FastDiffMatchPatch(DiffMatchPatch):
+    """DiffMatchPatch with faster implementations of its hot spots. The api and the results are the same.
+
+    - diff_bisect follows long diagonals in chunks of SNAKE_CHUNK characters
+      and checks the deadline once every DEADLINE_CHECK_STEPS steps
+    - diff_common_prefix and diff_common_suffix compare in place with startswith/endswith,
+      in growing chunks, instead of slicing both strings in a binary search
+    - diff_lines_to_chars splits the texts in one go instead of searching every line end
+
+    Equal lines are not pruned up front: diff_main already trims the common prefix and suffix,
+    which holds the equal lines at the start and the end, and dropping equal lines in the middle
+    changes where the diffs are placed, so the results would no longer be the same as DiffMatchPatch.
+    """
+
+    DEADLINE_CHECK_STEPS = 16
+    SNAKE_CHUNK = 16
+
+    def diff_bisect(self, text1: str, text2: str, deadline: int)->list:
+        """Find the 'middle snake' of a diff, split the problem in two
+          and return the recursively constructed diff.
+          See Myers 1986 paper: An O(ND) Difference Algorithm and Its Variations.
+
+        :param text1: Old string to be diffed.
+        :param text2: New string to be diffed.
+        :param deadline: Time at which to bail if not yet complete.
+        :return: Array of diff tuples.
+        """
+        text1_length = len(text1)
+        text2_length = len(text2)
+        max_d = (text1_length + text2_length + 1) // 2
+        v_offset = max_d
+        v_length = 2 * max_d
+        v1 = [-1] * v_length
+        v1[v_offset + 1] = 0
+        v2 = v1[:]
+        delta = text1_length - text2_length
+        # If the total number of characters is odd, then the front path will
+        # collide with the reverse path.
+        front = (delta % 2 != 0)
+        k1start = 0
+        k1end = 0
+        k2start = 0
+        k2end = 0
+        check_steps = self.DEADLINE_CHECK_STEPS
+        chunk = self.SNAKE_CHUNK
+        for d in range(max_d):
+            # Bail out if deadline is reached.
+            if not d % check_steps and time() > deadline:
+                break
+
+            # Walk the front path one step.
+            for k1 in range(-d + k1start, d + 1 - k1end, 2):
+                k1_offset = v_offset + k1
+                if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                    x1 = v1[k1_offset + 1]
+                else:
+                    x1 = v1[k1_offset - 1] + 1
+                y1 = x1 - k1
+                if x1 < text1_length and y1 < text2_length and text1[x1] == text2[y1]:
+                    # follow long diagonals in chunks, then character by character
+                    while x1 + chunk < text1_length and y1 + chunk < text2_length and \
+                            text1[x1:x1 + chunk] == text2[y1:y1 + chunk]:
+                        x1 += chunk
+                        y1 += chunk
+                    while x1 < text1_length and y1 < text2_length and text1[x1] == text2[y1]:
+                        x1 += 1
+                        y1 += 1
+                v1[k1_offset] = x1
+                if x1 > text1_length:
+                    k1end += 2
+                elif y1 > text2_length:
+                    k1start += 2
+                elif front:
+                    k2_offset = v_offset + delta - k1
+                    if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                        if x1 >= text1_length - v2[k2_offset]:
+                            # Overlap detected.
+                            return self.diff_bisect_split(text1, text2, x1, y1, deadline)
+
+            # Walk the reverse path one step.
+            for k2 in range(-d + k2start, d + 1 - k2end, 2):
+                k2_offset = v_offset + k2
+                if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                    x2 = v2[k2_offset + 1]
+                else:
+                    x2 = v2[k2_offset - 1] + 1
+                y2 = x2 - k2
+                if x2 < text1_length and y2 < text2_length and text1[-x2 - 1] == text2[-y2 - 1]:
+                    # follow long diagonals in chunks, then character by character
+                    while x2 + chunk < text1_length and y2 + chunk < text2_length and \
+                            text1[text1_length - x2 - chunk:text1_length - x2] == \
+                            text2[text2_length - y2 - chunk:text2_length - y2]:
+                        x2 += chunk
+                        y2 += chunk
+                    while x2 < text1_length and y2 < text2_length and text1[-x2 - 1] == text2[-y2 - 1]:
+                        x2 += 1
+                        y2 += 1
+                v2[k2_offset] = x2
+                if x2 > text1_length:
+                    k2end += 2
+                elif y2 > text2_length:
+                    k2start += 2
+                elif not front:
+                    k1_offset = v_offset + delta - k2
+                    if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                        x1 = v1[k1_offset]
+                        if x1 >= text1_length - x2:
+                            # Overlap detected.
+                            return self.diff_bisect_split(text1, text2, x1, v_offset + x1 - k1_offset, deadline)
+
+        # Diff took too long and hit the deadline or
+        # number of diffs equals number of characters, no commonality at all.
+        return [(self.DIFF_DELETE, text1), (self.DIFF_INSERT, text2)]
+
+    @staticmethod
+    def diff_common_prefix(text1: str, text2: str)->int:
+        """Determine the common prefix of two strings.
+
+        :param text1: First string.
+        :param text2: Second string.
+        :return:  The number of characters common to the start of each string.
+        """
+        if not text1 or not text2 or text1[0] != text2[0]:
+            return 0
+        if len(text1) > len(text2):
+            text1, text2 = text2, text1
+        if text2.startswith(text1):
+            return len(text1)
+
+        # gallop in growing chunks, only the chunk of text1 is copied
+        matched = 0
+        size = 64
+        while True:
+            end = min(len(text1), matched + size)
+            if not text2.startswith(text1[matched:end], matched):
+                break
+            matched = end
+            size *= 2
+
+        # the first difference is in text1[matched:end], binary search it
+        while end - matched > 1:
+            middle = (matched + end) // 2
+            if text2.startswith(text1[matched:middle], matched):
+                matched = middle
+            else:
+                end = middle
+        return matched
+
+    @staticmethod
+    def diff_common_suffix(text1: str, text2: str)->int:
+        """Determine the common suffix of two strings.
+
+        :param text1: First string.
+        :param text2: Second string.
+        :return: The number of characters common to the end of each string.
+        """
+        if not text1 or not text2 or text1[-1] != text2[-1]:
+            return 0
+        if len(text1) > len(text2):
+            text1, text2 = text2, text1
+        if text2.endswith(text1):
+            return len(text1)
+
+        # gallop in growing chunks from the end, only the chunk of text1 is copied
+        length1 = len(text1)
+        length2 = len(text2)
+        matched = 0
+        size = 64
+        while True:
+            end = min(length1, matched + size)
+            if not text2.endswith(text1[length1 - end:length1 - matched], 0, length2 - matched):
+                break
+            matched = end
+            size *= 2
+
+        # the first difference from the end is within the last chunk, binary search it
+        while end - matched > 1:
+            middle = (matched + end) // 2
+            if text2.endswith(text1[length1 - middle:length1 - matched], 0, length2 - matched):
+                matched = middle
+            else:
+                end = middle
+        return matched
+
+    @staticmethod
+    def diff_lines_to_chars(text1: str, text2: str)->Tuple[str, str, list]:
+        """Split two texts into an array of strings.  Reduce the texts to a string
+        of hashes where each Unicode character represents one line.
+
+        :param text1: First string.
+        :param text2: Second string.
+        :return: Three element tuple, containing the encoded text1, the encoded text2 and
+          the array of unique strings.  The zeroth element of the array of unique
+          strings is intentionally blank.
+        """
+        line_array = ['']
+        line_hash = {}
+
+        def diff_lines_to_chars_munge(text: str)->str:
+            """Reduce a text to a string of hashes, one character per line.
+            Modifies line_array and line_hash through being a closure.
+
+            :param text: String to encode.
+            :return: Encoded string.
+            """
+            lines = text.split('\n')
+            last = lines.pop()
+            chars = []
+            for line in lines:
+                line += '\n'
+                code = line_hash.get(line)
+                if code is None:
+                    line_array.append(line)
+                    code = line_hash[line] = len(line_array) - 1
+                chars.append(chr(code))
+            if last:
+                code = line_hash.get(last)
+                if code is None:
+                    line_array.append(last)
+                    code = line_hash[last] = len(line_array) - 1
+                chars.append(chr(code))
+            return ''.join(chars)
+
+        chars1 = diff_lines_to_chars_munge(text1)
+        chars2 = diff_lines_to_chars_munge(text2)
+        return chars1, chars2, line_array
+
+
+diff_engine = FastDiffMatchPatch()
 diff_engine.diff_timeout = 2
 diff_engine.match_threshold = 0.0
 diff_engine.patch_delete_threshold = 0.0
 diff_engine.match_max_bits = 0
 
+# the three-way merge applies patches to text that has shifted, this needs the default fuzzy matching
+merge_engine = FastDiffMatchPatch()
+merge_engine.diff_timeout = 2
+
 
 def error_message_box(title: str, text: str, error: str, parent=None):
     """General messagebox if an error happened.
@@ -1991,6 +2440,10 @@ red = "#ff4444"
 green = "#44ff44"
 yellow = "#ffff44"
 white = "#cccccc"
+orange = "#ffaa44"  # changed in both models of a three-way compare
+purple = "#b220e8"  # reserved words in the code view
+blue = "#66aaff"    # strings in the code view
+grey = "#888888"    # comments in the code view
 
 LOG_FILE_NAME = "part.log"
 
@@ -2025,6 +2478,7 @@ class ModelState(QObject):
     COMP_LOADED = 1 << 9      # indicate that the compare model is loaded
     BASE_UNLOAD = 1 << 10     # indicate that the base model must unload
     COMP_UNLOAD = 1 << 11     # indicate that the compare model is unload
+    ANCE_LOADED = 1 << 20     # indicate that a common ancestor is loaded for a three-way compare
 
 
 class SourceType(QObject):
@@ -2077,6 +2531,7 @@ BASE_LOADED = ModelState.BASE_LOADED
 COMP_LOADED = ModelState.COMP_LOADED
 BASE_UNLOAD = ModelState.BASE_UNLOAD
 COMP_UNLOAD = ModelState.COMP_UNLOAD
+ANCE_LOADED = ModelState.ANCE_LOADED
 
 
 FILE = SourceType.FILE
@@ -2113,6 +2568,66 @@ RECENT_FILES = "recent_file_list"
 RECENT_REPOSITORIES = "recent_repositories_list"
 MAX_RECENT_FILES = 8
 
+# limits of the dependency pane: levels created and expanded on a click, maximum depth and maximum number of nodes
+DEPENDEE_PREFETCH_DEPTH = 3
+DEPENDEE_MAX_DEPTH = 100
+DEPENDEE_MAX_NODES = 10000
+
+# number of computed code comparisons kept in memory, and of comparisons rendered as html
+DIFF_CACHE_SIZE = 100
+HTML_CACHE_SIZE = 200
+
+# above this combined code size (in characters) comparisons use the patience diff instead of the character diff
+PATIENCE_DIFF_SIZE = 20000
+# above this combined code size (in characters) comparisons are shown as highlighted plain text instead of html
+CODE_VIEWER_PLAIN_SIZE = 100000
+# number of diff hunks added to the plain text code view at a time
+CODE_VIEWER_CHUNK_SIZE = 500
+# the sql of views up to this size (in characters) is formatted at once, larger views in the background
+SQL_FORMAT_SYNC_SIZE = 2000
+# above this size the sql of views is only formatted on demand
+SQL_FORMAT_SIZE = 50000
+# number of formatted views kept in memory
+SQL_FORMAT_CACHE_SIZE = 500
+# maximum number of names shown by the search as you type, the typos allowed per this many characters sought,
+# the number of candidates checked for typos and the pause in typing (in ms) after which the search starts
+NAME_SEARCH_LIMIT = 100
+NAME_SEARCH_TYPO_LENGTH = 6
+NAME_SEARCH_FUZZY_CANDIDATES = 300
+NAME_SEARCH_DELAY = 150
+# above this size (in characters) of the code scanned for a regular expression of a query a process pool is used,
+# the code is handed to the processes in jobs of about this size, and the pause in typing (in ms) in the filter bar
+# after which the query is applied
+QUERY_POOL_SIZE = 8000000
+QUERY_JOB_SIZE = 1000000
+QUERY_DELAY = 300
+
+# exports of at least this size (in bytes) are copied to a private temporary file that is memory mapped,
+# the code items keep offsets in the file and their code is read from the file when it is used
+MAPPED_FILE_SIZE = 64000000
+
+# extra columns of the selection pane with difference statistics of changed items in compare mode
+DIFF_STATS_COLUMNS = ['Insertions', 'Deletions', 'Distance', 'Change']
+# below this number of changed items the statistics are computed without a process pool
+DIFF_STATS_POOL_THRESHOLD = 50
+# three-way merge status of a code item, given the base, compare and common ancestor code
+MERGE_SAME = 'unchanged'        # base and compare code are the same
+MERGE_BASE = 'base'             # only the base code changed, or was added
+MERGE_COMPARE = 'compare'       # only the compare code changed, or was added
+MERGE_DELETED = 'deleted'       # deleted in one model, unchanged in the other
+MERGE_BOTH = 'both'             # changed in both models, not yet merged
+MERGE_MERGED = 'merged'         # changed in both models, the changes merged without conflict
+MERGE_CONFLICT = 'conflict'     # changed in both models, the changes conflict
+# number of three-way merges of objects changed in both models kept in memory
+MERGE_CACHE_SIZE = 1000
+# identification of the patch bundle file format: a gzipped file with a json header line and a json line per object
+PATCH_BUNDLE_FORMAT = 'vqlmanager-patch-bundle'
+PATCH_BUNDLE_VERSION = 1
+# columns of the pair table of a batch compare
+BATCH_PAIR_FIELDS = ('base', 'compare', 'added', 'removed', 'changed', 'unchanged')
+COMPARE_REPORT_FIELDS = ('type', 'name', 'status', 'insertions', 'deletions', 'distance', 'whitespace_only',
+                         'case_only', 'base_fingerprint', 'compare_fingerprint')
+
 
 def show_role(role: int)->str:
     """Debug function printing the role info
@@ -2167,7 +2682,7 @@ def show_mode(mode: int)->str:
 
     model_states = {BASE_FILE: "BASE_FILE", BASE_REPO: "BASE_REPO", COMP_FILE: "COMP_FILE", COMP_REPO: "COMP_REPO",
                     BASE_LOADED: "BASE_LOADED", COMP_LOADED: "COMP_LOADED",
-                    BASE_UNLOAD: "BASE_UNLOAD", COMP_UNLOAD: "COMP_UNLOAD"}
+                    BASE_UNLOAD: "BASE_UNLOAD", COMP_UNLOAD: "COMP_UNLOAD", ANCE_LOADED: "ANCE_LOADED"}
 
     source_types = {FILE: "FILE", REPO: "REPO"}
 
@@ -2206,8 +2721,6 @@ def get_reserved_words()->Iterator[Sized]:
 
 
 HIGHLIGHTED_WORDS = get_reserved_words()
-SUBSTITUTIONS = list([(word, '<span><rword style="color:#b220e8;">' + str(word) + '</rword></span>')
-                      for word in HIGHLIGHTED_WORDS])
 
 
 def doc_template(object_name: str, body: str)->str:
@@ -2231,81 +2744,461 @@ def doc_template(object_name: str, body: str)->str:
     return doc
 
 
-about_text = """
-VQL Manager was created by Erasmus MC Rotterdam The Netherlands 2017.
-This application is open source software.
-Questions and remarks should be sent to: andretreebus@hotmail.com
-"""
+class DiffHtmlRenderer:
+    """Renders a comparison as html for the code edit widget, in a single pass over the text of every diff.
+    The pattern is compiled once, the html of special characters and of the operations is looked up in dicts.
+    Inserted text is green, deleted text red and striked out."""
+    __slots__ = ['tags']
 
+    SPECIAL = {'\n': '<br />\n', '    ': ' &nbsp; &nbsp; &nbsp; &nbsp; ', '&': '&amp;', '<': '&lt;', '>': '&gt;'}
+    PATTERN = compile(r"\n| {4}|[&<>]")
 
-def load_model_from_file(file: Path, new_mode: int, root_item, bar: QStatusBar, icons: dict, logger):
-    """Loads a single .vql file into the VqlModel instance.
+    def __init__(self):
+        """Initializer of the class"""
+        self.tags = {PatchObject.DIFF_INSERT: ('<ins style="color:' + green + ';">', '</ins>'),
+                     PatchObject.DIFF_DELETE: ('<del style="color:' + red + ';">', '</del>'),
+                     PatchObject.DIFF_EQUAL: ('<span>', '</span>')}
 
-    :param file: path of the file to bew loaded in
-    :type file: Path
-    :param new_mode: either BASE_FILE or COMP_FILE
-    :type new_mode: int
-    :param root_item: RootItem
-    :param bar: statusbar
-    :param icons: icons
-    :param logger: logger
-    :return: None
-    :rtype: None
-    """
-    content = read_file(file, logger)
-    if content:
-        root_item.parse(content, new_mode, bar, icons, logger)
+    def to_html(self, diffs: List[Tuple[int, str]])->str:
+        """Returns the body html of a comparison
 
+        :param diffs: the diff tuples (operation, text) of the comparison
+        :return: the html
+        """
+        special = self.SPECIAL
+        pattern = self.PATTERN
+        parts = list()
+        for operation, text in diffs:
+            start_tag, end_tag = self.tags[operation]
+            parts.append(start_tag + pattern.sub(lambda token: special[token.group()], text) + end_tag)
+        return ''.join(parts)
 
-def load_model_from_repository(folder: Path, new_mode: int, root_item, bar: QStatusBar, icons: dict, logger):
-    """Loads a repository folder structure into the VqlModel instance.
 
-    :param folder: the folder containing the repository
-    :type folder: Path
-    :param new_mode: flag indication BASE_REPO or COMP_REPO
-    :param root_item: the root
-    :param bar: statusbar
-    :param icons: icons
-    :param logger: logger
-    :return: None
-    :rtype: None
-    """
+diff_html_renderer = DiffHtmlRenderer()
 
-    existing_folders = {sub_folder for sub_folder in folder.iterdir()}
-    possible_folders = {folder / sub_folder for sub_folder in CHAPTER_NAMES}
-    matching_folders = existing_folders & possible_folders
-    if not matching_folders:
-        # noinspection PyArgumentList
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        message = "No repository found. Did not find any matching sub folders."
-        message_to_user(message)
-        return
 
-    msg = 'Make sure your repository is not corrupt.'
-    part_files = [folder / sub_folder / LOG_FILE_NAME
-                  for sub_folder in CHAPTER_NAMES if folder / sub_folder in matching_folders]
-    non_existing_part_files = [str(part_file) for part_file in part_files if not part_file.is_file()]
-    existing_part_files = [part_file for part_file in part_files if part_file.is_file()]
-    if non_existing_part_files:
-        missing = ', '.join(non_existing_part_files)
-        message_to_user(f"{LOG_FILE_NAME} file(s): {missing} not found. {msg}")
+class LruCache:
+    """Bounded mapping that discards the least recently used entry when it is full"""
+    __slots__ = ['max_size', 'entries']
 
-    all_code_files = list()
+    def __init__(self, max_size: int):
+        """Initializer of the class
 
-    for part_file in existing_part_files:
-        file_content = read_file(part_file, logger)
-        code_files = [Path(code_file) for code_file in file_content.split('\n')]
-        non_existing_code_files = [str(code_file) for code_file in code_files if not code_file.is_file()]
-        if non_existing_code_files:
-            missing = ', '.join(non_existing_code_files)
-            message_to_user(f"Code file(s): {missing} not found. {msg}")
-        existing_code_files = [(str(code_file.parent.name), code_file)
-                               for code_file in code_files if code_file.is_file()]
-        all_code_files.extend(existing_code_files)
+        :param max_size: the maximum number of entries
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
 
-    content = PROP_QUOTE
-    for chapter in root_item.chapters:
-        content += chapter.header
+    def get(self, key, default=None):
+        """Returns the value stored under key and marks it as recently used
+
+        :param key: the key
+        :param default: returned if the key is not present
+        :return: the value
+        """
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        """Stores a value under key, discarding the least recently used entry if needed
+
+        :param key: the key
+        :param value: the value
+        :return: None
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries
+
+        :return: None
+        """
+        self.entries.clear()
+
+    def __len__(self)->int:
+        """Returns the number of entries
+
+        :return: the number of entries
+        """
+        return len(self.entries)
+
+
+# the code comparisons shown in the code edit widget
+diff_cache = LruCache(DIFF_CACHE_SIZE)
+# the html of code comparisons, keyed by the fingerprints of both code versions
+html_cache = LruCache(HTML_CACHE_SIZE)
+# the three-way merges of objects changed in both models
+merge_cache = LruCache(MERGE_CACHE_SIZE)
+# the code of views with formatted sql, keyed by the fingerprint of the raw code
+sql_format_cache = LruCache(SQL_FORMAT_CACHE_SIZE)
+
+
+def compute_diff_stats(job: Tuple[int, str, str])->Tuple[int, Tuple[int, int, int, bool, bool]]:
+    """Computes the difference statistics of two code pieces.
+    This function runs in the worker processes of a process pool, so it only takes and returns plain data.
+
+    :param job: tuple with an index, the original code and the new code
+    :return: tuple with the index and a tuple with insertions and deletions in lines,
+        the Levenshtein distance in characters and the whitespace only and case only flags
+    """
+    index, code, compare_code = job
+    chars_code, chars_compare_code, _ = diff_engine.diff_lines_to_chars(code, compare_code)
+    insertions = 0
+    deletions = 0
+    # in line mode every character represents a line
+    for operation, text in diff_engine.diff_main(chars_code, chars_compare_code, False):
+        if operation == DiffMatchPatch.DIFF_INSERT:
+            insertions += len(text)
+        elif operation == DiffMatchPatch.DIFF_DELETE:
+            deletions += len(text)
+    distance = diff_engine.diff_levenshtein(diff_engine.diff_main(code, compare_code))
+    whitespace_only = ''.join(code.split()) == ''.join(compare_code.split())
+    case_only = not whitespace_only and code.lower() == compare_code.lower()
+    return index, (insertions, deletions, distance, whitespace_only, case_only)
+
+
+class DiffStats:
+    """Statistics of the difference between the original and the new code of a changed code item"""
+    __slots__ = ['insertions', 'deletions', 'distance', 'whitespace_only', 'case_only']
+
+    def __init__(self, stats: Tuple[int, int, int, bool, bool]):
+        """Initializer of the class
+
+        :param stats: tuple as computed by compute_diff_stats
+        """
+        self.insertions, self.deletions, self.distance, self.whitespace_only, self.case_only = stats
+
+    def change(self)->str:
+        """Returns a description of the kind of change
+
+        :return: 'whitespace', 'case' or '' for other changes
+        """
+        if self.whitespace_only:
+            return 'whitespace'
+        elif self.case_only:
+            return 'case'
+        return ''
+
+    def column_value(self, column: int)->Union[int, str]:
+        """Returns the value shown in one of the DIFF_STATS_COLUMNS
+
+        :param column: the index in DIFF_STATS_COLUMNS
+        :return: the value
+        """
+        return [self.insertions, self.deletions, self.distance, self.change()][column]
+
+
+class DiffStatsThread(QThread):
+    """Background thread computing the DiffStats of changed code items, with a process pool across cores.
+    Only plain data is handed to the thread, the results are applied to the code items in the gui thread."""
+
+    progress = pyqtSignal(int, int)  # number of items done, total number of items
+    stats_ready = pyqtSignal(list)  # list with tuples as returned by compute_diff_stats
+
+    def __init__(self, jobs: List[Tuple[int, str, str]], parent: QObject=None):
+        """Initializer of the class
+
+        :param jobs: list with tuples of an index, the original code and the new code
+        :param parent: the owner of the thread
+        """
+        super().__init__(parent)
+        self.jobs = jobs
+
+    def run(self):
+        """Computes the statistics, called by QThread.start in the new thread.
+        If no process pool can be used, the statistics are computed in this thread.
+
+        :return: None
+        """
+        total = len(self.jobs)
+        results = list()
+        if total >= DIFF_STATS_POOL_THRESHOLD:
+            try:
+                # spawned workers do not inherit the state of the gui process and its threads
+                with ProcessPoolExecutor(mp_context=get_context('spawn')) as pool:
+                    futures = [pool.submit(compute_diff_stats, job) for job in self.jobs]
+                    for future in as_completed(futures):
+                        if self.isInterruptionRequested():
+                            for pending in futures:
+                                pending.cancel()
+                            return
+                        results.append(future.result())
+                        self.progress.emit(len(results), total)
+            except (OSError, RuntimeError, BrokenProcessPool):
+                results = list()
+        if len(results) < total:
+            done = {i for i, _ in results}
+            for job in self.jobs:
+                if self.isInterruptionRequested():
+                    return
+                if job[0] not in done:
+                    results.append(compute_diff_stats(job))
+                    self.progress.emit(len(results), total)
+        self.stats_ready.emit(results)
+
+
+def format_sql(code: str)->str:
+    """Formats the sql in the code of View type CodeItems with sqlparse
+
+    :param code: the code to be formatted
+    :return: the formatted code
+    """
+    chars = 4
+    start = code.find(' AS SELECT ') + chars
+    end = code.find(';', start)
+    if chars <= start < end:
+        clause = sqlparse.format(code[start:end], reindent=True, indent_tabs=False, indent_width=2)
+        if clause:
+            return code[:start] + '\n' + clause + code[end:]
+
+    return code
+
+
+class SqlFormatThread(QThread):
+    """Background thread formatting the sql of one view with sqlparse, which is slow on wide views"""
+
+    formatted = pyqtSignal(str, str)  # fingerprint of the raw code, formatted code
+
+    def __init__(self, fingerprint: str, code: str, parent: QObject=None):
+        """Initializer of the class
+
+        :param fingerprint: the fingerprint of the code
+        :param code: the code to be formatted
+        :param parent: the owner of the thread
+        """
+        super().__init__(parent)
+        self.fingerprint = fingerprint
+        self.code = code
+
+    def run(self):
+        """Formats the code, called by QThread.start in the new thread.
+
+        :return: None
+        """
+        self.formatted.emit(self.fingerprint, format_sql(self.code))
+
+
+def content_fingerprint(code: str)->str:
+    """Returns a stable hash of the code as it is, used to compare, cache and deduplicate code
+
+    :param code: the code
+    :return: the hex digest
+    """
+    return blake2b(code.encode(), digest_size=16).hexdigest()
+
+
+class CodeNormalizer:
+    """Turns vql code in a canonical form, so code can be compared regardless of its formatting.
+    The pipeline:
+
+    - property assignments on consecutive lines (like FOLDER = '/a') are sorted by name
+    - optionally the code is formatted by sqlparse, upper casing keywords and stripping comments
+    - whitespace is collapsed, and removed around punctuation
+    - reserved words are upper cased
+
+    String literals, quoted identifiers and comments are kept as they are, a line comment keeps its line break.
+    """
+    __slots__ = ['enabled', 'use_sqlparse']
+
+    # a string literal or quoted identifier, a comment, whitespace, a word or a punctuation character
+    TOKEN = compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|(\s+)|(\w+)|(.)", DOTALL)
+    PROPERTY = compile(r"\s*(\w+)\s*=")
+    KEYWORDS = frozenset(word for words in HIGHLIGHTED_WORDS for word in words.split()) | frozenset(
+        ['FOLDER', 'DESCRIPTION', 'CACHE', 'TIMETOLIVEINCACHE', 'SEARCHMETHOD', 'CONSTRAINTS', 'OUTPUTLIST',
+         'I18N', 'JDBC', 'ODBC', 'BY', 'GROUP', 'ORDER', 'PRIMARY', 'KEY', 'FOREIGN', 'REFERENCES', 'TRACE',
+         'INTEGER', 'LONG', 'FLOAT', 'DOUBLE', 'TEXT', 'BOOLEAN', 'DATE', 'TIMESTAMP', 'DECIMAL', 'BLOB'])
+
+    def __init__(self, enabled: bool=False, use_sqlparse: bool=False):
+        """Initializer of the class
+
+        :param enabled: flag, if False code is compared as it is
+        :param use_sqlparse: flag, also normalize the code with sqlparse (slower)
+        """
+        self.enabled = enabled
+        self.use_sqlparse = use_sqlparse
+
+    def sort_properties(self, code: str)->str:
+        """Sorts runs of consecutive lines with a property assignment by property name.
+
+        :param code: the code
+        :return: the code with sorted properties
+        """
+        lines = code.split('\n')
+        result = list()
+        run = list()
+
+        def flush():
+            """Adds the current run of property lines to the result, sorted on the property name
+
+            :return: None
+            """
+            if len(run) > 1:
+                run.sort(key=lambda _line: self.PROPERTY.match(_line).group(1).upper())
+            result.extend(run)
+            run.clear()
+
+        for line in lines:
+            # multi line values have an odd number of quotes on the line; these are left where they are
+            if self.PROPERTY.match(line) and not line.count("'") % 2:
+                run.append(line)
+            else:
+                flush()
+                result.append(line)
+        flush()
+        return '\n'.join(result)
+
+    def normalize(self, code: str)->str:
+        """Returns the canonical form of the code
+
+        :param code: the code
+        :return: the normalized code
+        """
+        code = code.strip()
+        terminated = code.endswith(';')
+        if terminated:
+            # the terminator would otherwise move along with the last property
+            code = code[:-1]
+        code = self.sort_properties(code)
+        if self.use_sqlparse:
+            code = sqlparse.format(code, keyword_case='upper', strip_comments=True)
+        parts = list()
+        spaced = False
+        word_before = False
+        for literal, comment, space, word, other in self.TOKEN.findall(code):
+            if space:
+                spaced = True
+                continue
+            if comment:
+                if spaced and parts:
+                    parts.append(' ')
+                parts.append(comment.rstrip())
+                if comment.startswith('--'):
+                    # the comment ends at the line break, without it the next line would be commented out
+                    parts.append('\n')
+                word_before = False
+            elif literal or word:
+                # whitespace only separates two words or literals
+                if spaced and word_before:
+                    parts.append(' ')
+                upper = word.upper()
+                parts.append(literal or (upper if upper in self.KEYWORDS else word))
+                word_before = True
+            else:
+                parts.append(other)
+                word_before = False
+            spaced = False
+        if terminated:
+            parts.append(';')
+        return ''.join(parts)
+
+    def fingerprint(self, code: str)->str:
+        """Returns a hash of the normalized code
+
+        :param code: the code
+        :return: the hex digest
+        """
+        return content_fingerprint(self.normalize(code))
+
+    def is_equal(self, data: 'ItemData', other: 'ItemData')->bool:
+        """Compares the code of two ItemData objects, ignoring formatting if enabled
+
+        :param data: the one ItemData
+        :param other: the other ItemData
+        :return: True if the code is the same
+        """
+        if data.fingerprint == other.fingerprint:
+            return True
+        return self.enabled and data.get_normalized_fingerprint() == other.get_normalized_fingerprint()
+
+
+# the normalization used in comparisons
+code_normalizer = CodeNormalizer()
+
+about_text = """
+VQL Manager was created by Erasmus MC Rotterdam The Netherlands 2017.
+This application is open source software.
+Questions and remarks should be sent to: andretreebus@hotmail.com
+"""
+
+
+def load_model_from_file(file: Path, new_mode: int, root_item, bar: QStatusBar, icons: dict, logger):
+    """Loads a single .vql file into the VqlModel instance.
+
+    :param file: path of the file to bew loaded in
+    :type file: Path
+    :param new_mode: either BASE_FILE or COMP_FILE
+    :type new_mode: int
+    :param root_item: RootItem
+    :param bar: statusbar
+    :param icons: icons
+    :param logger: logger
+    :return: None
+    :rtype: None
+    """
+    try:
+        content = read_export(file, logger)
+    except (OSError, IOError, UnicodeDecodeError) as error:
+        msg = "An error occurred during reading of file: "
+        error_message_box("Error", msg + str(file), str(error))
+        return
+    if content:
+        root_item.parse(content, new_mode, bar, icons, logger)
+
+
+def load_model_from_repository(folder: Path, new_mode: int, root_item, bar: QStatusBar, icons: dict, logger):
+    """Loads a repository folder structure into the VqlModel instance.
+
+    :param folder: the folder containing the repository
+    :type folder: Path
+    :param new_mode: flag indication BASE_REPO or COMP_REPO
+    :param root_item: the root
+    :param bar: statusbar
+    :param icons: icons
+    :param logger: logger
+    :return: None
+    :rtype: None
+    """
+
+    existing_folders = {sub_folder for sub_folder in folder.iterdir()}
+    possible_folders = {folder / sub_folder for sub_folder in CHAPTER_NAMES}
+    matching_folders = existing_folders & possible_folders
+    if not matching_folders:
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        message = "No repository found. Did not find any matching sub folders."
+        message_to_user(message)
+        return
+
+    msg = 'Make sure your repository is not corrupt.'
+    part_files = [folder / sub_folder / LOG_FILE_NAME
+                  for sub_folder in CHAPTER_NAMES if folder / sub_folder in matching_folders]
+    non_existing_part_files = [str(part_file) for part_file in part_files if not part_file.is_file()]
+    existing_part_files = [part_file for part_file in part_files if part_file.is_file()]
+    if non_existing_part_files:
+        missing = ', '.join(non_existing_part_files)
+        message_to_user(f"{LOG_FILE_NAME} file(s): {missing} not found. {msg}")
+
+    all_code_files = list()
+
+    for part_file in existing_part_files:
+        file_content = read_file(part_file, logger)
+        code_files = [Path(code_file) for code_file in file_content.split('\n')]
+        non_existing_code_files = [str(code_file) for code_file in code_files if not code_file.is_file()]
+        if non_existing_code_files:
+            missing = ', '.join(non_existing_code_files)
+            message_to_user(f"Code file(s): {missing} not found. {msg}")
+        existing_code_files = [(str(code_file.parent.name), code_file)
+                               for code_file in code_files if code_file.is_file()]
+        all_code_files.extend(existing_code_files)
+
+    content = PROP_QUOTE
+    for chapter in root_item.chapters:
+        content += chapter.header
         files = [file for chapter_name, file in all_code_files if chapter_name == chapter.name]
         for file in files:
             content += read_file(file, logger)
@@ -2339,6 +3232,587 @@ def read_file(file: Path, logger) -> str:
     return content
 
 
+class MappedExport:
+    """A Denodo export file mapped in memory, so the code of the objects is read from the file when it is used.
+    The export is copied to a temporary file without a name, that is mapped. Changes of the export by other
+    programs do not reach the mapped copy, and the app can save to the export.
+    The positions are byte offsets in the file. Indexing with a slice and find behave like on the content string,
+    so the parser handles both."""
+    __slots__ = ['file', 'encoding', 'map']
+
+    def __init__(self, file: Path, encoding: str):
+        """Initializer of the class, copies and maps the file
+
+        :param file: the export file
+        :param encoding: the encoding of the file
+        """
+        self.file = file
+        self.encoding = encoding
+        with file.open('rb') as source:
+            try:
+                # next to the export, the temporary folder may be in memory
+                copy = TemporaryFile(dir=str(file.parent))
+            except (OSError, IOError):
+                copy = TemporaryFile()
+            with copy:
+                copyfileobj(source, copy, 1 << 20)
+                copy.flush()
+                # the mapping keeps the copy until it is closed
+                self.map = mmap(copy.fileno(), 0, access=ACCESS_READ)
+
+    def is_mappable(self)->bool:
+        """Returns if the export can be parsed on byte offsets. This needs an encoding in which the delimiters
+        are single bytes, and no carriage returns, which are translated when a file is read as text.
+
+        :return: True if the mapped export can be used
+        """
+        ascii_compatible = (DELIMITER + '\n').encode(self.encoding) == (DELIMITER + '\n').encode('ascii')
+        return ascii_compatible and self.map.find(b'\r') == -1
+
+    def __len__(self)->int:
+        """Returns the size of the export in bytes
+
+        :return: the size
+        """
+        return len(self.map)
+
+    def __getitem__(self, key: slice)->str:
+        """Returns the text between two offsets
+
+        :param key: slice with the start and end offsets
+        :return: the decoded text
+        """
+        start = key.start or 0
+        stop = len(self.map) if key.stop is None else key.stop
+        return self.text(start, stop - start)
+
+    def find(self, sub: str, start: int=0, end: int=None)->int:
+        """Returns the offset of a string in the export, like str.find
+
+        :param sub: the string sought
+        :param start: the offset where the search starts
+        :param end: the offset where the search ends
+        :return: the offset, or -1 if not found
+        """
+        return self.map.find(sub.encode(self.encoding), start, len(self.map) if end is None else end)
+
+    def text(self, offset: int, length: int)->str:
+        """Returns the decoded text of a part of the export
+
+        :param offset: the offset of the text
+        :param length: the length of the text in bytes
+        :return: the text
+        """
+        return self.map[offset:offset + length].decode(self.encoding)
+
+    def close(self):
+        """Closes the mapping, only used before any code refers to it
+
+        :return: None
+        """
+        self.map.close()
+
+
+def read_export(file: Path, logger)->Union[str, MappedExport]:
+    """Reads a Denodo export. Large exports are memory mapped instead of read, if the file allows it.
+    Errors are raised, the caller reports them in the gui or on the console.
+
+    :param file: the export file
+    :param logger: the logger in the app
+    :return: the content as string, or the mapped export
+    :raises OSError: if the file can not be read
+    :raises UnicodeDecodeError: if the file is not in the expected encoding
+    """
+    logger.debug('Reading: ' + str(file))
+    if file.stat().st_size >= MAPPED_FILE_SIZE:
+        try:
+            export = MappedExport(file, getpreferredencoding(False))
+        except (OSError, IOError, ValueError) as error:
+            # for example no room for the copy, the export is read instead
+            logger.debug(f"{str(file)} could not be mapped: {str(error)}")
+        else:
+            if export.is_mappable():
+                logger.debug(f"{str(file)} with {len(export)} bytes mapped.")
+                return export
+            export.close()
+    with file.open() as f:
+        content = f.read()
+    logger.debug(f"{str(file)} with {len(content)} characters read.")
+    return content
+
+
+def iter_export_objects(lines: Iterable[str])->Iterator[Tuple[str, str]]:
+    """Reads the objects of a Denodo export line by line, so large exports are not held in memory.
+    An object runs from a line starting with the DELIMITER up to the next object or chapter header.
+    The start of every chapter is yielded as well, with empty code.
+
+    :param lines: the lines of the export, for example an open file
+    :return: iterator over tuples with the chapter name and the code
+    """
+    headers = {Chapter.make_header(chapter_name): chapter_name for chapter_name in CHAPTER_NAMES}
+    header_end = Chapter.make_header('').split('\n')[-2] + '\n'
+    chapter_name = ''
+    code = list()
+
+    for line in lines:
+        if line.startswith(DELIMITER):
+            if chapter_name and code and code[0].startswith(DELIMITER):
+                yield chapter_name, ''.join(code)
+            code = [line]
+            continue
+        code.append(line)
+        if line == header_end and len(code) >= 3 and ''.join(code[-3:]) in headers:
+            if chapter_name and code[0].startswith(DELIMITER):
+                yield chapter_name, ''.join(code[:-3])
+            chapter_name = headers[''.join(code[-3:])]
+            code = list()
+            yield chapter_name, ''
+    if chapter_name and code and code[0].startswith(DELIMITER):
+        yield chapter_name, ''.join(code)
+
+
+class PatchBundle:
+    """The differences between a base and a compare model, as patches per object plus added and removed objects.
+    A bundle is saved as a gzipped file with json lines and can be applied to another export or repository
+    holding the base code, to turn it into the compare code.
+
+    Every entry has a chapter, a name and an operation:
+        add: with the code of the new object
+        remove: with the fingerprint of the removed code
+        patch: with the patch text and the fingerprints of the code before and after
+
+    Objects that are added but already exist with other code, or removed after their code changed,
+    are conflicts and are reported as failed, their code is left as it is.
+    """
+    __slots__ = ['entries']
+
+    def __init__(self, entries: Iterable[dict]=()):
+        """Initializer of the class
+
+        :param entries: the entries
+        """
+        self.entries = OrderedDict(((entry['chapter'], entry['name']), entry) for entry in entries)
+
+    @classmethod
+    def from_root_item(cls, root_item: 'RootItem')->'PatchBundle':
+        """Creates the bundle with the differences of the loaded base and compare code
+
+        :param root_item: the root with both models loaded
+        :return: the bundle
+        """
+        entries = list()
+        for chapter in root_item.chapters:
+            for code_item in chapter.code_items:
+                base, compare = code_item.base_data, code_item.compare_data
+                if base.code == compare.code:
+                    continue
+                entry = {'chapter': chapter.name, 'name': code_item.name}
+                if not base.code:
+                    entry.update(op='add', code=compare.code)
+                elif not compare.code:
+                    entry.update(op='remove', source=base.fingerprint)
+                else:
+                    patches = merge_engine.patch_make(base.code, compare.code)
+                    entry.update(op='patch', patch=merge_engine.patch_to_text(patches),
+                                 source=base.fingerprint, target=compare.fingerprint)
+                entries.append(entry)
+        return cls(entries)
+
+    def save(self, file: Path):
+        """Writes the bundle to a gzipped json lines file
+
+        :param file: the file
+        :return: None
+        """
+        with gzip.open(str(file), 'wt', encoding='utf-8') as f:
+            header = {'format': PATCH_BUNDLE_FORMAT, 'version': PATCH_BUNDLE_VERSION, 'objects': len(self.entries)}
+            f.write(json.dumps(header) + '\n')
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + '\n')
+
+    @classmethod
+    def load(cls, file: Path)->'PatchBundle':
+        """Reads a bundle from file
+
+        :param file: the file
+        :return: the bundle
+        :raises ValueError: if the file is not a patch bundle
+        """
+        with gzip.open(str(file), 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('format') != PATCH_BUNDLE_FORMAT or header.get('version') != PATCH_BUNDLE_VERSION:
+                raise ValueError(f"{file} is not a patch bundle")
+            return cls(json.loads(line) for line in f if line.strip())
+
+    @staticmethod
+    def new_results()->dict:
+        """Returns the dict with the names of the objects per result of applying a bundle
+
+        :return: dict with an empty list per result
+        """
+        return {result: list() for result in ('patched', 'fuzzy', 'added', 'removed', 'unchanged', 'failed',
+                                              'missing')}
+
+    def apply_to_code(self, entry: dict, code: str, results: dict)->str:
+        """Applies the patch of an entry to the code of an existing object
+
+        :param entry: the entry of the object
+        :param code: the current code
+        :param results: the results, the name of the object is added to one of them
+        :return: the new code, or None if the object is removed
+        """
+        name = entry['name']
+        fingerprint = content_fingerprint(code.strip())
+        if entry['op'] == 'remove':
+            # code changed after the bundle was made is a conflict, it is kept
+            if fingerprint != entry['source']:
+                results['failed'].append(name)
+                return code
+            results['removed'].append(name)
+            return None
+        elif entry['op'] == 'add':
+            # the object already exists, with other code it is a conflict
+            if fingerprint != content_fingerprint(entry['code'].strip()):
+                results['failed'].append(name)
+            else:
+                results['unchanged'].append(name)
+            return code
+        if fingerprint == entry['target']:
+            results['unchanged'].append(name)
+            return code
+        patched_code, applied = merge_engine.patch_apply(merge_engine.patch_from_text(entry['patch']), code)
+        if not all(applied):
+            results['failed'].append(name)
+            return code
+        results['patched' if fingerprint == entry['source'] else 'fuzzy'].append(name)
+        return patched_code
+
+    def apply_to_file(self, lines: Iterable[str], write)->dict:
+        """Applies the bundle to an export, streaming the result to a writer.
+        Added objects are written at the end of their chapter.
+
+        :param lines: the lines of the export
+        :param write: function writing a string to the result, for example the write method of an open file
+        :return: dict with the names of the objects per result
+        """
+        results = self.new_results()
+        remaining = OrderedDict(self.entries)
+        written_chapters = list()
+
+        def write_added(chapter_name: str):
+            """Writes the added objects of a chapter that were not found in the export
+
+            :param chapter_name: the name of the chapter
+            :return: None
+            """
+            for key in [key for key in remaining if key[0] == chapter_name and remaining[key]['op'] == 'add']:
+                write(remaining.pop(key)['code'])
+                results['added'].append(key[1])
+
+        def start_chapter(chapter_name: str):
+            """Closes the previous chapter and writes the header of the next one, chapters missing in the export
+            are inserted if they have added objects
+
+            :param chapter_name: the name of the chapter, or '' at the end
+            :return: None
+            """
+            if written_chapters:
+                write_added(written_chapters[-1])
+            index = CHAPTER_NAMES.index(chapter_name) if chapter_name else len(CHAPTER_NAMES)
+            for missing_name in CHAPTER_NAMES[:index]:
+                if missing_name not in written_chapters and any(
+                        key[0] == missing_name and entry['op'] == 'add' for key, entry in remaining.items()):
+                    write(Chapter.make_header(missing_name))
+                    write_added(missing_name)
+                    written_chapters.append(missing_name)
+            if chapter_name:
+                write(Chapter.make_header(chapter_name))
+                written_chapters.append(chapter_name)
+
+        write(PROP_QUOTE)
+        for chapter_name, code in iter_export_objects(lines):
+            if not code:
+                start_chapter(chapter_name)
+                continue
+            name = CodeItem.extract_object_name_from_code(chapter_name, code)
+            entry = remaining.pop((chapter_name, name), None)
+            if entry:
+                code = self.apply_to_code(entry, code, results)
+            if code is not None:
+                write(code)
+        start_chapter('')
+        results['missing'].extend(name for _, name in remaining)
+        return results
+
+    def apply_to_repository(self, folder: Path)->dict:
+        """Applies the bundle to a repository in place, one code file at a time.
+        The part.log files are updated for added and removed objects.
+
+        :param folder: the folder of the repository
+        :return: dict with the names of the objects per result
+        :raises OSError: if a file can not be read or written
+        """
+        results = self.new_results()
+        for chapter_name in CHAPTER_NAMES:
+            entries = [entry for key, entry in self.entries.items() if key[0] == chapter_name]
+            if not entries:
+                continue
+            chapter_folder = folder / chapter_name
+            part_log_file = chapter_folder / LOG_FILE_NAME
+            part_log = part_log_file.read_text().split('\n') if part_log_file.is_file() else list()
+            part_log = [line for line in part_log if line]
+            paths = {Path(line).name: line for line in part_log}
+            part_log_changed = False
+            for entry in entries:
+                file_name = CodeItem.get_file_name(entry['name'])
+                code_file = Path(paths.get(file_name, str(chapter_folder / file_name)))
+                if not code_file.is_file():
+                    if entry['op'] != 'add':
+                        results['missing'].append(entry['name'])
+                        continue
+                    chapter_folder.mkdir(parents=True, exist_ok=True)
+                    code_file.write_text(entry['code'])
+                    part_log.append(str(code_file))
+                    part_log_changed = True
+                    results['added'].append(entry['name'])
+                    continue
+                code = code_file.read_text()
+                new_code = self.apply_to_code(entry, code, results)
+                if new_code is None:
+                    code_file.unlink()
+                    part_log = [line for line in part_log if Path(line).name != file_name]
+                    part_log_changed = True
+                elif new_code != code:
+                    code_file.write_text(new_code)
+            if part_log_changed:
+                part_log_file.write_text('\n'.join(part_log))
+        return results
+
+
+def iter_repository_lines(folder: Path)->Iterator[str]:
+    """Reads a repository line by line as if it was a single export, following the part.log files
+
+    :param folder: the folder of the repository
+    :return: iterator over the lines
+    """
+    yield PROP_QUOTE
+    for chapter_name in CHAPTER_NAMES:
+        part_log_file = folder / chapter_name / LOG_FILE_NAME
+        if not part_log_file.is_file():
+            continue
+        yield from Chapter.make_header(chapter_name).splitlines(keepends=True)
+        for line in part_log_file.read_text().split('\n'):
+            code_file = Path(line)
+            if line and code_file.is_file():
+                with code_file.open() as f:
+                    yield from f
+
+
+def scan_export(job: Tuple[int, str, bool, bool])->Tuple[int, List[Tuple[str, str, str]]]:
+    """Reads an export file or repository and fingerprints its objects.
+    This function runs in the worker processes of a process pool, so it only takes and returns plain data.
+
+    :param job: tuple with an index, the path, and the normalization flags: enabled and use_sqlparse
+    :return: tuple with the index and a list with tuples of chapter name, object name and fingerprint,
+        or None if the export could not be read
+    """
+    index, path, normalize, use_sqlparse = job
+    path = Path(path)
+    normalizer = CodeNormalizer(normalize, use_sqlparse)
+    objects = list()
+
+    def scan(lines: Iterable[str]):
+        """Fingerprints the objects in the lines
+
+        :param lines: the lines of the export
+        :return: None
+        """
+        for chapter_name, code in iter_export_objects(lines):
+            if not code:
+                continue
+            object_name = CodeItem.extract_object_name_from_code(chapter_name, code)
+            if object_name:
+                fingerprint = normalizer.fingerprint(code) if normalize else content_fingerprint(code.strip())
+                objects.append((chapter_name, object_name, fingerprint))
+
+    try:
+        if path.is_dir():
+            scan(iter_repository_lines(path))
+        else:
+            with path.open() as f:
+                scan(f)
+    except (OSError, IOError, UnicodeDecodeError):
+        return index, None
+    return index, objects
+
+
+class BatchCompare:
+    """Compares N exports of the same database, for example of the DEV, TEST, ACC and PROD environments.
+    Every export is read once and only the fingerprints of its objects are kept, so many large exports fit in memory.
+    The result is an N x N matrix with the number of added, removed and changed objects of every pair,
+    and a table with the version of every object in every export.
+    """
+    __slots__ = ['paths', 'labels', 'fingerprints', 'failed']
+
+    def __init__(self, paths: List[Path]):
+        """Initializer of the class
+
+        :param paths: the export files or repositories
+        """
+        self.paths = paths
+        self.labels = list()
+        for path in paths:
+            label = path.stem
+            while label in self.labels:
+                label += "'"
+            self.labels.append(label)
+        # per export: dict of (chapter name, object name) to fingerprint
+        self.fingerprints = [dict() for _ in paths]
+        # the exports that could not be read
+        self.failed = list()
+
+    def get_jobs(self)->List[Tuple[int, str, bool, bool]]:
+        """Returns the jobs for scan_export, with the current normalization of the code_normalizer
+
+        :return: list with the jobs
+        """
+        return [(i, str(path), code_normalizer.enabled, code_normalizer.use_sqlparse)
+                for i, path in enumerate(self.paths)]
+
+    def set_result(self, result: Tuple[int, List[Tuple[str, str, str]]]):
+        """Stores the result of scan_export
+
+        :param result: the result
+        :return: None
+        """
+        index, objects = result
+        if objects is None:
+            self.failed.append(self.paths[index])
+            return
+        self.fingerprints[index] = OrderedDict(((chapter_name, name), fingerprint)
+                                               for chapter_name, name, fingerprint in objects)
+
+    def get_pair(self, base: int, compare: int)->dict:
+        """Returns the differences between two exports
+
+        :param base: index of the base export
+        :param compare: index of the compare export
+        :return: dict with the keys in BATCH_PAIR_FIELDS
+        """
+        base_fingerprints = self.fingerprints[base]
+        compare_fingerprints = self.fingerprints[compare]
+        common = base_fingerprints.keys() & compare_fingerprints.keys()
+        changed = sum(1 for key in common if base_fingerprints[key] != compare_fingerprints[key])
+        return {'base': self.labels[base], 'compare': self.labels[compare],
+                'added': len(compare_fingerprints.keys() - base_fingerprints.keys()),
+                'removed': len(base_fingerprints.keys() - compare_fingerprints.keys()),
+                'changed': changed, 'unchanged': len(common) - changed}
+
+    def get_matrix(self)->List[List[dict]]:
+        """Returns the N x N matrix, row i and column j hold the differences of export j relative to export i
+
+        :return: list of rows with the result of get_pair
+        """
+        count = len(self.paths)
+        return [[self.get_pair(i, j) for j in range(count)] for i in range(count)]
+
+    def get_versions(self)->List[dict]:
+        """Returns the version of every object in every export. Versions are numbered per object
+        in the order they are found, an export without the object has no version.
+
+        :return: list with a dict per object with its chapter, name and the versions per export label
+        """
+        keys = OrderedDict()
+        for fingerprints in self.fingerprints:
+            keys.update(dict.fromkeys(fingerprints))
+        table = list()
+        for chapter_name, name in keys:
+            line = {'chapter': chapter_name, 'name': name}
+            versions = dict()
+            for label, fingerprints in zip(self.labels, self.fingerprints):
+                fingerprint = fingerprints.get((chapter_name, name))
+                if fingerprint:
+                    versions.setdefault(fingerprint, len(versions) + 1)
+                line[label] = f"v{versions[fingerprint]}" if fingerprint else ''
+            table.append(line)
+        return table
+
+    def get_json(self)->str:
+        """Returns the matrix and the versions of the objects as json
+
+        :return: json string
+        """
+        report = {'exports': {label: str(path) for label, path in zip(self.labels, self.paths)},
+                  'matrix': self.get_matrix(), 'objects': self.get_versions()}
+        return json.dumps(report, indent=2)
+
+    def get_csv(self)->Tuple[str, str]:
+        """Returns the pairs of the matrix and the versions of the objects as two csv tables
+
+        :return: tuple with the pair table and the object table
+        """
+        pairs = StringIO()
+        writer = csv.DictWriter(pairs, fieldnames=list(BATCH_PAIR_FIELDS), delimiter=';', lineterminator='\n')
+        writer.writeheader()
+        for row in self.get_matrix():
+            writer.writerows(row)
+        objects = StringIO()
+        writer = csv.DictWriter(objects, fieldnames=['chapter', 'name'] + self.labels, delimiter=';',
+                                lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(self.get_versions())
+        return pairs.getvalue(), objects.getvalue()
+
+
+class BatchCompareThread(QThread):
+    """Background thread reading the exports of a BatchCompare, with a process pool across cores."""
+
+    progress = pyqtSignal(int, int)  # number of exports done, total number of exports
+    scan_ready = pyqtSignal(list)  # list with tuples as returned by scan_export
+
+    def __init__(self, jobs: List[Tuple[int, str, bool, bool]], parent: QObject=None):
+        """Initializer of the class
+
+        :param jobs: list with jobs for scan_export
+        :param parent: the owner of the thread
+        """
+        super().__init__(parent)
+        self.jobs = jobs
+
+    def run(self):
+        """Reads the exports, called by QThread.start in the new thread.
+        If no process pool can be used, the exports are read in this thread.
+
+        :return: None
+        """
+        total = len(self.jobs)
+        results = list()
+        try:
+            # spawned workers do not inherit the state of the gui process and its threads
+            # every worker holds a whole export, so no more workers than cores
+            workers = min(total, cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                futures = [pool.submit(scan_export, job) for job in self.jobs]
+                for future in as_completed(futures):
+                    if self.isInterruptionRequested():
+                        for pending in futures:
+                            pending.cancel()
+                        return
+                    results.append(future.result())
+                    self.progress.emit(len(results), total)
+        except (OSError, RuntimeError, ValueError, BrokenProcessPool):
+            results = list()
+        if len(results) < total:
+            done = {i for i, _ in results}
+            for job in self.jobs:
+                if self.isInterruptionRequested():
+                    return
+                if job[0] not in done:
+                    results.append(scan_export(job))
+                    self.progress.emit(len(results), total)
+        self.scan_ready.emit(results)
+
+
 class TransOpenBase(QSignalTransition):
     """Transition class from init to base_loaded"""
     
@@ -2426,9 +3900,11 @@ class TransOpenBase(QSignalTransition):
 
         s.export_file_action.setEnabled(True)
         s.export_folder_action.setEnabled(True)
+        s.export_impact_action.setEnabled(True)
         s.open_compare_file_action.setEnabled(True)
         s.open_compare_folder_action.setEnabled(True)
         s.denodo_folder_structure_action.setEnabled(True)
+        s.denodo_selection_view_action.setEnabled(True)
         s.compare_recent_repository_menu.setEnabled(True)
         s.compare_recent_file_menu.setEnabled(True)
         s.add_mode(BASE_LOADED)
@@ -2498,9 +3974,11 @@ class TransResetBase(QSignalTransition):
 
         s.export_file_action.setEnabled(False)
         s.export_folder_action.setEnabled(False)
+        s.export_impact_action.setEnabled(False)
         s.open_compare_file_action.setEnabled(False)
         s.open_compare_folder_action.setEnabled(False)
         s.denodo_folder_structure_action.setEnabled(False)
+        s.denodo_selection_view_action.setEnabled(False)
         s.compare_recent_repository_menu.setEnabled(False)
         s.compare_recent_file_menu.setEnabled(False)
         # noinspection PyUnresolvedReferences
@@ -2598,6 +4076,11 @@ class TransOpenCompare(QSignalTransition):
         s.dependency_model.gui = GUI_COMPARE
         s.treeview1.blockSignals(False)
         s.reset_compare_action.setEnabled(True)
+        s.export_compare_report_action.setEnabled(True)
+        s.export_patch_bundle_action.setEnabled(True)
+        s.open_ancestor_file_action.setEnabled(True)
+        s.open_ancestor_folder_action.setEnabled(True)
+        s.start_diff_stats()
         s.logger.debug(f"Loading model from file finished.")
         # noinspection PyUnresolvedReferences
         s.status_bar.showMessage("Ready")
@@ -2662,6 +4145,10 @@ class TransRemoveCompare(QSignalTransition):
         s.diff_buttons.setHidden(True)
         s.select_buttons.setHidden(True)
         s.reset_compare_action.setEnabled(False)
+        s.export_compare_report_action.setEnabled(False)
+        s.export_patch_bundle_action.setEnabled(False)
+        s.set_ancestor_actions_enabled(False)
+        s.stop_diff_stats()
         s.code_show_selector = ORIGINAL_CODE
         s.on_click_item(None)
 
@@ -2671,7 +4158,7 @@ class TransRemoveCompare(QSignalTransition):
         s.compare_repository_file = ''
         s.compare_repository_folder = ''
         s.compare_repository_label.setText('')
-        removals = (COMP_UNLOAD, COMP_LOADED, COMP_FILE, COMP_REPO, GUI_COMPARE)
+        removals = (COMP_UNLOAD, COMP_LOADED, COMP_FILE, COMP_REPO, GUI_COMPARE, ANCE_LOADED)
 
         for removal in removals:
             if old_mode & removal:
@@ -2741,6 +4228,10 @@ class TransResetAll(QSignalTransition):
         # noinspection PyArgumentList
         QApplication.setOverrideCursor(Qt.WaitCursor)
         s.treeview1.blockSignals(True)
+        s.export_compare_report_action.setEnabled(False)
+        s.export_patch_bundle_action.setEnabled(False)
+        s.set_ancestor_actions_enabled(False)
+        s.stop_diff_stats()
 
         s.treemodel.reset()
 
@@ -2754,7 +4245,8 @@ class TransResetAll(QSignalTransition):
         # noinspection PyUnresolvedReferences
         s.status_bar.showMessage("All Reset")
 
-        removals = (COMP_UNLOAD, BASE_UNLOAD, COMP_LOADED, BASE_LOADED, COMP_FILE, COMP_REPO, BASE_REPO, BASE_FILE)
+        removals = (COMP_UNLOAD, BASE_UNLOAD, COMP_LOADED, BASE_LOADED, COMP_FILE, COMP_REPO, BASE_REPO, BASE_FILE,
+                    ANCE_LOADED)
 
         for removal in removals:
             if old_mode & removal:
@@ -2763,9 +4255,11 @@ class TransResetAll(QSignalTransition):
 
         s.export_file_action.setEnabled(False)
         s.export_folder_action.setEnabled(False)
+        s.export_impact_action.setEnabled(False)
         s.open_compare_file_action.setEnabled(False)
         s.open_compare_folder_action.setEnabled(False)
         s.denodo_folder_structure_action.setEnabled(False)
+        s.denodo_selection_view_action.setEnabled(False)
         s.compare_recent_repository_menu.setEnabled(False)
         s.compare_recent_file_menu.setEnabled(False)
 
@@ -3138,7 +4632,8 @@ class TreeItem(object):
 class ItemData:
     """Code item state dependent data. A code item can have 2 Item data objects,
     one used as base_data and one used as compare_data """
-    __slots__ = ['denodo_path', 'depend_path', 'code', 'dependencies', 'dependees', 'dependee_parent', 'dependees_tree']
+    __slots__ = ['denodo_path', 'depend_path', 'text', 'export', 'offset', 'length', 'dependencies', 'dependees',
+                 'dependee_parent', 'dependees_tree', 'diff_stats', 'fingerprint', 'normalized_fingerprint']
 
     def __init__(self, root_item):
         """Initializer of the class
@@ -3148,18 +4643,63 @@ class ItemData:
         """
         self.denodo_path = Path()
         self.depend_path = Path()
-        self.code = ''
+        # the code is held as text, or as offset and length in a mapped export
+        self.text = ''
+        self.export = None
+        self.offset = 0
+        self.length = 0
         self.dependencies = list()
         self.dependees = list()
         self.dependee_parent = None
         self.dependees_tree = root_item
+        self.diff_stats = None
+        self.fingerprint = ''
+        self.normalized_fingerprint = ''
+
+    @property
+    def code(self)->str:
+        """The code, read from the mapped export if it is stored as offsets
+
+        :return: the code
+        """
+        if self.export is not None:
+            return self.export.text(self.offset, self.length)
+        return self.text
+
+    def set_code(self, code: str, export: MappedExport=None, offset: int=0, length: int=0):
+        """Sets the code and precomputes its fingerprint.
+        If the code comes from a mapped export, only its offset and length are kept.
+
+        :param code: the code
+        :param export: the mapped export the code was read from
+        :param offset: the offset of the code in the export
+        :param length: the length of the code in bytes
+        :return: None
+        """
+        self.text = '' if export is not None else code
+        self.export = export
+        self.offset = offset
+        self.length = length
+        # leading and trailing whitespace is left out, so objects repeated in a repository are recognized
+        self.fingerprint = content_fingerprint(code.strip())
+        # computed when needed, only a comparison ignoring formatting uses it
+        self.normalized_fingerprint = ''
+
+    def get_normalized_fingerprint(self)->str:
+        """Returns the fingerprint of the normalized code, computing it if needed
+
+        :return: the hex digest
+        """
+        if not self.normalized_fingerprint:
+            self.normalized_fingerprint = code_normalizer.fingerprint(self.code)
+        return self.normalized_fingerprint
 
 
 class CodeItem(TreeItem):
     """CodeItem class represents the code for a single Denodo object,
     e.g. a wrapper or a view or a base view"""
 
-    __slots__ = ['chapter', 'script_path', 'headers', 'base_data', 'compare_data']
+    __slots__ = ['chapter', 'script_path', 'headers', 'base_data', 'compare_data', 'ancestor_data']
 
     def __init__(self, parent: TreeItem, name: str, index: int=None):
         """Initializer of the class sets up its data
@@ -3182,6 +4722,8 @@ class CodeItem(TreeItem):
         # main code data and other state dependent data are stored in these two variables
         self.base_data = ItemData(self)
         self.compare_data = ItemData(self)
+        # the code of the common ancestor in a three-way compare
+        self.ancestor_data = ItemData(self)
 
     def object_type(self)->str:
         """Returns a presentable string with the category (chapter) of this code item
@@ -3206,6 +4748,7 @@ class CodeItem(TreeItem):
         """
         self.base_data = None
         self.compare_data = None
+        self.ancestor_data = None
         self.column_data = None
         self.script_path = ''
         super().clear()
@@ -3224,85 +4767,41 @@ class CodeItem(TreeItem):
             data = None
         return data
 
+    @staticmethod
+    def get_diff_patch(code: str, compare_code: str)->List[Tuple[int, str]]:
+        """Computes the difference between two code pieces with the global DiffMatchPatch instance.
+        Large code pieces use the patience diff.
+
+        :param code: the original code
+        :param compare_code: the new code
+        :return: list of diff tuples (operation, text)
+        """
+        if len(code) + len(compare_code) > PATIENCE_DIFF_SIZE:
+            return diff_engine.diff_patience(code, compare_code)
+        return diff_engine.diff_main(code, compare_code)
+
     @staticmethod
     def get_diff(code: str, compare_code: str)->str:
         """Supplies the code edit widget with html for the comparison.
 
-        The main intel of this function is supplied by the global DiffMatchPatch instance
-        Here the engine is used on the two code pieces and a patch is calculated
-        the patch is again inserted in the pretty_html function of the engine and modded a bit
-
         no changes: white
         modified code item: red and green text parts
         lost code (not present in compare code): red,
         newly added code: green
 
         :param code: the original code
-        :type code: str
         :param compare_code: the new code
-        :type compare_code: str
-        :return: html representation of teh difference
-        :rtype: str
-        """
-        def format_code(_code: str)->str:
-            """
-            Formats a code piece as html
-            :param _code: The code to be formatted
-            :return: the html of the code
-            :rtype: str
-            """
-            _code = _code.replace('<br>', '<br />\n')
-            _code = _code.replace('&para;', '')
-            _code = _code.replace('    ', ' &nbsp; &nbsp; &nbsp; &nbsp; ')
-            return _code
-
-        def format_code2(_code: str)->str:
-            """
-            Formats a code piece as html
-            :param _code: The code to be formatted
-            :return: the html of the code
-            :rtype: str
-            """
-            _code = _code.replace('\n', '<br />\n')
-            _code = _code.replace('    ', ' &nbsp; &nbsp; &nbsp; &nbsp; ')
-            return _code
-
-        def set_green(_code: str)->str:
-            """
-            Formats a code piece as html to set it green
-            :param _code: The code to be formatted
-            :return: the html of the code
-            :rtype: str
-            """
-            return '<span>' + new_diff_ins_indicator + _code + '</ins></span>'
-
-        def set_red(_code: str)->str:
-            """
-            Formats a code piece as html to set it red
-            :param _code: The code to be formatted
-            :return: the html of the code
-            :rtype: str
-            """
-            return '<span>' + new_diff_del_indicator + _code + '</del></span>'
-
-        diff_ins_indicator = '<ins style="background:#e6ffe6;">'
-        diff_del_indicator = '<del style="background:#ffe6e6;">'
-        new_diff_ins_indicator = '<ins style="color:' + green + ';">'
-        new_diff_del_indicator = '<del style="color:' + red + ';">'
-        diff_html = ''
-        if code:
-            if compare_code:
-                diff_patch = diff_engine.diff_main(code, compare_code)
-                diff_html = format_code(diff_engine.diff_pretty_html(diff_patch))
-                diff_html = diff_html.replace(diff_ins_indicator, new_diff_ins_indicator)
-                diff_html = diff_html.replace(diff_del_indicator, new_diff_del_indicator)
-            else:
-                diff_html = format_code2(set_red(code))
+        :return: html representation of the difference
+        """
+        if code and compare_code:
+            diffs = CodeItem.get_diff_patch(code, compare_code)
+        elif code:
+            diffs = [(PatchObject.DIFF_DELETE, code)]
+        elif compare_code:
+            diffs = [(PatchObject.DIFF_INSERT, compare_code)]
         else:
-            if compare_code:
-                diff_html = format_code2(set_green(compare_code))
-
-        return diff_html
+            return ''
+        return diff_html_renderer.to_html(diffs)
 
     def get_file_path(self, folder: Path)->Path:
         """Get the file path for this code item. This function changes and slash,
@@ -3311,10 +4810,112 @@ class CodeItem(TreeItem):
         Warning: this can potentially be dangerous if two uniquely named objects
         turn out to have the same name after turning slashes to underscores.
 
-        :param folder: the folder in which code item resides
-        :return: Path of the code item
+        :param folder: the folder in which code item resides
+        :return: Path of the code item
+        """
+        return folder / self.get_file_name(self.name)
+
+    @staticmethod
+    def get_file_name(name: str)->str:
+        """Returns the file name of a code item in a repository, see get_file_path
+
+        :param name: the name of the code item
+        :return: the file name
+        """
+        return name.replace('/', '_').replace('\\', '_') + '.vql'
+
+    def get_merge_status(self)->str:
+        """Returns the three-way merge status of this item, based on the fingerprints of the base,
+        compare and common ancestor code. Objects changed in both models are MERGE_BOTH, see get_merge.
+
+        :return: one of the MERGE_ constants
+        """
+        base, compare, ancestor = self.base_data, self.compare_data, self.ancestor_data
+        if base.code == compare.code or base.fingerprint == compare.fingerprint:
+            return MERGE_SAME
+        if not ancestor.code:
+            # added in one model, or added differently in both
+            return MERGE_CONFLICT if base.code and compare.code else (MERGE_BASE if base.code else MERGE_COMPARE)
+        if base.fingerprint == ancestor.fingerprint:
+            return MERGE_COMPARE if compare.code else MERGE_DELETED
+        if compare.fingerprint == ancestor.fingerprint:
+            return MERGE_BASE if base.code else MERGE_DELETED
+        if not base.code or not compare.code:
+            # deleted in one model and changed in the other
+            return MERGE_CONFLICT
+        return MERGE_BOTH
+
+    def get_merge(self)->Tuple[str, str]:
+        """Returns the three-way merge status and the merged code of this item.
+        Objects changed in both models are merged by applying the patches from the ancestor to the compare code
+        on the base code, unless both models changed the same part of the ancestor code.
+        These merges are computed when asked for and kept in the merge_cache. On a conflict the base code is returned.
+
+        :return: tuple with one of the MERGE_ constants (never MERGE_BOTH) and the merged code
+        """
+        status = self.get_merge_status()
+        if status == MERGE_SAME or status == MERGE_BASE or status == MERGE_CONFLICT:
+            return status, self.base_data.code
+        elif status == MERGE_COMPARE:
+            return status, self.compare_data.code
+        elif status == MERGE_DELETED:
+            return status, ''
+
+        key = (self.ancestor_data.fingerprint, self.base_data.fingerprint, self.compare_data.fingerprint)
+        merge = merge_cache.get(key)
+        if merge is None:
+            merge = (MERGE_CONFLICT, self.base_data.code)
+            base_diffs = merge_engine.diff_main(self.ancestor_data.code, self.base_data.code)
+            merge_engine.diff_cleanup_semantic(base_diffs)
+            compare_diffs = merge_engine.diff_main(self.ancestor_data.code, self.compare_data.code)
+            merge_engine.diff_cleanup_semantic(compare_diffs)
+            if not self.changes_overlap(base_diffs, compare_diffs):
+                patches = merge_engine.patch_make(self.ancestor_data.code, compare_diffs)
+                merged_code, applied = merge_engine.patch_apply(patches, self.base_data.code)
+                if all(applied):
+                    merge = (MERGE_MERGED, merged_code)
+            merge_cache.put(key, merge)
+        return merge
+
+    @staticmethod
+    def changes_overlap(diffs: list, other_diffs: list)->bool:
+        """Checks if two diffs from the same original text change the same part of it.
+        Changes that touch, or insert at the same position, overlap as well.
+
+        :param diffs: the one list of diff tuples
+        :param other_diffs: the other list of diff tuples
+        :return: True if the changes overlap
         """
-        return folder / (self.name.replace('/', '_').replace('\\', '_') + '.vql')
+        def changed_ranges(_diffs: list)->List[Tuple[int, int]]:
+            """Returns the ranges of the original text that are deleted, or the positions where text is inserted
+
+            :param _diffs: list of diff tuples
+            :return: sorted list of start and end positions
+            """
+            position = 0
+            ranges = list()
+            for operation, text in _diffs:
+                if operation == DiffMatchPatch.DIFF_INSERT:
+                    ranges.append((position, position))
+                else:
+                    if operation == DiffMatchPatch.DIFF_DELETE:
+                        ranges.append((position, position + len(text)))
+                    position += len(text)
+            return ranges
+
+        ranges = changed_ranges(diffs)
+        other_ranges = changed_ranges(other_diffs)
+        i = j = 0
+        while i < len(ranges) and j < len(other_ranges):
+            start, end = ranges[i]
+            other_start, other_end = other_ranges[j]
+            if start <= other_end and other_start <= end:
+                return True
+            if end < other_end:
+                i += 1
+            else:
+                j += 1
+        return False
 
     def remove_compare(self):
         """Function reverts the loading of compare code.
@@ -3322,6 +4923,7 @@ class CodeItem(TreeItem):
         :return: removal
         :rtype: Union[CodeItem, None]
         """
+        self.ancestor_data = ItemData(self)
         if self.compare_data.code:
             self.compare_data = ItemData(self)
             if self.base_data.code:
@@ -3518,10 +5120,24 @@ class Chapter(TreeItem):
 
     # export functions
     # to file
+    def get_ordered_code_items(self, mode: int, selected_only: bool)->List[CodeItem]:
+        """Returns the code items of this chapter in an order that can be executed in one pass,
+        items referenced by other items of this chapter (views used by views) come first.
+
+        :param mode: either GUI_SELECT or GUI_COMPARE ; what dependencies to use
+        :param selected_only: Indicator is True if only selected items are requested
+        :return: list of code items
+        """
+        code_items = [code_item for code_item in self.code_items if code_item.selected or not selected_only]
+        gui = GUI_SELECT if mode & GUI_SELECT else GUI_COMPARE
+        code_items, _ = DependencyGraph.topological_order(code_items, gui)
+        return code_items
+
     def get_code_as_file(self, mode: int, selected_only: bool)->str:
         """Returns the combined Denodo code for a whole chapter given he selection for saving purposes.
 
         This function adds a chapter header, and only selected code items if selected_only is True
+        The code items are ordered on their dependencies
         :param mode: either GUI_SELECT or GUI_COMPARE ; what code to return
         :param selected_only: Indicator is True if only selected items are requested
         :return: string with code content
@@ -3530,30 +5146,31 @@ class Chapter(TreeItem):
         if selected_only:
             if self.selected or any([code_item.selected for code_item in self.code_items]):
                 if mode & GUI_SELECT:
-                    code = [code_item.base_data.code for code_item in self.code_items if code_item.selected]
+                    code = [code_item.base_data.code for code_item in self.get_ordered_code_items(mode, True)]
                 elif mode & GUI_COMPARE:
-                    code = [code_item.compare_data.code for code_item in self.code_items if code_item.selected]
+                    code = [code_item.compare_data.code for code_item in self.get_ordered_code_items(mode, True)]
         else:
             if mode & GUI_SELECT:
-                code = [code_item.base_data.code for code_item in self.code_items]
+                code = [code_item.base_data.code for code_item in self.get_ordered_code_items(mode, False)]
             elif mode & GUI_COMPARE:
-                code = [code_item.compare_data.code for code_item in self.code_items]
+                code = [code_item.compare_data.code for code_item in self.get_ordered_code_items(mode, False)]
         return self.header + '\n'.join(code)
 
     # to repository
-    def get_part_log(self, base_path: Path)->Tuple[Path, str]:
+    def get_part_log(self, base_path: Path, mode: int)->Tuple[Path, str]:
         """Returns data to write the part.log files. Returns a tuple with two values:
         the file path for the part.log file and its content as a string.
 
         The content is a list of file paths pointing to the code items in this chapter.
         The part.log files are used in a repository to ensure the same order of execution.
-        Only the selected code items are included.
+        Only the selected code items are included, ordered on their dependencies.
         :param base_path: The base folder for the repo
+        :param mode: either GUI_SELECT or GUI_COMPARE ; what dependencies to use
         :return: Tuple of two values, a file path and the content of the part.log file of this chapter
         """
         folder = base_path / self.name
         part_log_filepath = folder / LOG_FILE_NAME
-        part_log = [str(code_item.get_file_path(folder)) for code_item in self.code_items if code_item.selected]
+        part_log = [str(code_item.get_file_path(folder)) for code_item in self.get_ordered_code_items(mode, True)]
         part_log_content = '\n'.join(part_log)
         return part_log_filepath, part_log_content
 
@@ -3600,13 +5217,550 @@ class DenodoFolder(TreeItem):
         super().clear()
 
 
+class DependencyGraph:
+    """Graph service on the dependencies of the code items of a RootItem.
+    Transitive closures are computed breadth first, so each object is visited once even in diamond shaped
+    or circular dependency graphs. Results are cached per context (gui) until the model changes.
+    """
+    __slots__ = ['sources_cache', 'dependees_cache']
+
+    def __init__(self):
+        """Initializer of the class"""
+        self.sources_cache = dict()
+        self.dependees_cache = dict()
+
+    def invalidate(self):
+        """Clears the cached results, called when dependencies change
+
+        :return: None
+        """
+        self.sources_cache = dict()
+        self.dependees_cache = dict()
+
+    @staticmethod
+    def neighbours(code_item: CodeItem, gui: int, upstream: bool)->List[CodeItem]:
+        """Returns the direct dependencies or dependees of a code item.
+        Items lost in the compare code have no compare data, for them the base data is used.
+
+        :param code_item: the code item
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :param upstream: True for dependencies, False for dependees
+        :return: list of code items
+        """
+        data = code_item.get_context_data(gui)
+        if gui & GUI_COMPARE and code_item.color == red:
+            data = code_item.base_data
+        return data.dependencies if upstream else data.dependees
+
+    def closure(self, code_item: CodeItem, gui: int, upstream: bool)->Tuple[CodeItem, ...]:
+        """Returns all code items reachable from a code item, nearest first
+
+        :param code_item: the start code item, not part of the result
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :param upstream: True to follow dependencies, False to follow dependees
+        :return: tuple of code items
+        """
+        cache = self.sources_cache if upstream else self.dependees_cache
+        key = (gui, code_item)
+        if key in cache:
+            return cache[key]
+        visited = {code_item}
+        result = list()
+        level = [code_item]
+        while level:
+            next_level = list()
+            for item in level:
+                for neighbour in self.neighbours(item, gui, upstream):
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        result.append(neighbour)
+                        next_level.append(neighbour)
+            level = next_level
+        cache[key] = tuple(result)
+        return cache[key]
+
+    def sources(self, code_item: CodeItem, gui: int)->Tuple[CodeItem, ...]:
+        """Returns all upstream code items a code item depends on
+
+        :param code_item: the code item
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :return: tuple of code items
+        """
+        return self.closure(code_item, gui, True)
+
+    def dependees(self, code_item: CodeItem, gui: int)->Tuple[CodeItem, ...]:
+        """Returns all downstream code items depending on a code item
+
+        :param code_item: the code item
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :return: tuple of code items
+        """
+        return self.closure(code_item, gui, False)
+
+    @staticmethod
+    def topological_order(code_items: List[CodeItem], gui: int)->Tuple[List[CodeItem], List[List[CodeItem]]]:
+        """Orders code items so every item comes after the items it depends on.
+        Only dependencies within the given items are taken into account. Items without constraints keep their
+        original order. This is a depth first walk, linear in the number of items plus dependencies.
+        Items in a circular dependency are kept in the order they are found, the cycles are returned for reporting.
+
+        :param code_items: the code items in their original order
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :return: Tuple with the ordered code items and a list of cycles found
+        """
+        members = set(code_items)
+        visiting, done = 1, 2
+        state = dict()
+        order = list()
+        cycles = list()
+        for code_item in code_items:
+            if code_item in state:
+                continue
+            state[code_item] = visiting
+            stack = [(code_item, iter(DependencyGraph.neighbours(code_item, gui, True)))]
+            while stack:
+                item, dependencies = stack[-1]
+                for dependency in dependencies:
+                    if dependency not in members:
+                        continue
+                    dependency_state = state.get(dependency)
+                    if dependency_state is None:
+                        state[dependency] = visiting
+                        stack.append((dependency, iter(DependencyGraph.neighbours(dependency, gui, True))))
+                        break
+                    elif dependency_state == visiting:
+                        path = [entry[0] for entry in stack]
+                        cycles.append(path[path.index(dependency):])
+                else:
+                    stack.pop()
+                    state[item] = done
+                    order.append(item)
+        return order, cycles
+
+    def shortest_path(self, code_item: CodeItem, other: CodeItem, gui: int)->List[CodeItem]:
+        """Returns the shortest chain of dependencies between two code items.
+        The chain is sought downstream first (other depends on code_item), then upstream.
+
+        :param code_item: the start code item
+        :param other: the end code item
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :return: list of code items from code_item to other, empty if they are not related
+        """
+        if code_item is other:
+            return [code_item]
+        for upstream in (False, True):
+            previous = {code_item: None}
+            level = [code_item]
+            while level and other not in previous:
+                next_level = list()
+                for item in level:
+                    for neighbour in self.neighbours(item, gui, upstream):
+                        if neighbour not in previous:
+                            previous[neighbour] = item
+                            next_level.append(neighbour)
+                level = next_level
+            if other in previous:
+                path = list()
+                item = other
+                while item:
+                    path.append(item)
+                    item = previous[item]
+                return path[::-1]
+        return list()
+
+
+class ImpactAnalysis:
+    """Transitive impact of a change in the selection of code items.
+    Orphans are selected code items that depend, directly or indirectly, on a deselected item.
+    Unmet dependencies are code items not selected, that a selected item depends on, directly or indirectly.
+    Both are found with one breadth first walk from all changed items at once, so the cost is linear in the graph size.
+    """
+    __slots__ = ['gui', 'deselected', 'selected', 'orphans', 'unmet']
+
+    def __init__(self, graph: DependencyGraph, gui: int, deselected: Iterable[CodeItem],
+                 selected: Iterable[CodeItem]=()):
+        """Initializer of the class, performs the analysis
+
+        :param graph: the dependency graph
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        :param deselected: the code items that are deselected
+        :param selected: the code items that are selected
+        """
+        self.gui = gui
+        self.deselected = list(deselected)
+        self.selected = list(selected)
+        # dicts with the affected code item as key and a tuple (changed item causing it, direct neighbour) as value
+        self.orphans = self.walk(graph, self.deselected, False)
+        self.unmet = self.walk(graph, self.selected, True)
+
+    def walk(self, graph: DependencyGraph, start_items: List[CodeItem], upstream: bool)->dict:
+        """Multi source breadth first walk, that collects the affected code items
+
+        :param graph: the dependency graph
+        :param start_items: the changed code items
+        :param upstream: True to follow dependencies and collect unselected items,
+            False to follow dependees and collect selected items
+        :return: dict with the affected code items
+        """
+        affected = dict()
+        causes = {code_item: code_item for code_item in start_items}
+        level = list(start_items)
+        while level:
+            next_level = list()
+            for item in level:
+                for neighbour in graph.neighbours(item, self.gui, upstream):
+                    if neighbour in causes:
+                        continue
+                    causes[neighbour] = causes[item]
+                    next_level.append(neighbour)
+                    if neighbour.selected != upstream:
+                        affected[neighbour] = (causes[item], item)
+            level = next_level
+        return affected
+
+    def has_impact(self)->bool:
+        """Returns True if orphans or unmet dependencies are found
+
+        :return: Boolean
+        """
+        return True if self.orphans or self.unmet else False
+
+    def report_lines(self)->Iterator[Tuple[str, CodeItem, CodeItem, CodeItem]]:
+        """Generator of the report lines
+
+        :return: Iterator with tuples: the kind, the affected code item, the cause and the direct neighbour
+        """
+        for code_item, (cause, via) in self.orphans.items():
+            yield 'Orphan', code_item, cause, via
+        for code_item, (cause, via) in self.unmet.items():
+            yield 'Unmet dependency', code_item, cause, via
+
+    def get_report(self)->str:
+        """Returns the report as csv text
+
+        :return: the report
+        """
+        def describe(_code_item: CodeItem)->str:
+            """Returns a presentable string of a code item
+
+            :param _code_item: the code item
+            :return: string
+            """
+            return f"{_code_item.object_type()}:{_code_item.name}"
+
+        lines = ['Impact;Object;Caused by;Via']
+        for kind, code_item, cause, via in self.report_lines():
+            lines.append(';'.join([kind, describe(code_item), describe(cause), describe(via)]))
+        return '\n'.join(lines) + '\n'
+
+
+class CodeSearchIndex:
+    """Inverted index over the code of the code items of a RootItem, for full text search.
+    Every lower-cased word of a code piece is mapped to the code pieces it occurs in and its word positions there.
+    A code piece is a tuple of a code item and its version: ORIGINAL_CODE for the base code,
+    COMPARE_CODE for the compare code. The index is updated per code piece, so loading or removing the compare code
+    only touches the compare code pieces.
+
+    Queries are whitespace separated parts that must all match:
+    a word matches a whole word, a word ending on * matches words starting with it,
+    and words in double quotes, or joined by punctuation like schema.table, match as a phrase.
+    """
+    __slots__ = ['postings', 'documents', 'vocabulary']
+
+    TOKEN = compile(r"\w+")
+    QUERY = compile(r'"([^"]*)"|(\S+)')
+
+    def __init__(self):
+        """Initializer of the class"""
+        self.postings = dict()   # word -> {(code_item, version): [positions]}
+        self.documents = dict()  # (code_item, version) -> words in the code piece
+        self.vocabulary = None   # sorted list of all words for prefix queries, built when needed
+
+    def clear(self):
+        """Removes all code pieces
+
+        :return: None
+        """
+        self.postings = dict()
+        self.documents = dict()
+        self.vocabulary = None
+
+    def add(self, code_item: CodeItem, version: int, code: str):
+        """Adds or replaces the code piece of a code item
+
+        :param code_item: the code item
+        :param version: ORIGINAL_CODE or COMPARE_CODE
+        :param code: the code
+        :return: None
+        """
+        key = (code_item, version)
+        if key in self.documents:
+            self.remove(code_item, version)
+        if not code:
+            return
+        positions = dict()
+        for position, word in enumerate(self.TOKEN.findall(code.lower())):
+            word_positions = positions.get(word)
+            if word_positions is None:
+                positions[word] = [position]
+            else:
+                word_positions.append(position)
+        postings = self.postings
+        for word, word_positions in positions.items():
+            posting = postings.get(word)
+            if posting is None:
+                postings[word] = {key: word_positions}
+                self.vocabulary = None
+            else:
+                posting[key] = word_positions
+        self.documents[key] = tuple(positions)
+
+    def remove(self, code_item: CodeItem, version: int):
+        """Removes the code piece of a code item
+
+        :param code_item: the code item
+        :param version: ORIGINAL_CODE or COMPARE_CODE
+        :return: None
+        """
+        key = (code_item, version)
+        for word in self.documents.pop(key, ()):
+            posting = self.postings[word]
+            del posting[key]
+            if not posting:
+                del self.postings[word]
+                self.vocabulary = None
+
+    def remove_version(self, version: int):
+        """Removes the code pieces of all code items of one version
+
+        :param version: ORIGINAL_CODE or COMPARE_CODE
+        :return: None
+        """
+        for code_item, _version in [key for key in self.documents if key[1] == version]:
+            self.remove(code_item, version)
+
+    def match_word(self, word: str, prefix: bool)->dict:
+        """Returns the code pieces and positions of a word, or of all words starting with it
+
+        :param word: the lower-cased word
+        :param prefix: True to match words starting with the word
+        :return: dict with the code pieces as key and a list of positions as value
+        """
+        if not prefix:
+            return self.postings.get(word, dict())
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        matches = dict()
+        i = bisect_left(self.vocabulary, word)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            for key, positions in self.postings[self.vocabulary[i]].items():
+                matches.setdefault(key, list()).extend(positions)
+            i += 1
+        return matches
+
+    def match_part(self, part: str, prefix: bool)->set:
+        """Returns the code pieces matching one part of a query, a word or a phrase
+
+        :param part: the query part
+        :param prefix: True if the last word may be a prefix
+        :return: set with the code pieces
+        """
+        words = self.TOKEN.findall(part.lower())
+        if not words:
+            return set()
+        matches = [self.match_word(word, prefix and i == len(words) - 1) for i, word in enumerate(words)]
+        keys = set(min(matches, key=len))
+        for word_matches in matches:
+            keys.intersection_update(word_matches)
+        if len(words) == 1:
+            return keys
+        # a phrase: the words must follow each other
+        found = set()
+        for key in keys:
+            following = [set(word_matches[key]) for word_matches in matches[1:]]
+            for start in matches[0][key]:
+                if all(start + i in positions for i, positions in enumerate(following, 1)):
+                    found.add(key)
+                    break
+        return found
+
+    def search(self, query: str)->List[Tuple[CodeItem, int]]:
+        """Returns the code items whose code matches all parts of the query
+
+        :param query: the query
+        :return: list of tuples with the code item and the versions found (ORIGINAL_CODE and/or COMPARE_CODE),
+            in the order of the chapters
+        """
+        keys = None
+        for phrase, word in self.QUERY.findall(query):
+            part = phrase or word
+            part_keys = self.match_part(part, part.endswith('*'))
+            keys = part_keys if keys is None else keys & part_keys
+            if not keys:
+                return list()
+        if not keys:
+            return list()
+        versions = dict()
+        for code_item, version in keys:
+            versions[code_item] = versions.get(code_item, 0) | version
+        chapters = {name: i for i, name in enumerate(CHAPTER_NAMES)}
+        return sorted(versions.items(), key=lambda result: (chapters.get(result[0].chapter.name, 0), result[0].name))
+
+
+class NameIndex:
+    """Index on the lower-cased names of the code items of a RootItem, independent of the view of the tree.
+    Names are kept sorted for prefix matches, and a trigram index finds substrings and names with typos.
+    Results are ranked: exact matches first, then prefixes, substrings and finally fuzzy matches.
+    A name matches fuzzy if it contains enough of the trigrams of the text: every typo spoils at most three of them.
+    """
+    __slots__ = ['names', 'code_items', 'trigrams']
+
+    def __init__(self):
+        """Initializer of the class"""
+        self.names = list()       # sorted unique lower-cased names
+        self.code_items = list()  # the code items per name, the same name can occur in several chapters
+        self.trigrams = dict()    # trigram -> set of indices in names
+
+    @staticmethod
+    def get_trigrams(name: str)->List[str]:
+        """Returns the trigrams of a name, the substrings of three characters
+
+        :param name: the lower-cased name
+        :return: list of trigrams
+        """
+        return [name[i:i + 3] for i in range(len(name) - 2)]
+
+    def build(self, code_items: Iterable[CodeItem]):
+        """Rebuilds the index
+
+        :param code_items: all code items
+        :return: None
+        """
+        items = dict()
+        for code_item in code_items:
+            items.setdefault(code_item.name.lower(), list()).append(code_item)
+        self.names = sorted(items)
+        self.code_items = [items[name] for name in self.names]
+        self.trigrams = dict()
+        for i, name in enumerate(self.names):
+            for trigram in self.get_trigrams(name):
+                ids = self.trigrams.get(trigram)
+                if ids is None:
+                    self.trigrams[trigram] = {i}
+                else:
+                    ids.add(i)
+
+    def search(self, text: str, limit: int=NAME_SEARCH_LIMIT)->List[CodeItem]:
+        """Returns the code items whose name matches the text, best matches first
+
+        :param text: the text sought
+        :param limit: the maximum number of names returned
+        :return: list of code items
+        """
+        text = text.strip().lower()
+        if not text or not self.names:
+            return list()
+        names = self.names
+        ranked = dict()  # index of the name -> rank
+
+        # prefixes, the exact match is the first one
+        i = bisect_left(names, text)
+        while i < len(names) and names[i].startswith(text) and len(ranked) < limit:
+            ranked[i] = (0 if names[i] == text else 1, len(names[i]))
+            i += 1
+
+        # substrings
+        if len(ranked) < limit:
+            # names containing the text have all its trigrams
+            postings = [self.trigrams.get(trigram, set()) for trigram in self.get_trigrams(text)]
+            if not postings:
+                candidates = range(len(names))
+            else:
+                postings.sort(key=len)
+                candidates = sorted(postings[0].intersection(*postings[1:]), key=lambda k: len(names[k]))
+            for i in candidates:
+                if i not in ranked and text in names[i]:
+                    ranked[i] = (2, len(names[i]))
+                    if len(ranked) >= limit:
+                        break
+
+            # fuzzy matches, names with most of the trigrams of the text
+            if len(ranked) < limit and len(postings) > 1:
+                typos = max(1, len(text) // NAME_SEARCH_TYPO_LENGTH)
+                minimum = max(1, len(postings) - 3 * typos)
+                # a name with the minimum number of trigrams has at least one of the rarest ones,
+                # candidates are counted on those and only the best are counted on all trigrams
+                rarest = postings[:len(postings) - minimum + 1]
+                shared = Counter(chain.from_iterable(rarest))
+                for i in ranked:
+                    shared.pop(i, None)
+                fuzzy = list()
+                for i, _ in shared.most_common(NAME_SEARCH_FUZZY_CANDIDATES):
+                    count = sum(1 for ids in postings if i in ids)
+                    if count >= minimum:
+                        fuzzy.append((len(postings) - count, len(names[i]), i))
+                # the names with most trigrams, ties are broken on the length of the name
+                for missing, length, i in sorted(fuzzy)[:limit - len(ranked)]:
+                    ranked[i] = (3 + missing, length)
+
+        order = sorted(ranked, key=lambda k: (ranked[k], names[k]))[:limit]
+        return [code_item for i in order for code_item in self.code_items[i]]
+
+    def match(self, pattern: str)->List[CodeItem]:
+        """Returns the code items whose name matches a pattern, ignoring case.
+        The wildcard * matches any text and ? a single character, a pattern without them matches the whole name.
+        Only the names starting with the part of the pattern before the first wildcard are checked.
+
+        :param pattern: the pattern
+        :return: list of code items
+        """
+        pattern = pattern.lower()
+        names = self.names
+        fixed = next((i for i, char in enumerate(pattern) if char in '*?['), None)
+        if fixed is None:
+            i = bisect_left(names, pattern)
+            return list(self.code_items[i]) if i < len(names) and names[i] == pattern else list()
+        start = pattern[:fixed]
+        result = list()
+        i = bisect_left(names, start)
+        while i < len(names) and names[i].startswith(start):
+            if fnmatchcase(names[i], pattern):
+                result.extend(self.code_items[i])
+            i += 1
+        return result
+
+
+class ViewNode:
+    """Node in a view on the items of a RootItem, like the chapters with their code items or the Denodo folders.
+    A view is a light hierarchy on top of the items, the items themselves are not moved into it.
+    So an item can be in several views at once and a TreeModel can show any view without changing the items.
+    A node knows its row in its parent, which makes finding the parent index of a node a constant time lookup.
+    """
+    __slots__ = ['item', 'parent', 'children', 'row']
+
+    def __init__(self, item: TreeItem, parent=None):
+        """Initializer of the class, the node is added to the children of its parent
+
+        :param item: the item shown by the node
+        :param parent: the parent node, None for the root of a view
+        :type parent: ViewNode
+        """
+        self.item = item
+        self.parent = parent
+        self.children = list()
+        self.row = -1
+        if parent:
+            self.row = len(parent.children)
+            parent.children.append(self)
+
+
 class RootItem(TreeItem):
     """Class representing a root of the tree.
     This class also owns most business logic for parsing the files.
     Generally this is the class the QMainWindow and QAbstractModel class talk to.
     It holds all data and serves loading and saving.
     """
-    __slots__ = ['chapters', 'storage_list', 'header', 'view']
+    __slots__ = ['chapters', 'gui', 'views', 'header', 'graph', 'search_index', 'name_index']
 
     def __init__(self, header: str):
         """
@@ -3616,13 +5770,18 @@ class RootItem(TreeItem):
         super().__init__(RootItem)
         self.class_type = RootItem
         self.chapters = self.child_items
-        self.storage_list = list()
+        # the context of the loaded models, GUI_COMPARE once a compare model is loaded
+        self.gui = GUI_SELECT
+        # per view (SCRIPT_VIEW or DENODO_VIEW) its root ViewNode and the nodes by item, built when asked for
+        self.views = dict()
         self.add_chapters(CHAPTER_NAMES)
         self.header = header
         self.column_data = [header]
         self.name = 'root'
-        self.view = SCRIPT_VIEW
         self.icon = QVariant()
+        self.graph = DependencyGraph()
+        self.search_index = CodeSearchIndex()
+        self.name_index = NameIndex()
 
     def get_child_index_by_name(self, name: str):
         """Returns the index of the child with given name or -1 if not found
@@ -3641,45 +5800,71 @@ class RootItem(TreeItem):
         self.column_data = None
         super().clear()
 
-    def change_view(self, mode: int)->bool:
-        """Method that swaps the tree items from VQL View to Denodo file structure view and back.
-        The actual switch is done in switch_view function.
-        This function handles the surrounding aspects.
-        :param mode: the mode flag with bits for the new view either VQL_VIEW or DENODO_VIEW
-        :return: Success or not
-        """
-        gui = mode & (GUI_NONE | GUI_SELECT | GUI_COMPARE)
-        if self.view & mode:
-            return True
-
-        if mode & SCRIPT_VIEW:
-            if self.storage_list:
-                self.switch_view()
-                self.view = SCRIPT_VIEW
-                return True
+    def get_view(self, view: int)->Tuple[ViewNode, dict]:
+        """Returns a view on the items: the chapters with their code items, or the Denodo folder structure.
+        The view is built when it is first asked for and kept until the model changes (see invalidate_views).
+
+        :param view: SCRIPT_VIEW or DENODO_VIEW
+        :return: tuple with the root ViewNode and a dict with the ViewNode of every item in the view
+        """
+        if view not in self.views:
+            root_node = ViewNode(self)
+            nodes = {self: root_node}
+            if view & DENODO_VIEW:
+                branches = [(folder, root_node) for folder in reversed(self.build_denodo_view(self.gui))]
+                while branches:
+                    item, parent_node = branches.pop()
+                    node = ViewNode(item, parent_node)
+                    nodes[item] = node
+                    if not isinstance(item, CodeItem):
+                        branches.extend((child, node) for child in reversed(item.child_items))
             else:
-                pass
-        elif mode & DENODO_VIEW:
-            if self.storage_list:
-                self.switch_view()
-                self.view = DENODO_VIEW
-                return True
-            else:
-                # build denodo view
-                if self.build_denodo_view(gui):
-                    if self.storage_list:
-                        self.switch_view()
-                        self.view = DENODO_VIEW
-                        return True
-        return False
+                for chapter in self.chapters:
+                    chapter_node = ViewNode(chapter, root_node)
+                    nodes[chapter] = chapter_node
+                    for code_item in chapter.code_items:
+                        nodes[code_item] = ViewNode(code_item, chapter_node)
+            self.views[view] = (root_node, nodes)
+        return self.views[view]
+
+    def invalidate_views(self):
+        """Drops the views after the model has changed, they are rebuilt when asked for.
+        A TreeModel keeps the nodes of its view until it is reset.
 
-    def switch_view(self):
-        """Method to switch view between VQL or Denodo file structure.
-        Store the children of the root item in the storage_list and replace them with the stored ones.
+        :return: None
+        """
+        self.views = dict()
+
+    def update_branch_selection(self):
+        """Updates the selected and tristate flags of the chapters and Denodo folders from their code items.
+        A code item is in both a chapter and a folder, a change of its selection in one view shows in the other.
 
         :return: None
         """
-        self.storage_list, self.child_items = self.child_items, self.storage_list
+        def update(branch: TreeItem)->Tuple[bool, bool]:
+            """Updates a branch and the branches below it
+
+            :param branch: the chapter or folder
+            :return: tuple with any and all of the code items below the branch selected, (False, True) if none
+            """
+            any_selected, all_selected = False, True
+            for child in branch.child_items:
+                if isinstance(child, CodeItem):
+                    child_any, child_all = child.selected, child.selected
+                else:
+                    child_any, child_all = update(child)
+                any_selected = any_selected or child_any
+                all_selected = all_selected and child_all
+            if branch.child_items and (any_selected or not all_selected):
+                branch.selected = any_selected
+                branch.tristate = any_selected and not all_selected
+            return any_selected, all_selected
+
+        for chapter in self.chapters:
+            update(chapter)
+        if DENODO_VIEW in self.views:
+            for folder in self.views[DENODO_VIEW][0].children:
+                update(folder.item)
 
     def add_chapters(self, chapter_names: List[str]):
         """Method that adds a chapter to the chapter list for every name given.
@@ -3717,14 +5902,107 @@ class RootItem(TreeItem):
             to_be_removed.append(code_item.remove_compare())
         for code_item in to_be_removed:
             if code_item:
-                code_item.parent_item.remove_child(code_item)
+                code_item.chapter.remove_child(code_item)
+        self.gui = GUI_SELECT
+        self.invalidate_views()
+        self.graph.invalidate()
+        self.search_index.remove_version(COMPARE_CODE)
+        self.name_index.build(self.get_code_items())
+        diff_cache.clear()
+        merge_cache.clear()
+
+    def update_three_way_colors(self):
+        """Colors the code items on their three-way merge status; changes in one model are yellow,
+        or green if the object is new, deletions are red and changes in both models are orange.
+
+        :return: None
+        """
+        for code_item in self.get_code_items():
+            status = code_item.get_merge_status()
+            if status == MERGE_SAME:
+                code_item.color = white
+            elif status == MERGE_DELETED:
+                code_item.color = red
+            elif status == MERGE_BASE or status == MERGE_COMPARE:
+                code_item.color = yellow if code_item.ancestor_data.code else green
+            else:
+                code_item.color = orange
+        for chapter in self.chapters:
+            chapter.set_color_based_on_children()
+
+    def get_merged_code(self)->List[Tuple[Chapter, List[Tuple[CodeItem, str, str]]]]:
+        """Returns the three-way merged code of all code items per chapter, deleted objects are left out.
+        The code items are ordered on the dependencies of the compare code.
+
+        :return: list with tuples of a chapter and a list with tuples of a code item, its merge status and code
+        """
+        result = list()
+        for chapter in self.chapters:
+            merged = list()
+            for code_item in chapter.get_ordered_code_items(GUI_COMPARE, False):
+                status, code = code_item.get_merge()
+                if status != MERGE_DELETED:
+                    merged.append((code_item, status, code))
+            result.append((chapter, merged))
+        return result
+
+    @staticmethod
+    def get_merged_code_as_file(merged_code: List[Tuple[Chapter, List[Tuple[CodeItem, str, str]]]])->str:
+        """Puts the merged code in a single .vql file
+
+        :param merged_code: the merged code as returned by get_merged_code
+        :return: string of code content
+        """
+        code = [chapter.header + '\n'.join(item_code for _, _, item_code in merged)
+                for chapter, merged in merged_code]
+        return PROP_QUOTE + '\n'.join(code)
+
+    @staticmethod
+    def get_merged_files(merged_code: List[Tuple[Chapter, List[Tuple[CodeItem, str, str]]]],
+                         base_repository_folder: Path)->List[Tuple[Path, str]]:
+        """Returns the part.log files and code files of a repository with the merged code
+
+        :param merged_code: the merged code as returned by get_merged_code
+        :param base_repository_folder: the folder to save the repository to
+        :return: list with tuples of file paths and content
+        """
+        files = list()
+        for chapter, merged in merged_code:
+            if not merged:
+                continue
+            chapter_folder = base_repository_folder / chapter.name
+            item_paths = [code_item.get_file_path(chapter_folder) for code_item, _, _ in merged]
+            files.append((chapter_folder / LOG_FILE_NAME, '\n'.join(str(item_path) for item_path in item_paths)))
+            files.extend((item_path, item_code) for item_path, (_, _, item_code) in zip(item_paths, merged))
+        return files
+
+    def update_compare_colors(self)->int:
+        """Recolors the code items present in both the base and the compare code,
+        after the normalization of the code_normalizer has changed.
+
+        :return: the number of changed items
+        """
+        changed = 0
+        for code_item in self.get_code_items():
+            if code_item.color in (white, yellow) and code_item.base_data.code and code_item.compare_data.code:
+                for data in (code_item.base_data, code_item.compare_data):
+                    data.normalized_fingerprint = ''
+                equal = code_normalizer.is_equal(code_item.base_data, code_item.compare_data)
+                code_item.color = white if equal else yellow
+                if not equal:
+                    changed += 1
+        for chapter in self.chapters:
+            chapter.set_color_based_on_children()
+        return changed
 
-    def parse(self, file_content: str, mode: int, bar: QStatusBar, icons: dict, logger: LogWrapper):
+    def parse(self, file_content: Union[str, MappedExport], mode: int, bar: QStatusBar, icons: dict,
+              logger: LogWrapper):
         """Parses the file content to build up a tree structure with chapters and code items
         in both GUI_SELECT and GUI_COMPARE states.
 
         :param file_content: the file contents as a string, if a repository is opened,
-            the code is bundled in this file content as well before it is send here
+            the code is bundled in this file content as well before it is send here.
+            A large export is a mapped export, the code items then keep the offsets of their code in the file
         :param mode: mode flag carrying info about the current gui, type of file etc
         :param bar: the status bar of QMainWindow
         :param icons: the dict with icons for code items and chapters
@@ -3734,28 +6012,38 @@ class RootItem(TreeItem):
         logger.info('Start parsing data.')
         gui = GUI_NONE
 
-        if mode & (BASE_FILE | BASE_REPO):
+        if mode & ANCE_LOADED:
+            merge_cache.clear()
+            for code_item in self.get_code_items():
+                code_item.ancestor_data = ItemData(code_item)
+        elif mode & (BASE_FILE | BASE_REPO):
             gui = GUI_SELECT
         elif mode & (COMP_FILE | COMP_REPO):
             gui = GUI_COMPARE
+            diff_cache.clear()
             # set all items to red, indicating they are lost.. this will later change if not
             # self.remove_compare()
 
-        # remove possible crab above first chapter
+        # skip possible crab above first chapter
+        first_index = 0
         for chapter in self.chapters:
             start_index = file_content.find(chapter.header)
             if not start_index == -1:
-                file_content = file_content[start_index:]
+                first_index = start_index
                 break
 
         # construct a list with indices where chapters start
         indices = list()
         for chapter in self.chapters:
-            start_string_index = file_content.find(chapter.header)
+            start_string_index = file_content.find(chapter.header, first_index)
             if start_string_index == -1:
                 continue
             indices.append((chapter, start_string_index))
         indices.append(('', len(file_content)))
+        export = file_content if isinstance(file_content, MappedExport) else None
+
+        # fingerprints of the loaded code items, to skip objects repeated in the bundled exports of a repository
+        loaded = dict()
 
         # extract data from the file
         # zip the indices shifted one item to get start and end of the chapter code
@@ -3765,21 +6053,37 @@ class RootItem(TreeItem):
             next_chapter, end = end_tuple
             if start == -1:
                 continue
-            chapter_part = file_content[start:end]   # << contains chapter code
-            chapter_objects = chapter_part.split(DELIMITER)[1:]  # split on CREATE OR REPLACE
-            for chapter_object in chapter_objects:
-                code = DELIMITER + chapter_object  # << put back the delimiter
-                code = code
+            # the objects in the chapter code run from a CREATE OR REPLACE up to the next one
+            object_start = file_content.find(DELIMITER, start, end)
+            while not object_start == -1:
+                object_end = file_content.find(DELIMITER, object_start + 1, end)
+                if object_end == -1:
+                    object_end = end
+                code = file_content[object_start:object_end]
+                location = (export, object_start, object_end - object_start) if export else ()
+                object_start = -1 if object_end == end else object_end
                 object_name = CodeItem.extract_object_name_from_code(chapter.name, code)  # extract object name
                 bar.showMessage(f"Loading: {object_name}")
                 logger.info(f"Loading: {object_name}")
                 if not object_name:
                     continue
-                if gui == GUI_SELECT:
+                if mode & ANCE_LOADED:
+                    # only the ancestors of existing code items matter, objects deleted in both models are left out
+                    i = chapter.get_child_index_by_name(object_name)
+                    if i > -1:
+                        chapter.code_items[i].ancestor_data.set_code(code, *location)
+                elif gui == GUI_SELECT:
+                    # the fingerprint made by set_code also finds the duplicates
+                    data = ItemData(None)
+                    data.set_code(code, *location)
+                    if loaded.get((chapter.name, object_name)) == data.fingerprint:
+                        logger.info(f"Skipping duplicate: {object_name}")
+                        continue
+                    loaded[(chapter.name, object_name)] = data.fingerprint
                     # add the code item to the chapter
                     code_item = CodeItem(chapter, object_name)
-                    data = code_item.base_data
-                    data.code = code
+                    code_item.base_data = data
+                    data.dependees_tree = code_item
                     data.denodo_path = CodeItem.extract_denodo_folder_name_from_code(chapter.name, code)
                     code_item.icon = icons[chapter.name]
 
@@ -3790,23 +6094,25 @@ class RootItem(TreeItem):
                         # an existing code item
                         code_item = chapter.code_items[i]
                         data = code_item.compare_data
-                        data.code = code
+                        data.set_code(code, *location)
                         data.denodo_path = CodeItem.extract_denodo_folder_name_from_code(chapter.name, code)
-                        base_code = code_item.base_data.code
-                        if code.strip() == base_code.strip():
-                            code_item.color = white
-                        else:
-                            code_item.color = yellow
+                        code_item.color = white if code_normalizer.is_equal(code_item.base_data, data) else yellow
                         index = i
                     else:  # code object does not yet exist
                         code_item = CodeItem(chapter, object_name, index=index + 1)
                         data = code_item.compare_data
-                        data.code = code
+                        data.set_code(code, *location)
                         data.denodo_path = CodeItem.extract_denodo_folder_name_from_code(chapter.name, code)
                         code_item.color = green
                         code_item.icon = icons[chapter.name]
                         index += 1
 
+        if mode & ANCE_LOADED:
+            # the dependencies do not change, only the colors
+            self.update_three_way_colors()
+            logger.info('Finished parsing data.')
+            return True
+
         if mode & (COMP_FILE | COMP_REPO):
             for code_item in self.get_code_items():
                 if code_item.base_data.code and not code_item.compare_data.code:
@@ -3814,9 +6120,22 @@ class RootItem(TreeItem):
                     code_item.set_selected(False)
             for chapter in self.chapters:
                 chapter.set_color_based_on_children()
+        logger.info(f"Indexing code ...")
+        if gui & GUI_SELECT:
+            self.search_index.clear()
+            for code_item in self.get_code_items():
+                self.search_index.add(code_item, ORIGINAL_CODE, code_item.base_data.code)
+        else:
+            for code_item in self.get_code_items():
+                self.search_index.add(code_item, COMPARE_CODE, code_item.compare_data.code)
+        self.name_index.build(self.get_code_items())
+
         logger.info(f"Analyzing objects ...")
 
         self.get_dependencies(gui, bar)
+        self.graph.invalidate()
+        self.gui = gui
+        self.invalidate_views()
 
         # formatting the tree items
         if gui & GUI_SELECT:
@@ -3851,44 +6170,6 @@ class RootItem(TreeItem):
                     new_list.append(_item)
             return new_list
 
-        # helper function
-        def find_dependencies(_code_objects: List[Tuple[CodeItem, str, str]],
-                              _underlying_code_objects: List[Tuple[CodeItem, str, str]], _search_template: str):
-            """Function finds and adds the direct dependencies of code objects
-            in the lower-cased code of underlying objects.
-            Basically it looks for the code_item's object name in the code of the underlying objects
-            via a particular search string per chapter type.
-            :param _code_objects: a list of tuples (code object, object name, code)
-            :param _underlying_code_objects: a list of tuples (code object, object name, code) of underlying objects
-            :param _search_template: a template for the search string in which the object names can be put
-            :return: None
-            """
-            for _code_item, _, code in _code_objects:
-                bar.showMessage(f"Analyzing: {_code_item.name}")
-                for other_code_item, other_name, other_code in _underlying_code_objects:
-                    search_string = _search_template.replace(place_holder, other_name)
-                    if not code.find(search_string) == -1:
-                        _data = _code_item.get_context_data(gui)
-                        _data.dependencies.append(other_code_item)
-                        _data = other_code_item.get_context_data(gui)
-                        _data.dependees.append(_code_item)
-
-        # helper function
-        def code_items_lower(_chapter: Chapter)->List[Tuple[CodeItem, str, str]]:
-            """
-            Returns a list of code items with their code and object names in lower case of a particular chapter
-            :param _chapter: the chapter name
-            :return: the requested list of tuples
-            """
-            items = None
-            if gui & GUI_SELECT:
-                items = [(_code_item, _code_item.name.lower(), _code_item.base_data.code.lower())
-                         for _code_item in self.get_code_items(chapter=_chapter)]
-            elif gui & GUI_COMPARE:
-                items = [(_code_item, _code_item.name.lower(), _code_item.compare_data.code.lower())
-                         for _code_item in self.get_code_items(chapter=_chapter)]
-            return items
-
         # construct the searches in a list of tuples:
         # 1 the items analysed
         # 2 the underlying items
@@ -3917,13 +6198,38 @@ class RootItem(TreeItem):
         # to count associations are dependees too switch the following line on
         # searches.append(('ASSOCIATIONS', 'VIEWS', f" {place_holder} "))
 
-        # perform the searches and store dependencies
-        for chapter_name, underlying_chapter_name, search_template in searches:
-            chapter = Chapter.get_chapter_by_name(self.chapters, chapter_name)
+        # the search strings with the lower-cased names of the underlying items, made once for all code items
+        # the searches are grouped per analysed chapter, keeping their number to store the results in order
+        # and the part of the search string before the name, without it in the code the search is skipped
+        names = {code_item: code_item.name.lower() for code_item in self.get_code_items()}
+        chapter_searches = OrderedDict()
+        for number, (chapter_name, underlying_chapter_name, search_template) in enumerate(searches):
             underlying_chapter = Chapter.get_chapter_by_name(self.chapters, underlying_chapter_name)
-            code_objects = code_items_lower(chapter)
-            underlying_code_objects = code_items_lower(underlying_chapter)
-            find_dependencies(code_objects, underlying_code_objects, search_template)
+            search_strings = [(other_code_item, search_template.replace(place_holder, names[other_code_item]))
+                              for other_code_item in self.get_code_items(chapter=underlying_chapter)]
+            prefix = search_template.split(place_holder)[0]
+            chapter_searches.setdefault(chapter_name, list()).append((number, prefix, search_strings))
+
+        # perform the searches, the code of a code item is lower-cased once for all searches in its chapter
+        found = [list() for _ in searches]
+        for chapter_name, chapter_search_strings in chapter_searches.items():
+            chapter = Chapter.get_chapter_by_name(self.chapters, chapter_name)
+            for code_item in self.get_code_items(chapter=chapter):
+                bar.showMessage(f"Analyzing: {code_item.name}")
+                code = code_item.get_context_data(gui).code.lower()
+                for number, prefix, search_strings in chapter_search_strings:
+                    if prefix not in code:
+                        continue
+                    found_items = found[number]
+                    for other_code_item, search_string in search_strings:
+                        if search_string in code:
+                            found_items.append((code_item, other_code_item))
+
+        # store dependencies in the order of the searches
+        for found_items in found:
+            for code_item, other_code_item in found_items:
+                code_item.get_context_data(gui).dependencies.append(other_code_item)
+                other_code_item.get_context_data(gui).dependees.append(code_item)
 
         # clean up the lists
         for code_item in self.get_code_items():
@@ -3944,82 +6250,81 @@ class RootItem(TreeItem):
             for item in to_be_removed:
                 data.dependees.remove(item)
 
-    def build_denodo_view(self, gui: int)->bool:
-        """Method that builds up the Denodo folder structure.
+    def build_denodo_view(self, gui: int)->List[DenodoFolder]:
+        """Method that builds up the Denodo folder structure, used by get_view.
 
-        This structure is stored in the storage list
-        and shown when the view is switched.
+        The code items are grouped on their Denodo path in a single pass, then every distinct path is looked up
+        in a trie of the folders keyed by the case folded folder names, so every folder is created once.
+        Items lost in the compare code are put in their folder in the base code.
+        The code items are added to the child items of their folder, their parent stays their chapter.
         :param gui: flag to indicate compare or normal select operations
-        :return: Success or not
+        :return: the top level folders
         """
-
-        def child_exists(item_name: str, parent: TreeItem) -> Union[TreeItem, None]:
-            """Checks if a child already exists and if so, returns that child, None otherwise
-
-            :param item_name: name of the child
-            :param parent: The parent denodo folder
-            :return: the child if found, None otherwise
-            """
-            if not parent:
-                return None
-
-            for _child in parent.child_items:
-                if _child.name.lower() == item_name.lower():
-                    return _child
-            return None
-
-        def get_folders()->dict:
-            """Returns a dictionary with all denodo folder paths as key and a list of code_items in this path as value
-            :return: the folders
-            """
-            _folders = dict()
-            for chapter in self.chapters:
-                for _code_item in chapter.code_items:
-                    if chapter.name != 'FOLDERS':
-                        _data = _code_item.get_context_data(gui)
-                        denodo_path = _data.denodo_path
-                        if gui & GUI_COMPARE and not denodo_path:  # account for lost items
-                            denodo_path = _code_item.data.denodo_path
-                        if denodo_path not in _folders.keys():
-                            _folders[denodo_path] = list()
-                            _folders[denodo_path].append(_code_item)
-                        else:
-                            _folders[denodo_path].append(_code_item)
-            return _folders
+        # the code items per Denodo path, keyed by the path as string which hashes faster than the path
+        folders = OrderedDict()
+        for code_item in self.get_code_items():
+            if code_item.chapter.name == 'FOLDERS':
+                continue
+            data = code_item.get_context_data(gui)
+            if gui & GUI_COMPARE and not data.code:  # account for lost items
+                data = code_item.base_data
+            if data.denodo_path:
+                key = str(data.denodo_path)
+                folder = folders.get(key)
+                if folder is None:
+                    folders[key] = folder = (data.denodo_path.parts, list())
+                folder[1].append(code_item)
 
         root = TreeItem(DenodoFolder)
-        folder_item = None
-        folders = get_folders()
-        folder_parts = ((folder.parts, code_items) for folder, code_items in folders.items() if folder)
-
-        for parts, code_items in folder_parts:
-            old_parent = root
+        # the trie: per folder its sub folders by case folded name
+        sub_folders = {root: dict()}
+        for parts, code_items in folders.values():
+            folder = root
             for part in parts:
-                if part != '/':
-                    folder_item = child_exists(part, old_parent)
-                    if not folder_item:
-                        folder_item = DenodoFolder(old_parent, part)
-                    old_parent = folder_item
-            if folder_item:
-                for code_item in code_items:
-                    code_item.set_parent(folder_item)
-
-        for child in root.child_items:
+                if part == '/':
+                    continue
+                key = part.casefold()
+                sub_folder = sub_folders[folder].get(key)
+                if sub_folder is None:
+                    sub_folder = DenodoFolder(folder, part)
+                    sub_folders[folder][key] = sub_folder
+                    sub_folders[sub_folder] = dict()
+                folder = sub_folder
+            if folder is not root:
+                folder.child_items.extend(code_items)
+
+        denodo_folders = root.take_children()
+        for child in denodo_folders:
             child.parent_item = self
+        return denodo_folders
 
-        self.storage_list = root.take_children()
-        return True
-
-    def get_part_logs(self, base_repository_folder: Path)->List[Tuple[Path, str]]:
+    def get_part_logs(self, base_repository_folder: Path, mode: int)->List[Tuple[Path, str]]:
         """Returns all part.log data for saving a repository given a base repository folder.
         Only selected chapters and code items are included.
 
         :param base_repository_folder: The folder to save the repo to
+        :param mode: GUI indicator either GUI_SELECT or GUI_COMPARE
         :return: List with tuples of filepaths and part.log content
         """
-        result = list([chapter.get_part_log(base_repository_folder) for chapter in self.chapters if chapter.selected])
+        result = list([chapter.get_part_log(base_repository_folder, mode)
+                       for chapter in self.chapters if chapter.selected])
         return result
 
+    def get_dependency_cycles(self, mode: int, selected: bool)->List[List[CodeItem]]:
+        """Returns the circular dependencies within chapters, these can not be ordered for execution
+
+        :param mode: GUI indicator either GUI_SELECT or GUI_COMPARE
+        :param selected: Only selected items or not
+        :return: list of cycles, each a list of code items
+        """
+        gui = GUI_SELECT if mode & GUI_SELECT else GUI_COMPARE
+        cycles = list()
+        for chapter in self.chapters:
+            code_items = [code_item for code_item in chapter.code_items if code_item.selected or not selected]
+            _, chapter_cycles = DependencyGraph.topological_order(code_items, gui)
+            cycles.extend(chapter_cycles)
+        return cycles
+
     def get_code_as_file(self, mode: int, selected: bool)->str:
         """Function that puts the code content in a single .vql file of all items.
         If selected is True, only selected items are included.
@@ -4030,13 +6335,40 @@ class RootItem(TreeItem):
         code = [chapter.get_code_as_file(mode, selected) for chapter in self.chapters]
         return PROP_QUOTE + '\n'.join(code)
 
-    def get_selected_code_files(self, mode: int, base_repository_folder: Path)->List[Tuple[Path, str]]:
+    def get_compare_report(self)->List[dict]:
+        """Returns the changed, new and lost code items in compare mode, with the difference statistics
+        of changed items if they are computed.
+
+        :return: list with a dict per code item, with the keys in COMPARE_REPORT_FIELDS
+        """
+        status = {yellow: 'changed', green: 'new', red: 'lost'}
+        report = list()
+        for code_item in self.get_code_items():
+            if code_item.color not in status:
+                continue
+            line = dict.fromkeys(COMPARE_REPORT_FIELDS)
+            line['type'] = code_item.object_type()
+            line['name'] = code_item.name
+            line['status'] = status[code_item.color]
+            line['base_fingerprint'] = code_item.base_data.fingerprint
+            line['compare_fingerprint'] = code_item.compare_data.fingerprint
+            stats = code_item.compare_data.diff_stats
+            if stats:
+                line['insertions'] = stats.insertions
+                line['deletions'] = stats.deletions
+                line['distance'] = stats.distance
+                line['whitespace_only'] = stats.whitespace_only
+                line['case_only'] = stats.case_only
+            report.append(line)
+        return report
+
+    def get_selected_code_files(self, mode: int, base_repository_folder: Path)->List[Tuple[Path, str, str]]:
         """Function for looping over all selected code items in the model.
         This function is used to write the repository.
         
         :param mode: the mode to select which code; either GUI_SELECT or GUI_COMPARE
         :param base_repository_folder: the proposed folder for storage
-        :return: a list with tuples: filepath and code content
+        :return: a list with tuples: filepath, code content and its fingerprint
         """
         item_path_code = list()
         for chapter in self.chapters:
@@ -4045,26 +6377,278 @@ class RootItem(TreeItem):
             for code_item in items:
                 item_path = code_item.get_file_path(chapter_folder)
                 if mode & COMP_LOADED:
-                    item_code = code_item.compare_data.code
+                    data = code_item.compare_data
                 elif mode & BASE_LOADED:
-                    item_code = code_item.base_data.code
+                    data = code_item.base_data
                 else:
-                    item_code = ''
-                item_path_code.append((item_path, item_code))
+                    item_path_code.append((item_path, '', ''))
+                    continue
+                item_path_code.append((item_path, data.code, data.fingerprint))
         return item_path_code
 
 
+def scan_code(job: Tuple[str, List[Tuple[int, str]]])->List[int]:
+    """Returns the code pieces matching a regular expression, ignoring case.
+    This function runs in the worker processes of a process pool, so it only takes and returns plain data.
+
+    :param job: tuple with the regular expression and a list with tuples of an index and a code piece
+    :return: list with the indices of the matching code pieces
+    """
+    pattern, pieces = job
+    regex = compile(pattern, IGNORECASE)
+    return [index for index, code in pieces if regex.search(code)]
+
+
+class QueryEngine:
+    """Structural query engine over the code items of a RootItem.
+    A query consists of whitespace separated terms that must all match, a term starting with - must not match:
+
+        chapter:"base views"    the chapter, a term matches the chapter with that name or else the chapters
+                                starting with it, e.g. chapter:base
+        name:customer_*         the name of the object, * matches any text and ? a single character,
+                                a term without a field matches the names containing it
+        path:/sales             the Denodo folder, a folder without wildcards includes its sub folders
+        status:changed          the color in the tree: new, changed, lost, unchanged, conflict or a color name
+        dependencies:>2         the number of direct dependencies, also <n, <=n, >=n and n
+        dependees:0             the number of direct dependees
+        uses:ds_sales           depends, directly or indirectly, on the objects with the name
+        code:flatten            the code contains the words, the words in double quotes as a phrase
+        code:/jdbc\\s+w1\\b/     the code matches the regular expression, ignoring case
+
+    Terms on names, words in the code and uses are evaluated with the indexes of the root item.
+    The other terms are checked on the code items left, regular expressions on the code last,
+    with a process pool if there is a lot of code to scan. Both the base and the compare code are searched,
+    the dependencies and Denodo folders are those of the given context.
+    """
+    __slots__ = ['root_item', 'gui']
+
+    TERM = compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"|/((?:\\.|[^/\\])+)/(?=\s|$)|(\S+))')
+    FIELDS = ('chapter', 'name', 'path', 'status', 'dependencies', 'dependees', 'uses', 'code')
+    STATUS = {'new': green, 'changed': yellow, 'lost': red, 'unchanged': white, 'conflict': orange,
+              'green': green, 'yellow': yellow, 'red': red, 'white': white, 'orange': orange}
+    DEGREE = compile(r'(<=|>=|<|>|=)?(\d+)$')
+    OPERATORS = {'<': lt, '<=': le, '': eq, '=': eq, '>=': ge, '>': gt}
+
+    def __init__(self, root_item: RootItem, gui: int):
+        """Initializer of the class
+
+        :param root_item: the root item with the code items and their indexes
+        :param gui: the context used, either GUI_SELECT or GUI_COMPARE
+        """
+        self.root_item = root_item
+        self.gui = gui
+
+    @classmethod
+    def status_name(cls, color: str)->str:
+        """Returns the status of a color in a compare
+
+        :param color: the color of a code item
+        :return: the status, new, changed, lost, unchanged or conflict
+        """
+        return next(status for status, status_color in cls.STATUS.items() if status_color == color)
+
+    def parse(self, query: str)->List[Tuple[bool, str, str, str]]:
+        """Splits a query in terms
+
+        :param query: the query
+        :return: list with tuples of negated, the field, the value and its kind: 'text', 'phrase' or 'regex'
+        :raises ValueError: if a field is unknown
+        """
+        terms = list()
+        for negated, field, phrase, regex, text in self.TERM.findall(query):
+            field = field.lower()
+            if field and field not in self.FIELDS:
+                raise ValueError(f"Unknown field {field}:, use one of {', '.join(self.FIELDS)}")
+            kind = 'phrase' if phrase else 'regex' if regex else 'text'
+            value = phrase or regex or text
+            if value:
+                terms.append((bool(negated), field, value, kind))
+        return terms
+
+    def get_data(self, code_item: CodeItem)->ItemData:
+        """Returns the data of a code item in the context, items lost in the compare code have their base data
+
+        :param code_item: the code item
+        :return: the item data
+        """
+        if self.gui & GUI_COMPARE and code_item.color == red:
+            return code_item.base_data
+        return code_item.get_context_data(self.gui)
+
+    def get_folder(self, code_item: CodeItem)->str:
+        """Returns the Denodo folder of a code item in the context as an absolute lower-cased path
+
+        :param code_item: the code item
+        :return: the folder, '/' if the object is not in a folder
+        """
+        denodo_path = self.get_data(code_item).denodo_path
+        return '/' + str(denodo_path).strip('/') if denodo_path and str(denodo_path) != '.' else '/'
+
+    @staticmethod
+    def compile_regex(pattern: str):
+        """Compiles a regular expression of a query, ignoring case
+
+        :param pattern: the regular expression
+        :return: the compiled regular expression
+        :raises ValueError: if the regular expression is invalid
+        """
+        try:
+            return compile(pattern, IGNORECASE)
+        except RegexError as error:
+            raise ValueError(f"Invalid regular expression /{pattern}/: {error}")
+
+    def get_index_term(self, field: str, value: str, kind: str)->Union[set, None]:
+        """Evaluates a term with the indexes of the root item
+
+        :param field: the field of the term
+        :param value: the value of the term
+        :param kind: the kind of the value: 'text', 'phrase' or 'regex'
+        :return: set with the matching code items, or None if the term can not be evaluated with an index
+        """
+        root_item = self.root_item
+        if kind == 'regex':
+            return None
+        if field == 'code':
+            query = f'"{value}"' if kind == 'phrase' else value
+            return {code_item for code_item, _ in root_item.search_index.search(query)}
+        elif field == 'name':
+            return set(root_item.name_index.match(value))
+        elif not field:
+            pattern = value if any(char in value for char in '*?[') else f"*{value}*"
+            return set(root_item.name_index.match(pattern))
+        elif field == 'uses':
+            return set(chain.from_iterable(root_item.graph.dependees(code_item, self.gui)
+                                           for code_item in root_item.name_index.match(value)))
+        return None
+
+    def get_predicate(self, field: str, value: str, kind: str)->Callable[[CodeItem], bool]:
+        """Returns a function checking a term on a code item
+
+        :param field: the field of the term
+        :param value: the value of the term
+        :param kind: the kind of the value: 'text', 'phrase' or 'regex'
+        :return: the function
+        :raises ValueError: if the value is invalid for the field
+        """
+        if kind == 'regex' and field in ('', 'name'):
+            regex = self.compile_regex(value)
+            return lambda code_item: bool(regex.search(code_item.name))
+        if kind == 'regex':
+            value = f"/{value}/"
+        value = value.lower()
+
+        if field == 'chapter':
+            names = [chapter_name for chapter_name in CHAPTER_NAMES if chapter_name.lower() == value]
+            names = names or [chapter_name for chapter_name in CHAPTER_NAMES if chapter_name.lower().startswith(value)]
+            if not names:
+                raise ValueError(f"Unknown chapter {value}")
+            return lambda code_item: code_item.chapter.name in names
+        elif field == 'path':
+            folder = '/' + value.strip('/')
+            if any(char in folder for char in '*?['):
+                return lambda code_item: fnmatchcase(self.get_folder(code_item), folder)
+            folder = folder.rstrip('/') + '/'
+            return lambda code_item: (self.get_folder(code_item).rstrip('/') + '/').startswith(folder)
+        elif field == 'status':
+            color = self.STATUS.get(value)
+            if not color:
+                raise ValueError(f"Unknown status {value}, use one of {', '.join(self.STATUS)}")
+            return lambda code_item: code_item.color == color
+        elif field in ('dependencies', 'dependees'):
+            found = self.DEGREE.match(value)
+            if not found:
+                raise ValueError(f"Invalid number {value} for {field}:, use for example 0, >2 or <=3")
+            operator, number = self.OPERATORS[found.group(1) or ''], int(found.group(2))
+            upstream = field == 'dependencies'
+            return lambda code_item: operator(len(DependencyGraph.neighbours(code_item, self.gui, upstream)), number)
+        raise ValueError(f"The field {field}: can not be used with {value}")
+
+    def scan(self, regex, code_items: List[CodeItem])->set:
+        """Returns the code items whose base or compare code matches a regular expression.
+        Large amounts of code are scanned in parallel with a process pool, if that fails in this process.
+
+        :param regex: the compiled regular expression
+        :param code_items: the code items scanned
+        :return: set with the matching code items
+        """
+        pieces = [(i, code) for i, code_item in enumerate(code_items)
+                  for code in (code_item.base_data.code, code_item.compare_data.code) if code]
+        found = None
+        if sum(len(code) for _, code in pieces) >= QUERY_POOL_SIZE:
+            jobs = list()
+            job = list()
+            size = 0
+            for piece in pieces:
+                job.append(piece)
+                size += len(piece[1])
+                if size >= QUERY_JOB_SIZE:
+                    jobs.append((regex.pattern, job))
+                    job = list()
+                    size = 0
+            if job:
+                jobs.append((regex.pattern, job))
+            try:
+                # spawned workers do not inherit the state of the gui process and its threads
+                with ProcessPoolExecutor(mp_context=get_context('spawn')) as pool:
+                    found = set(chain.from_iterable(pool.map(scan_code, jobs)))
+            except (OSError, RuntimeError, BrokenProcessPool):
+                found = None
+        if found is None:
+            found = scan_code((regex.pattern, pieces))
+        return {code_items[i] for i in found}
+
+    def search(self, query: str)->List[CodeItem]:
+        """Returns the code items matching all terms of the query, in the order of the chapters
+
+        :param query: the query
+        :return: list of code items
+        :raises ValueError: if the query is invalid
+        """
+        index_terms = list()
+        predicates = list()
+        regexes = list()
+        for negated, field, value, kind in self.parse(query):
+            if field == 'code' and kind == 'regex':
+                regexes.append((negated, self.compile_regex(value)))
+                continue
+            code_items = self.get_index_term(field, value, kind)
+            if code_items is None:
+                predicates.append((negated, self.get_predicate(field, value, kind)))
+            else:
+                index_terms.append((negated, code_items))
+
+        code_items = self.root_item.get_code_items()
+        included = sorted((items for negated, items in index_terms if not negated), key=len)
+        if included:
+            candidates = included[0].intersection(*included[1:])
+            code_items = (code_item for code_item in code_items if code_item in candidates)
+        excluded = set().union(*(items for negated, items in index_terms if negated))
+        result = [code_item for code_item in code_items if code_item not in excluded
+                  and all(predicate(code_item) != negated for negated, predicate in predicates)]
+
+        for negated, regex in regexes:
+            if not result:
+                break
+            found = self.scan(regex, result)
+            result = [code_item for code_item in result if (code_item in found) != negated]
+        return result
+
+
 class Dependee(TreeItem):
-        """Wrapper Class representing a dependee code item"""
-        __slots__ = ['code_item', 'gui', 'dependee_code_items']
+        """Wrapper Class representing a dependee code item
+        The children of a dependee are only created when the tree view asks for them (see DependencyModel.fetchMore).
+        A dependee is shared if its code item is already shown elsewhere in the tree, its dependees are not repeated.
+        """
+        __slots__ = ['code_item', 'gui', 'dependee_code_items', 'depth', 'fetched', 'shared']
 
         # noinspection PyMissingConstructor
-        def __init__(self, parent: Union[TreeItem, None], code_item: CodeItem, gui):
+        def __init__(self, parent: Union[TreeItem, None], code_item: CodeItem, gui, shared: bool=False):
             """
             Class Initializer
             :param parent: the parent dependee, this code object is dependent on
             :param code_item: the code item this dependee represents
             :param gui: the gui state, either GUI_SELECT or GUI_COMPARE
+            :param shared: True if the code item is already shown elsewhere in the tree
             """
             self.parent_item = parent
             self.class_type = Dependee
@@ -4072,18 +6656,36 @@ class Dependee(TreeItem):
             self.code_item = code_item
             self.column_data = [self.name]
             self.tooltip = code_item.tooltip
+            if shared:
+                self.tooltip += '\nDependees shown at the first occurrence of ' + code_item.name
             self.child_items = list()
             self.gui = gui
             self.color = white
             self.dependee_code_items = code_item.get_context_data(gui).dependees
-            for dependee in self.dependee_code_items:
-                child = Dependee(self, dependee, self.gui)
-                self.child_items.append(child)
+            self.depth = parent.depth + 1 if parent else 0
+            self.fetched = False
+            self.shared = shared
             self.node_type = TreeItem.BRANCH
             self.selected = True
             self.tristate = False
             self.icon = code_item.icon
 
+        def can_fetch_more(self)->bool:
+            """Returns True if the children of this dependee are not created yet
+
+            :return: Boolean
+            """
+            if self.fetched or self.shared or self.depth >= DEPENDEE_MAX_DEPTH:
+                return False
+            return True if self.dependee_code_items else False
+
+        def has_children(self)->bool:
+            """Returns True if this item has child items, or will have them when fetched
+
+            :return: Boolean if children present
+            """
+            return True if self.child_items or self.can_fetch_more() else False
+
         def clear(self):
             """Removes this item and all its descendants
 
@@ -4103,43 +6705,107 @@ class DependencyModel(QAbstractItemModel):
 
         :param parent: the treeview this model serves
         """
-        super().__init__(parent)
-        self.base_header = header
-        self.header = header
-        self.gui = GUI_SELECT
+        super().__init__(parent)
+        self.base_header = header
+        self.header = header
+        self.gui = GUI_SELECT
+
+        # Dependee root object releated to the root_code_item
+        self.root_item = None
+
+        # CodeItem object that is wrapped
+        self.root_code_item = None
+
+        # code items already in the tree and the number of Dependee objects created for the current root
+        self.shown_code_items = set()
+        self.node_count = 0
+
+    def fetch_limit(self, parent: Dependee)->int:
+        """Returns the number of children of a dependee that can be created within DEPENDEE_MAX_NODES
+
+        :param parent: the parent item
+        :return: the number of children
+        """
+        return max(0, min(len(parent.dependee_code_items), DEPENDEE_MAX_NODES - self.node_count))
+
+    def fetch_dependees(self, parent: Dependee)->int:
+        """Creates the children of a dependee, code items already shown in the tree become shared leaves.
+        No more children are created than DEPENDEE_MAX_NODES allows.
+
+        :param parent: the parent item
+        :return: the number of children created
+        """
+        children = list()
+        for dependee_code_item in parent.dependee_code_items[:self.fetch_limit(parent)]:
+            shared = dependee_code_item in self.shown_code_items
+            self.shown_code_items.add(dependee_code_item)
+            children.append(Dependee(parent, dependee_code_item, self.gui, shared))
+        parent.child_items = children
+        parent.fetched = True
+        self.node_count += len(children)
+        return len(children)
+
+    def prefetch(self, depth: int):
+        """Creates the dependee tree breadth first up to a depth, used before the tree view is expanded
+
+        :param depth: the number of levels created below the root
+        :return: None
+        """
+        level = [self.root_item]
+        for _ in range(depth):
+            next_level = list()
+            for item in level:
+                if self.node_count >= DEPENDEE_MAX_NODES:
+                    return
+                if item.can_fetch_more():
+                    self.fetch_dependees(item)
+                    next_level.extend(item.child_items)
+            level = next_level
 
-        # Dependee root object releated to the root_code_item
-        self.root_item = None
+    def canFetchMore(self, parent: QModelIndex)->bool:
+        """Called by the QTreeView to ask if the item of parent has children not created yet
 
-        # CodeItem object that is wrapped
-        self.root_code_item = None
+        :param parent: the QModelIndex representing the parent
+        :return: True if fetchMore can create children
+        """
+        if not self.root_item:
+            return False
+        if self.node_count >= DEPENDEE_MAX_NODES:
+            return False
+        parent_item = self.item_for_index(parent)
+        return parent_item.can_fetch_more()
 
-    def recurse_dependees(self, recurse: int, parent: Dependee):
-        """Recurrent function that builds up the dependee tree for a given parent item
+    def fetchMore(self, parent: QModelIndex):
+        """Called by the QTreeView to create the children of the item of parent, for instance on expansion
 
-        :param recurse: integer used internally to restrict stack overflow on recursion limit
-        :param parent: the parent item
+        :param parent: the QModelIndex representing the parent
         :return: None
         """
-        recurse += 1
-        if recurse == 700:
+        parent_item = self.item_for_index(parent)
+        if not parent_item.can_fetch_more():
+            return
+        count = self.fetch_limit(parent_item)
+        if not count:
             return
-        for dependee_code_item in parent.dependee_code_items:
-            dependee = Dependee(parent, dependee_code_item, self.gui)
-            self.recurse_dependees(recurse, dependee)
+        self.beginInsertRows(parent, 0, count - 1)
+        self.fetch_dependees(parent_item)
+        self.endInsertRows()
 
     def set_root_code_item(self, code_item: Union[CodeItem, None]):
-        """Sets the root item and build the related tree of dependees and resets the model
+        """Sets the root item and build the first levels of the tree of dependees and resets the model
 
         :param code_item: the base code item
         :return: None
         """
         self.root_code_item = code_item
         self.beginResetModel()
+        self.shown_code_items = set()
+        self.node_count = 0
         if code_item:
             self.header = self.base_header + ": " + code_item.name
             self.root_item = Dependee(None, code_item, self.gui)
-            self.recurse_dependees(0, self.root_item)
+            self.shown_code_items.add(code_item)
+            self.prefetch(DEPENDEE_PREFETCH_DEPTH)
         else:
             self.header = self.base_header
             self.root_item = None
@@ -4276,12 +6942,8 @@ class DependencyModel(QAbstractItemModel):
         if not parent.isValid():
             return self.root_item.column_count()
 
-        parent_item = parent.internalPointer()
-        if parent_item.has_children():
-            child = parent_item.child(0)
-            return child.column_count()
-        else:
-            return 0
+        # children of a dependee may not be fetched yet, all dependees have the same columns
+        return self.root_item.column_count()
 
     def item_for_index(self, index: QModelIndex)->Union[TreeItem, RootItem]:
         """Returns the TreeItem represented by index using its internalPointer() function
@@ -4316,6 +6978,77 @@ class DependencyModel(QAbstractItemModel):
         return False
 
 
+class FilterIndex:
+    """Precomputed visibility data for the proxy models.
+    For every item in the tree the number of CodeItems (leaves) below it is counted per color
+    and per selection state. This makes filtering a row a constant time lookup."""
+    __slots__ = ['color_counts', 'selected_counts', 'valid']
+
+    def __init__(self):
+        """Initializer of the class"""
+        self.color_counts = dict()
+        self.selected_counts = dict()
+        self.valid = False
+
+    def invalidate(self):
+        """Marks the index as outdated, it is rebuilt on the next lookup
+
+        :return: None
+        """
+        self.valid = False
+
+    def build(self, root_node: ViewNode):
+        """Rebuilds the index in a single pass over the tree, aggregating the counts of the leaves up the tree.
+
+        :param root_node: the root of the view shown in the tree
+        :return: None
+        """
+        self.color_counts = dict()
+        self.selected_counts = dict()
+        self.count_item(root_node)
+        self.valid = True
+
+    def count_item(self, node: ViewNode)->Tuple[dict, int]:
+        """Recursive helper of build, stores and returns the counts of the item of the given node
+
+        :param node: the node of the item counted
+        :return: Tuple with a dict of color counts and the count of selected leaves
+        """
+        item = node.item
+        if isinstance(item, CodeItem):
+            colors = {item.color: 1}
+            selected = 1 if item.selected else 0
+        else:
+            colors = dict()
+            selected = 0
+            for child in node.children:
+                child_colors, child_selected = self.count_item(child)
+                for color, count in child_colors.items():
+                    colors[color] = colors.get(color, 0) + count
+                selected += child_selected
+        self.color_counts[item] = colors
+        self.selected_counts[item] = selected
+        return colors, selected
+
+    def color_count(self, item: TreeItem, color: str)->int:
+        """Returns the number of CodeItems with the given color in or under the item
+
+        :param item: the item
+        :param color: the color
+        :return: the count
+        """
+        colors = self.color_counts.get(item)
+        return colors.get(color, 0) if colors else 0
+
+    def selected_count(self, item: TreeItem)->int:
+        """Returns the number of selected CodeItems in or under the item
+
+        :param item: the item
+        :return: the count
+        """
+        return self.selected_counts.get(item, 0)
+
+
 class ColorProxyModel(QSortFilterProxyModel):
     """Filter proxy model for treeview1 to allow color based filtering.
     this class overrides/implements several functions of QSortFilterProxyModel
@@ -4333,6 +7066,11 @@ class ColorProxyModel(QSortFilterProxyModel):
         self.header = header
         self.color_filter = None
         self.type_filter = None
+        self.show_diff_stats = False
+        # the code items matching the query of the filter bar, None if there is no query
+        self.query_filter = None
+        # per item in the tree: True if it or an item below it passes both the query and the color filter
+        self.query_matches = dict()
 
     def set_color_filter(self, color: str, type_filter):
         """Setter for the color and class types to be filtered.
@@ -4347,8 +7085,35 @@ class ColorProxyModel(QSortFilterProxyModel):
             self.beginResetModel()
             self.type_filter = type_filter
             self.color_filter = color
+            self.query_matches = dict()
             self.endResetModel()
 
+    def set_query_filter(self, code_items: Union[set, None]):
+        """Setter for the code items matching the query of the filter bar, only these are shown.
+
+        :param code_items: set of code items, or None to show all items
+        :return: None
+        """
+        self.query_filter = code_items
+        self.query_matches = dict()
+        self.invalidateFilter()
+
+    def query_match(self, item: TreeItem)->bool:
+        """Returns True if the item, or an item below it, is a code item matching the query and the color filter.
+        The results are kept until one of the filters changes.
+
+        :param item: the item
+        :return: True if there is a match
+        """
+        matched = self.query_matches.get(item)
+        if matched is None:
+            if isinstance(item, CodeItem):
+                matched = item in self.query_filter and (not self.color_filter or item.color == self.color_filter)
+            else:
+                matched = any(self.query_match(child) for child in item.child_items)
+            self.query_matches[item] = matched
+        return matched
+
     def headerData(self, section: int, orientation, role: int=None)-> QVariant:
         """Called by QTreeView to supply the header data
 
@@ -4362,6 +7127,8 @@ class ColorProxyModel(QSortFilterProxyModel):
             if orientation == Qt.Horizontal:
                 if section == 0:
                     return QVariant(self.header)
+                else:
+                    return super().headerData(section, orientation, role)
         return NOTHING
 
     def flags(self, index: QModelIndex):
@@ -4380,38 +7147,72 @@ class ColorProxyModel(QSortFilterProxyModel):
     def filterAcceptsRow(self, source_row: int, parent: QModelIndex)->bool:
         """Returns a boolean indicating the requested row is included or not.
         Thus making a filter between the TreeModel and treeview1
-        This filters uses the color of items as criterion
+        This filters uses the color of items, and the query of the filter bar, as criterion
 
         :param source_row: the row (child_number) in the TreeModel
         :param parent: the QModelIndex of the parent
         :return: boolean, True if this child is included
         """
-        source_col = 0
-        source_item = self.sourceModel().index(source_row, source_col, parent).internalPointer()
+        if self.query_filter is not None:
+            source_item = self.sourceModel().child_item(source_row, parent)
+            return self.query_match(source_item) if source_item else True
 
+        if not (self.color_filter and self.type_filter):
+            return True
+
+        source_model = self.sourceModel()
+        source_item = source_model.child_item(source_row, parent)
         if source_item:
-            if self.color_filter and self.type_filter:
-                if source_item.class_type == self.type_filter:
-                    if source_item.color == self.color_filter:
-                        return True
-                    else:
-                        return False
-                if source_item.has_children():
-                    return True
-                else:
-                    return False
+            if source_item.class_type == self.type_filter:
+                return source_item.color == self.color_filter
+            # branches are only shown if there are matching leaves below them
+            return source_model.get_filter_index().color_count(source_item, self.color_filter) > 0
         return True
 
     def filterAcceptsColumn(self, source_column, parent: QModelIndex)->bool:
         """Returns a boolean indicating the requested column is included or not.
         Thus making a filter between the TreeModel and treeview1.
-        Only column 0 is used.
+        Column 0 is used, and the difference statistics columns if they are switched on.
 
         :param source_column: the column in the column_data of the parent
         :param parent: the QModelIndex of the parent
         :return: boolean, True if this column is included
         """
-        return source_column == 0
+        return source_column == 0 or self.show_diff_stats
+
+    def set_show_diff_stats(self, show: bool):
+        """Switches the difference statistics columns on or off
+
+        :param show: True to show the columns
+        :return: None
+        """
+        if show != self.show_diff_stats:
+            self.show_diff_stats = show
+            self.invalidateFilter()
+
+    def sort(self, column: int, order: int=Qt.AscendingOrder):
+        """Sorts the code items on a column. Sorting on the name column restores the original order.
+
+        :param column: the column sorted on
+        :param order: Qt.AscendingOrder or Qt.DescendingOrder
+        :return: None
+        """
+        super().sort(column if column > 0 else -1, order)
+
+    def lessThan(self, left: QModelIndex, right: QModelIndex)->bool:
+        """Compares two items while sorting, items without difference statistics are put last in both orders
+
+        :param left: the source index of the left item
+        :param right: the source index of the right item
+        :return: True if left is less than right
+        """
+        left_value = left.data(DISPLAY)
+        right_value = right.data(DISPLAY)
+        if left_value is None or right_value is None:
+            if left_value is None and right_value is None:
+                return False
+            return (left_value is None) == (self.sortOrder() == Qt.DescendingOrder)
+        return left_value < right_value
 
     def data(self, index: QModelIndex, role: int=None)->QVariant:
         """Returns data for a specific role to the QTreeview
@@ -4420,7 +7221,7 @@ class ColorProxyModel(QSortFilterProxyModel):
         :param role: the type of data requested
         :return: the data as a QVariant
         """
-        if index.column() == 0:
+        if index.column() == 0 or self.show_diff_stats:
             return super().data(index, role)
 
 
@@ -4478,21 +7279,13 @@ class SelectionProxyModel(QSortFilterProxyModel):
         :param parent: the QModelIndex of the parent
         :return: boolean, True if this child is included
         """
-        source_col = 0
-        source_item = self.sourceModel().index(source_row, source_col, parent).internalPointer()
+        source_model = self.sourceModel()
+        source_item = source_model.child_item(source_row, parent)
         if source_item:
-            if isinstance(source_item, (Chapter, DenodoFolder)):
-                if not source_item.selected:
-                    selected = False
-                elif source_item.has_children():
-                    selected = True
-                else:
-                    selected = False
-            elif isinstance(source_item, CodeItem):
-                selected = source_item.selected
-            else:
-                return False
-            return selected
+            if source_item.class_type == CodeItem:
+                return source_item.selected
+            # branches are only shown if there are selected leaves below them
+            return source_model.get_filter_index().selected_count(source_item) > 0
         return False
 
     def filterAcceptsColumn(self, source_column, parent: QModelIndex):
@@ -4521,7 +7314,9 @@ class SelectionProxyModel(QSortFilterProxyModel):
 
 
 class TreeModel(QAbstractItemModel):
-    """Base model for all treeviews. Implements QAbstractItemModel."""
+    """Base model for all treeviews. Implements QAbstractItemModel.
+    The model shows a view of the root item, SCRIPT_VIEW or DENODO_VIEW, its indexes point to the ViewNodes
+    of the view. Several models can show different views of the same root item at once."""
 
     selection_changed = pyqtSignal(TreeItem)  # signal for the VQLManagerWindow
 
@@ -4529,7 +7324,7 @@ class TreeModel(QAbstractItemModel):
         """Class Initializer
 
         :param parent: the treeview this model serves
-        :param mode: the mode of operandi
+        :param mode: the mode of operandi, with the view shown: SCRIPT_VIEW or DENODO_VIEW
         :param root_node: the RootItem that contains all item data
         """
 
@@ -4539,6 +7334,71 @@ class TreeModel(QAbstractItemModel):
         self.root_item = root_node
         self.color_filter = None
         self.type_filter = None
+        self.view = DENODO_VIEW if mode & DENODO_VIEW else SCRIPT_VIEW
+        # the root node and the nodes by item of the view shown, kept until the model is reset
+        # the indexes handed out point to these nodes, so they live as long as the indexes may be used
+        self.view_nodes = None
+
+        # visibility data for the proxy models, outdated on every change of the model
+        # these connections are made before the proxies connect, so the index is invalid before they re-filter
+        self.filter_index = FilterIndex()
+        self.modelReset.connect(self.invalidate_filter_index)
+        self.layoutChanged.connect(self.invalidate_filter_index)
+        self.dataChanged.connect(self.invalidate_filter_index)
+        self.modelReset.connect(self.invalidate_view_nodes)
+
+    def invalidate_filter_index(self):
+        """Slot marking the visibility index of the proxy models outdated
+
+        :return: None
+        """
+        self.filter_index.invalidate()
+
+    def invalidate_view_nodes(self):
+        """Slot dropping the nodes of the view after a reset, the view of the changed model is fetched when needed
+
+        :return: None
+        """
+        self.view_nodes = None
+
+    def get_view_nodes(self)->Tuple[ViewNode, dict]:
+        """Returns the view shown
+
+        :return: tuple with the root ViewNode and a dict with the ViewNode of every item in the view
+        """
+        if self.view_nodes is None:
+            self.view_nodes = self.root_item.get_view(self.view)
+        return self.view_nodes
+
+    def get_filter_index(self)->FilterIndex:
+        """Returns the visibility index of the proxy models, rebuilding it if the model has changed
+
+        :return: the up to date FilterIndex
+        """
+        if not self.filter_index.valid:
+            self.filter_index.build(self.get_view_nodes()[0])
+        return self.filter_index
+
+    def follow(self, model: QAbstractItemModel):
+        """Makes this model follow the changes of another model on the same root item, which may show another view.
+        Resets and layout changes of the other model are repeated, changes of data become layout changes.
+
+        :param model: the model followed
+        :return: None
+        """
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self.endResetModel)
+        model.layoutAboutToBeChanged.connect(self.layoutAboutToBeChanged.emit)
+        model.layoutChanged.connect(self.layoutChanged.emit)
+        model.dataChanged.connect(self.on_followed_data_changed)
+
+    def on_followed_data_changed(self):
+        """Slot for a change of the data of a followed model, its indexes do not belong to this model
+
+        :return: None
+        """
+        self.layoutAboutToBeChanged.emit()
+        self.layoutChanged.emit()
 
     def flags(self, index: QModelIndex)->int:
         """Returns behavioral flags to the Qtreeview for a given QModelIndex
@@ -4567,6 +7427,7 @@ class TreeModel(QAbstractItemModel):
             if item:
                 self.layoutAboutToBeChanged.emit()
                 if item.set_role_data(role, index.column(), new_data):
+                    self.root_item.update_branch_selection()
                     self.selection_changed.emit(item)
                     self.layoutChanged.emit()
                     return True
@@ -4580,6 +7441,8 @@ class TreeModel(QAbstractItemModel):
         :param role: the type of data requested
         :return: the data as a QVariant
         """
+        if index.column() > 0:
+            return self.diff_stats_data(index, role)
         if role in ROLES:
             item = self.item_for_index(index)
             data = item.get_role_data(role, index.column())
@@ -4589,6 +7452,23 @@ class TreeModel(QAbstractItemModel):
             return NOTHING
         return QVariant(data)
 
+    def diff_stats_data(self, index: QModelIndex, role: int)->QVariant:
+        """Returns the data of the columns with difference statistics, only changed code items have them
+
+        :param index: the index whose data is requested
+        :param role: the type of data requested
+        :return: the data as a QVariant
+        """
+        if role == DISPLAY:
+            item = self.item_for_index(index)
+            if isinstance(item, CodeItem) and item.compare_data.diff_stats:
+                return QVariant(item.compare_data.diff_stats.column_value(index.column() - 1))
+        elif role == COLOR:
+            return QVariant(QBrush(QColor(white)))
+        elif role == Qt.FontRole:
+            return QVariant(FONT)
+        return NOTHING
+
     def headerData(self, section: int, orientation, role: int=None)->QVariant:
         """Called by QTreeView or proxy models to supply the header data
 
@@ -4600,8 +7480,10 @@ class TreeModel(QAbstractItemModel):
 
         if role in [DISPLAY, EDIT]:
             if orientation == Qt.Horizontal:
-                if 0 <= section < len(self.root_item.column_data):
+                if section == 0:
                     return QVariant(self.root_item.column_data[section])
+                elif 0 < section <= len(DIFF_STATS_COLUMNS):
+                    return QVariant(DIFF_STATS_COLUMNS[section - 1])
         return NOTHING
 
     def hasChildren(self, parent: QModelIndex=None, *args, **kwargs)->bool:
@@ -4613,14 +7495,9 @@ class TreeModel(QAbstractItemModel):
         :param kwargs: not used
         :return: True if parent item has children
         """
-        if not parent.isValid():
-            return self.root_item.has_children()
         if parent.column() > 0:
             return False
-        parent_item = self.item_for_index(parent)
-        if parent_item:
-            return parent_item.has_children()
-        return False
+        return bool(self.node_for_index(parent).children)
 
     def index(self, row: int, column: int, parent: Union[QModelIndex, None]=None, *args, **kwargs)->QModelIndex:
         """Returns a QModelIndex for an requested item in the QTreeview or its proxy model
@@ -4629,7 +7506,7 @@ class TreeModel(QAbstractItemModel):
         :param row: the index of the child in the parents child list
         :param column: the column the index is generated for
         :param parent: the QmodelIndex representing the parent of the requested index
-        :return: a QModelIndex pointing to the right TreeItem
+        :return: a QModelIndex pointing to the right ViewNode
         """
         if not parent:
             parent = QModelIndex()
@@ -4637,12 +7514,9 @@ class TreeModel(QAbstractItemModel):
         if not self.hasIndex(row, column, parent):
             return QModelIndex()
 
-        parent_item = self.item_for_index(parent)
-        if parent_item.has_children() and 0 <= row < parent_item.child_count():
-            child = parent_item.child(row)
-            if 0 <= column < child.column_count():
-                index = self.createIndex(row, column, child)
-                return index
+        children = self.node_for_index(parent).children
+        if 0 <= row < len(children) and 0 <= column < self.columnCount(parent):
+            return self.createIndex(row, column, children[row])
         return QModelIndex()
 
     def parent(self, index: Union[QModelIndex, None]=None)->QModelIndex:
@@ -4654,13 +7528,10 @@ class TreeModel(QAbstractItemModel):
         if not index.isValid():
             return QModelIndex()
 
-        item = self.item_for_index(index)
-        parent_item = item.parent_item
-
-        if parent_item is self.root_item:
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node.parent is None:
             return QModelIndex()
-        else:
-            return self.createIndex(parent_item.child_number(), 0, parent_item)
+        return self.createIndex(parent_node.row, 0, parent_node)
 
     def columnCount(self, parent: QModelIndex=None, *args, **kwargs)->int:
         """Returns the number of columns of a parent represented by its QModelIndex
@@ -4670,15 +7541,8 @@ class TreeModel(QAbstractItemModel):
         :param kwargs: not used
         :return: number of columns
         """
-        if not parent.isValid():
-            return self.root_item.column_count()
-
-        parent_item = parent.internalPointer()
-        if parent_item.has_children():
-            child = parent_item.child(0)
-            return child.column_count()
-        else:
-            return 0
+        # the name column and the difference statistics columns, the proxy models decide which are shown
+        return 1 + len(DIFF_STATS_COLUMNS)
 
     def rowCount(self, parent: QModelIndex=None, *args, **kwargs)->int:
         """Returns the number of children of a parent represented by its QModelIndex
@@ -4688,60 +7552,447 @@ class TreeModel(QAbstractItemModel):
         :param kwargs: not used
         :return: number of children (rows)
         """
-        if not parent.isValid():
-            return self.root_item.child_count()
         if parent.column() > 0:
             return 0
-        parent_item = parent.internalPointer()
-        return parent_item.child_count()
+        return len(self.node_for_index(parent).children)
+
+    def node_for_index(self, index: QModelIndex)->ViewNode:
+        """Returns the ViewNode represented by index using its internalPointer() function
+
+        :param index: the QModelIndex pointing to the node
+        :return: the node, the root node of the view for an invalid index
+        """
+        if index.isValid():
+            node = index.internalPointer()
+            if node:
+                return node
+        return self.get_view_nodes()[0]
+
+    def item_for_index(self, index: QModelIndex)->Union[TreeItem, RootItem]:
+        """Returns the TreeItem represented by index
+
+        :param index: the QModelIndex pointing to the item
+        :return: the item itself, the root item for an invalid index
+        """
+        return self.node_for_index(index).item
+
+    def child_item(self, row: int, parent: QModelIndex)->Union[TreeItem, None]:
+        """Returns the item in a row below a parent, used by the proxy models to filter rows
+
+        :param row: the row
+        :param parent: the QModelIndex of the parent
+        :return: the item, None if there is no such row
+        """
+        children = self.node_for_index(parent).children
+        return children[row].item if 0 <= row < len(children) else None
+
+    def index_for_item(self, item: TreeItem)->QModelIndex:
+        """Returns the QModelIndex of a TreeItem in the current view
+
+        :param item: the item
+        :return: the QModelIndex pointing to the item, invalid if the item is not in the view
+        """
+        node = self.get_view_nodes()[1].get(item)
+        if node is None or node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def reset(self):
+        """Resets the model, roll up from the leaves and remove all reverences
+
+        :return: None
+        """
+        self.beginResetModel()
+        self.resetInternalData()
+        header = str(self.root_item.header)
+        self.root_item.clear()
+        self.root_item.__init__(header)
+        self.endResetModel()
+
+    def remove_compare(self):
+        """Reverts the model to a state before the GUI_COMPARE state
+        :return: None
+        """
+        self.beginResetModel()
+        self.root_item.remove_compare()
+        self.endResetModel()
+        if self.mode & GUI_COMPARE:
+            self.mode -= GUI_COMPARE
+        self.mode |= GUI_SELECT
+
+    def change_view(self, view: int)->bool:
+        """Changes the view to the new view.
+        possible views are: DENODO_VIEW or SCRIPT_VIEW
+        The views are kept by the root item until the model changes, so switching back and forth is cheap.
+
+        :param view: integer with the requested view
+        :return: True if success, False if the Denodo view has no folders
+        """
+        view = DENODO_VIEW if view & DENODO_VIEW else SCRIPT_VIEW
+        if view == self.view:
+            return True
+        if view & DENODO_VIEW and not self.root_item.get_view(view)[0].children:
+            return False
+        self.beginResetModel()
+        self.view = view
+        self.endResetModel()
+        return True
+
+
+def utf16_length(text: str)->int:
+    """Returns the length of a text as Qt counts it, in UTF-16 code units.
+    Characters outside the basic multilingual plane, like emoji, count as two.
+
+    :param text: the text
+    :return: the length
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+def utf16_offsets(text: str)->Union[List[int], None]:
+    """Returns the UTF-16 offsets of the characters of a text, and its length as last item.
+    Only needed if the text has characters outside the basic multilingual plane, otherwise None is returned.
+
+    :param text: the text
+    :return: list with the offset of every character and the length, or None if these are the same as in Python
+    """
+    if utf16_length(text) == len(text):
+        return None
+    offsets = [0]
+    for character in text:
+        offsets.append(offsets[-1] + (2 if ord(character) > 0xFFFF else 1))
+    return offsets
+
+
+class CodeHighlighter(QSyntaxHighlighter):
+    """Syntax highlighter of the plain text code view.
+
+    Code is highlighted with reserved words in purple and the object name in red,
+    strings and comments get their own color. Comparisons are highlighted with green inserted and red deleted text.
+    Only blocks that have been visible in the view are formatted. Other blocks only track whether they end inside
+    a string or a block comment, so loading a large document costs no more than one cheap call per line.
+    """
+
+    # block states: the line ends inside a string or a block comment
+    IN_CODE = 0
+    IN_STRING = 1
+    IN_COMMENT = 2
+    TOKEN = compile(r"(?P<comment>^\s*#.*|--.*)|(?P<block>/\*.*?(?:\*/|$))|"
+                    r"(?P<string>'(?:[^']|'')*')|(?P<open_string>'.*)")
+    STRING_END = compile(r"(?:[^']|'')*'")
+    MARKERS = compile(r"['#]|--|/\*")
+
+    def __init__(self, document):
+        """Class initializer
+
+        :param document: the QTextDocument to highlight
+        """
+        super().__init__(document)
+        self.word_pattern = compile('|'.join(f"\\b{escape(word)}\\b" for word in HIGHLIGHTED_WORDS))
+        self.word_format = self.new_format(purple)
+        self.name_format = self.new_format(red)
+        self.string_format = self.new_format(blue)
+        self.comment_format = self.new_format(grey)
+        self.insert_format = self.new_format(green)
+        self.delete_format = self.new_format(red)
+        self.delete_format.setFontStrikeOut(True)
+        self.name_pattern = None
+        self.hunks = list()
+        self.hunk_starts = list()
+        self.visible = set()
+
+    @staticmethod
+    def new_format(color: str)->QTextCharFormat:
+        """Returns a text format with a foreground color
+
+        :param color: the color
+        :return: the format
+        """
+        text_format = QTextCharFormat()
+        text_format.setForeground(QColor(color))
+        return text_format
+
+    def set_content(self, object_name: str, hunks: List[Tuple[int, int, int]]):
+        """Sets the object name and the diff hunks for a new document, before its text is set
+
+        :param object_name: name of the object, highlighted in red where it appears as a whole word
+        :param hunks: sorted list of tuples (start, end, operation) of inserted and deleted text, empty for code,
+            the positions in UTF-16 code units like Qt positions in the document
+        :return: None
+        """
+        self.name_pattern = None
+        if object_name:
+            before = '(?<!\\w)' if match(r'\w', object_name[0]) else ''
+            after = '(?!\\w)' if match(r'\w', object_name[-1]) else ''
+            self.name_pattern = compile(before + escape(object_name) + after)
+        self.hunks = hunks
+        self.hunk_starts = [hunk[0] for hunk in hunks]
+        self.visible = set()
+
+    def show_blocks(self, first_block, last_block):
+        """Highlights the blocks that became visible for the first time
+
+        :param first_block: first visible QTextBlock
+        :param last_block: last visible QTextBlock
+        :return: None
+        """
+        block = first_block
+        last = last_block.blockNumber()
+        while block.isValid() and block.blockNumber() <= last:
+            number = block.blockNumber()
+            if number not in self.visible:
+                self.visible.add(number)
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def scan(self, text: str, state: int)->Tuple[List[Tuple[int, int, QTextCharFormat]], int]:
+        """Finds the strings and comments in a line
+
+        :param text: the text of the line
+        :param state: the state at the end of the previous line
+        :return: tuple with a list of tuples (start, length, format) and the state at the end of the line
+        """
+        spans = list()
+        position = 0
+        if state == self.IN_STRING:
+            string_end = self.STRING_END.match(text)
+            if not string_end:
+                return [(0, len(text), self.string_format)], self.IN_STRING
+            position = string_end.end()
+            spans.append((0, position, self.string_format))
+        elif state == self.IN_COMMENT:
+            position = text.find('*/')
+            if position < 0:
+                return [(0, len(text), self.comment_format)], self.IN_COMMENT
+            position += 2
+            spans.append((0, position, self.comment_format))
+        state = self.IN_CODE
+        for token in self.TOKEN.finditer(text, position):
+            start, end = token.span()
+            kind = token.lastgroup
+            if kind == 'open_string':
+                spans.append((start, end - start, self.string_format))
+                state = self.IN_STRING
+            elif kind == 'string':
+                spans.append((start, end - start, self.string_format))
+            else:
+                spans.append((start, end - start, self.comment_format))
+                if kind == 'block' and not token.group().endswith('*/'):
+                    state = self.IN_COMMENT
+        return spans, state
+
+    def highlightBlock(self, text: str):
+        """Overridden function of QSyntaxHighlighter to format a single line
+
+        :param text: the text of the line
+        :return: None
+        """
+        block = self.currentBlock()
+        visible = block.blockNumber() in self.visible
+        if self.hunks:
+            if visible:
+                # the block length counts the line end, both in UTF-16 code units like the hunks
+                self.highlight_hunks(block.position(), block.length() - 1)
+            return
+        state = max(self.previousBlockState(), self.IN_CODE)
+        if state == self.IN_CODE and not self.MARKERS.search(text):
+            spans = list()
+        else:
+            spans, state = self.scan(text, state)
+        self.setCurrentBlockState(state)
+        if not visible:
+            return
+        offsets = utf16_offsets(text)
+        for word in self.word_pattern.finditer(text):
+            self.set_line_format(offsets, word.start(), word.end() - word.start(), self.word_format)
+        if self.name_pattern:
+            for name in self.name_pattern.finditer(text):
+                self.set_line_format(offsets, name.start(), name.end() - name.start(), self.name_format)
+        for start, length, text_format in spans:
+            self.set_line_format(offsets, start, length, text_format)
+
+    def set_line_format(self, offsets: Union[List[int], None], start: int, length: int,
+                        text_format: QTextCharFormat):
+        """Formats a part of the current line, given in Python string positions
+
+        :param offsets: the UTF-16 offsets of the characters of the line, None if they are the same
+        :param start: start of the part in the line
+        :param length: length of the part
+        :param text_format: the format
+        :return: None
+        """
+        if offsets:
+            start, length = offsets[start], offsets[start + length] - offsets[start]
+        self.setFormat(start, length, text_format)
+
+    def highlight_hunks(self, start: int, length: int):
+        """Formats the inserted and deleted text of a comparison in the current line
+
+        :param start: position of the line in the document
+        :param length: length of the line
+        :return: None
+        """
+        end = start + length
+        i = max(bisect_left(self.hunk_starts, start) - 1, 0)
+        while i < len(self.hunks) and self.hunks[i][0] < end:
+            hunk_start, hunk_end, operation = self.hunks[i]
+            if hunk_end > start:
+                offset = max(hunk_start, start) - start
+                self.setFormat(offset, min(hunk_end, end) - start - offset,
+                               self.insert_format if operation > 0 else self.delete_format)
+            i += 1
+
+
+class CodeViewer(QStackedWidget):
+    """Read only code view of the code edit pane.
+
+    Code is shown as plain text in a QPlainTextEdit, which only lays out the visible lines,
+    with a CodeHighlighter formatting the lines on screen. Comparisons are shown as html in a QTextEdit,
+    comparisons larger than CODE_VIEWER_PLAIN_SIZE go to the plain text view as well. Their text is added
+    in chunks of CODE_VIEWER_CHUNK_SIZE diff hunks, so the first screen is shown while the rest is still streaming in.
+    """
+
+    def __init__(self, parent=None):
+        """Class initializer
+
+        :param parent: parent widget
+        """
+        super().__init__(parent)
+        self.html_view = QTextEdit(self)
+        self.html_view.setLineWrapMode(QTextEdit.NoWrap)
+        self.html_view.setReadOnly(True)
+        self.plain_view = QPlainTextEdit(self)
+        self.plain_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.plain_view.setReadOnly(True)
+        self.plain_view.setUndoRedoEnabled(False)
+        self.highlighter = CodeHighlighter(self.plain_view.document())
+        self.plain_view.updateRequest.connect(self.on_update_request)
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(0)
+        self.stream_timer.timeout.connect(self.on_stream_chunk)
+        self.stream_parts = list()
+        self.stream_index = 0
+        self.addWidget(self.html_view)
+        self.addWidget(self.plain_view)
+        self.setCurrentWidget(self.html_view)
+
+    def clear(self):
+        """Clears both views
+
+        :return: None
+        """
+        self.stream_timer.stop()
+        self.stream_parts = list()
+        self.html_view.clear()
+        self.highlighter.set_content('', list())
+        self.plain_view.clear()
+        self.setCurrentWidget(self.html_view)
+
+    def set_html(self, html: str):
+        """Shows html in the rich text view
+
+        :param html: the html
+        :return: None
+        """
+        self.clear()
+        self.html_view.setHtml(html)
 
-    def item_for_index(self, index: QModelIndex)->Union[TreeItem, RootItem]:
-        """Returns the TreeItem represented by index using its internalPointer() function
+    def set_code(self, object_name: str, code: str):
+        """Shows a code piece in the plain text view
 
-        :param index: the QModelIndex pointing to the item
-        :return: the item itself
+        :param object_name: name of the object, highlighted in red
+        :param code: the code
+        :return: None
         """
-        if index.isValid():
-            item = index.internalPointer()
-            if item:
-                return item
-        return self.root_item
+        self.clear()
+        self.setCurrentWidget(self.plain_view)
+        self.highlighter.set_content(object_name, list())
+        self.plain_view.setPlainText(code)
+        self.show_visible_blocks()
 
-    def reset(self):
-        """Resets the model, roll up from the leaves and remove all reverences
+    def replace_code(self, object_name: str, code: str):
+        """Replaces the code shown by another version of it, like the code with formatted sql.
+        The scroll position and the line of the cursor are kept.
 
+        :param object_name: name of the object, highlighted in red
+        :param code: the code
         :return: None
         """
-        self.beginResetModel()
-        self.resetInternalData()
-        header = str(self.root_item.header)
-        self.root_item.clear()
-        self.root_item.__init__(header)
-        self.endResetModel()
+        if self.currentWidget() is not self.plain_view:
+            self.set_code(object_name, code)
+            return
+        scroll_bar = self.plain_view.verticalScrollBar()
+        value = scroll_bar.value()
+        line = self.plain_view.textCursor().blockNumber()
+        self.set_code(object_name, code)
+        document = self.plain_view.document()
+        self.plain_view.setTextCursor(QTextCursor(document.findBlockByNumber(min(line, document.blockCount() - 1))))
+        scroll_bar.setValue(value)
+        self.show_visible_blocks()
+
+    def set_diff(self, object_name: str, diffs: List[Tuple[int, str]]):
+        """Shows a large comparison in the plain text view. Inserted text is green, deleted text red and striked out.
+        The first chunk of hunks is shown at once, the rest is appended by a timer.
+
+        :param object_name: name of the object
+        :param diffs: the diff tuples (operation, text) of the comparison
+        :return: None
+        """
+        self.clear()
+        self.setCurrentWidget(self.plain_view)
+        # the hunk positions are compared with positions in the document, which Qt counts in UTF-16 code units
+        hunks = list()
+        position = 0
+        for operation, text in diffs:
+            length = utf16_length(text)
+            if operation and text:
+                hunks.append((position, position + length, operation))
+            position += length
+        self.highlighter.set_content(object_name, hunks)
+        parts = [''.join(text for _, text in diffs[i:i + CODE_VIEWER_CHUNK_SIZE])
+                 for i in range(0, len(diffs), CODE_VIEWER_CHUNK_SIZE)]
+        if not parts:
+            return
+        self.plain_view.setPlainText(parts[0])
+        self.show_visible_blocks()
+        if len(parts) > 1:
+            self.stream_parts = parts
+            self.stream_index = 1
+            self.stream_timer.start()
+
+    def on_stream_chunk(self):
+        """Timer handler appending the next chunk of a streamed comparison to the end of the document
 
-    def remove_compare(self):
-        """Reverts the model to a state before the GUI_COMPARE state
         :return: None
         """
-        self.beginResetModel()
-        self.root_item.remove_compare()
-        self.endResetModel()
-        if self.mode & GUI_COMPARE:
-            self.mode -= GUI_COMPARE
-        self.mode |= GUI_SELECT
+        if self.stream_index >= len(self.stream_parts):
+            self.stream_timer.stop()
+            self.stream_parts = list()
+            return
+        cursor = QTextCursor(self.plain_view.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(self.stream_parts[self.stream_index])
+        self.stream_index += 1
 
-    def change_view(self, view: int)->bool:
-        """Changes the view to the new view.
-        possible views are: DENODO_VIEW or SCRIPT_VIEW
+    def on_update_request(self, _rect: QRect, _dy: int):
+        """Event handler of the plain text view, called on scrolling and repainting
 
-        :param view: integer with the requested view
-        :return: True if success
+        :param _rect: the rectangle to be updated
+        :param _dy: the number of pixels scrolled
+        :return: None
         """
+        if self.currentWidget() is self.plain_view:
+            self.show_visible_blocks()
 
-        self.beginResetModel()
-        success = self.root_item.change_view(view)
-        self.endResetModel()
-        return success
+    def show_visible_blocks(self):
+        """Lets the highlighter format the lines in the visible window of the plain text view
+
+        :return: None
+        """
+        viewport = self.plain_view.viewport()
+        first_block = self.plain_view.cursorForPosition(QPoint(0, 0)).block()
+        last_block = self.plain_view.cursorForPosition(QPoint(0, viewport.height())).block()
+        self.highlighter.show_blocks(first_block, last_block)
 
 
 class VQLManagerWindow(QMainWindow):
@@ -4789,7 +8040,8 @@ class VQLManagerWindow(QMainWindow):
         self.setWindowIcon(QIcon(str(images / 'splitter.png')))
         self.setWindowTitle(APPLICATION_NAME)
 
-        self.select_button_labels = {'All': white, 'Lost': red, 'New': green, 'Same': white, 'Changed': yellow}
+        self.select_button_labels = {'All': white, 'Lost': red, 'New': green, 'Same': white, 'Changed': yellow,
+                                     'Both': orange}
         self.diff_button_labels = {'Changes': yellow, 'Original': white, 'New': green}
 
         # instantiate widgets
@@ -4812,6 +8064,7 @@ class VQLManagerWindow(QMainWindow):
         self.treeview3_box = QVBoxLayout()
         self.log_box = QVBoxLayout()
         self.info_box = QVBoxLayout()
+        self.search_results_box = QVBoxLayout()
 
         self.right_content_widget = QWidget(self, flags=Qt.Widget)
         self.left_header_widget = QWidget(self, flags=Qt.Widget)
@@ -4822,6 +8075,7 @@ class VQLManagerWindow(QMainWindow):
         self.treeview3_widget = QWidget(self, flags=Qt.Widget)
         self.log_widget = QWidget(self, flags=Qt.Widget)
         self.info_widget = QWidget(self, flags=Qt.Widget)
+        self.search_results_widget = QWidget(self, flags=Qt.Widget)
 
         self.item_info = QPlainTextEdit()
         self.base_repository_label = QLabel()
@@ -4829,7 +8083,12 @@ class VQLManagerWindow(QMainWindow):
         self.search_label = QLabel()
         self.find_line_edit = QLineEdit()
         self.find_button = QPushButton()
+        self.find_timer = QTimer(self)
+        self.query_line_edit = QLineEdit()
+        self.query_timer = QTimer(self)
         self.log_edit = QPlainTextEdit()
+        self.search_filter_edit = QLineEdit()
+        self.search_results = QListWidget()
 
         self.select_buttons, self.select_buttons_group = self.get_buttons_widget(self.select_button_labels)
         self.diff_buttons, self.diff_buttons_group = self.get_buttons_widget(self.diff_button_labels)
@@ -4844,16 +8103,22 @@ class VQLManagerWindow(QMainWindow):
         self.color_proxy_model = ColorProxyModel(self.treeview1, 'Selection Pane')
         self.color_proxy_model.setSourceModel(self.tree_model)
         self.treeview1.setModel(self.color_proxy_model)
+        # sorting on the difference statistics columns, unsorted initially
+        self.treeview1.header().setSortIndicator(-1, Qt.AscendingOrder)
+        self.treeview1.setSortingEnabled(True)
 
+        # the view selection pane has its own model on the same items, so it can show another view
+        self.selection_tree_model = TreeModel(self.treeview2, RIGHT | GUI_SELECT | SCRIPT_VIEW, self.root_item)
+        self.selection_tree_model.follow(self.tree_model)
         self.proxy_model = SelectionProxyModel(self.treeview2, 'View Selection')
-        self.proxy_model.setSourceModel(self.tree_model)
+        self.proxy_model.setSourceModel(self.selection_tree_model)
         self.treeview2.setModel(self.proxy_model)
 
         self.dependency_model = DependencyModel(self.treeview3, 'Dependencies Pane')
         self.treeview3.setModel(self.dependency_model)
 
         # create source code view
-        self.code_text_edit = QTextEdit()
+        self.code_text_edit = CodeViewer()
 
         # create statusbar
         self.status_bar = self.statusBar()
@@ -4903,10 +8168,37 @@ class VQLManagerWindow(QMainWindow):
         self.open_compare_folder_action = QAction(image, 'Open &Repository to Compare', self)
         image = QIcon(str(images / 'open_repo.png'))
         self.denodo_folder_structure_action = QAction(image, 'Denodo Folder Structure', self)
+        self.denodo_selection_view_action = QAction(image, 'Denodo Folder Structure in View Selection', self)
 
         self.open_compare_file_action.setEnabled(False)
         self.open_compare_folder_action.setEnabled(False)
         self.denodo_folder_structure_action.setEnabled(False)
+        self.denodo_selection_view_action.setEnabled(False)
+
+        # three-way compare with a common ancestor
+        image = QIcon(str(images / 'open_file.png'))
+        self.open_ancestor_file_action = QAction(image, 'Open Common &Ancestor File', self)
+        image = QIcon(str(images / 'open_repo.png'))
+        self.open_ancestor_folder_action = QAction(image, 'Open Common Ancestor Repositor&y', self)
+        self.export_merged_file_action = QAction('Export &Merged File', self)
+        self.export_merged_folder_action = QAction('Export Merged Reposi&tory', self)
+
+        # batch compare of many exports
+        self.batch_compare_action = QAction('&Batch Compare Files', self)
+        self.batch_pair_action = QAction('Open Batch Compare &Pair', self)
+        self.batch_pair_action.setEnabled(False)
+
+        self.export_impact_action = QAction('Export &Impact Report', self)
+        self.export_impact_action.setEnabled(False)
+        self.export_compare_report_action = QAction('Export Compare Re&port', self)
+        self.export_compare_report_action.setEnabled(False)
+        self.export_patch_bundle_action = QAction('Export Patch &Bundle', self)
+        self.export_patch_bundle_action.setEnabled(False)
+        self.apply_patch_file_action = QAction('Apply Patch Bundle to Fi&le', self)
+        self.apply_patch_folder_action = QAction('Apply Patch Bundle to Repositor&y', self)
+        self.ignore_formatting_action = QAction('Ignore &Formatting in Comparison', self)
+        self.sqlparse_normalization_action = QAction('Normalize SQL with &sqlparse', self)
+        self.format_sql_action = QAction('Format SQL of Shown &View', self)
 
         # Reset everything
 
@@ -4946,6 +8238,25 @@ class VQLManagerWindow(QMainWindow):
         self._mode = 0
         self.code_show_selector = ORIGINAL_CODE
         self.code_text_edit_cache = None
+        # the last search, of names or full text, repeated when the model changes
+        self.search_query = ''
+        self.search_names = False
+        # the expanded items per tree view and view, restored when the view is shown again
+        self.expanded_items = dict()
+        # fingerprint of the code shown in the code view, none for a comparison
+        self.code_text_fingerprint = None
+
+        # background formatting of the sql of a view, and the request waiting for it
+        self.sql_format_thread = None
+        self.sql_format_job = None
+
+        # background computation of difference statistics in compare mode and the code items it is done for
+        self.diff_stats_thread = None
+        self.diff_stats_items = list()
+
+        # the last batch compare of many files, and the background thread reading them
+        self.batch_compare = None
+        self.batch_compare_thread = None
 
         # setup state machine
         self.state_machine = QStateMachine()
@@ -5100,13 +8411,26 @@ class VQLManagerWindow(QMainWindow):
         self.select_buttons.setHidden(True)
         self.diff_buttons.setHidden(True)
 
-        self.code_text_edit.setLineWrapMode(0)
-        self.code_text_edit.setReadOnly(True)
-        self.code_text_edit.setText("")
         self.log_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.log_edit.setWordWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
         self.log_edit.setMaximumBlockCount(1000)
         self.item_info.setPlainText("")
+        self.find_line_edit.setToolTip('Type to search names, also with typos. Find searches the code: '
+                                       'words match whole words, word* matches the start of words, '
+                                       '"a b" matches a phrase')
+        self.search_filter_edit.setPlaceholderText('Filter search results')
+        # search as you type starts after a pause in typing
+        self.find_timer.setSingleShot(True)
+        self.find_timer.setInterval(NAME_SEARCH_DELAY)
+        self.search_results_widget.setHidden(True)
+        self.query_line_edit.setPlaceholderText('Filter, e.g. chapter:views path:/sales dependees:0 code:/flatten/')
+        self.query_line_edit.setToolTip('Shows only the objects matching all terms, -term excludes:\n'
+                                        'chapter:"base views", name:cust*, path:/a/b, status:new, '
+                                        'dependencies:>2, dependees:0,\n'
+                                        'uses:ds1, code:word, code:"a phrase", code:/regular expression/')
+        self.query_line_edit.setClearButtonEnabled(True)
+        self.query_timer.setSingleShot(True)
+        self.query_timer.setInterval(QUERY_DELAY)
 
         self.status_bar.setMinimumSize(QSize(0, 20))
         self.status_bar.showMessage("Ready")
@@ -5129,15 +8453,23 @@ class VQLManagerWindow(QMainWindow):
         self.treeview3_widget.setLayout(self.treeview3_box)
         self.log_widget.setLayout(self.log_box)
         self.info_widget.setLayout(self.info_box)
+        self.search_results_widget.setLayout(self.search_results_box)
 
         # noinspection PyArgumentList
         self.log_box.addWidget(self.log_edit)
         # noinspection PyArgumentList
         self.info_box.addWidget(self.item_info)
+        # noinspection PyArgumentList
+        self.search_results_box.addWidget(self.search_filter_edit)
+        # noinspection PyArgumentList
+        self.search_results_box.addWidget(self.search_results)
 
         self.log_splitter.addWidget(self.log_widget)
         self.log_splitter.addWidget(self.info_widget)
+        self.log_splitter.addWidget(self.search_results_widget)
 
+        # noinspection PyArgumentList
+        self.right_content_box.addWidget(self.query_line_edit)
         # noinspection PyArgumentList
         self.right_content_box.addWidget(self.treeview1)
         # noinspection PyArgumentList
@@ -5191,7 +8523,7 @@ class VQLManagerWindow(QMainWindow):
         self.main_splitter.setStretchFactor(1, 1)
         self.log_splitter.setStretchFactor(0, 0.5)
         self.main_splitter.setSizes([50, 800, 100])
-        self.log_splitter.setSizes([500, 200])
+        self.log_splitter.setSizes([500, 200, 200])
         self.header_splitter.setSizes([300, 300])
 
         self.header_splitter.setHandleWidth(0)
@@ -5242,10 +8574,55 @@ class VQLManagerWindow(QMainWindow):
         self.open_compare_folder_action.setStatusTip('Open a repository containing folders with separate vql scripts')
         self.open_compare_folder_action.triggered.connect(lambda: self.on_open(GUI_COMPARE | COMP_REPO))
 
+        self.open_ancestor_file_action.setStatusTip('Open the common ancestor of both files for a three-way compare')
+        self.open_ancestor_file_action.triggered.connect(lambda: self.on_open_ancestor(FILE))
+        self.open_ancestor_folder_action.setStatusTip('Open the common ancestor repository for a three-way compare')
+        self.open_ancestor_folder_action.triggered.connect(lambda: self.on_open_ancestor(REPO))
+        self.export_merged_file_action.setStatusTip('Save the three-way merge to a single file')
+        self.export_merged_file_action.triggered.connect(lambda: self.on_export_merged(FILE))
+        self.export_merged_folder_action.setStatusTip('Save the three-way merge to a repository')
+        self.export_merged_folder_action.triggered.connect(lambda: self.on_export_merged(REPO))
+        self.set_ancestor_actions_enabled(False)
+
+        self.batch_compare_action.setStatusTip('Compare many files at once and save the differences of every pair')
+        self.batch_compare_action.triggered.connect(self.on_batch_compare)
+        self.batch_pair_action.setStatusTip('Open two files of the batch compare as base and compare')
+        self.batch_pair_action.triggered.connect(self.on_open_batch_pair)
+
         self.denodo_folder_structure_action.setShortcut('Ctrl+D')
         self.denodo_folder_structure_action.setStatusTip('Switch to DENODO View')
         self.denodo_folder_structure_action.setCheckable(True)
         self.denodo_folder_structure_action.triggered.connect(self.on_switch_view)
+        self.denodo_selection_view_action.setShortcut('Ctrl+Shift+D')
+        self.denodo_selection_view_action.setStatusTip('Switch the View Selection pane to the DENODO View')
+        self.denodo_selection_view_action.setCheckable(True)
+        self.denodo_selection_view_action.triggered.connect(self.on_switch_selection_view)
+
+        self.export_impact_action.setStatusTip('Save the orphans and unmet dependencies of the selection to a file')
+        self.export_impact_action.triggered.connect(self.on_export_impact)
+
+        self.export_compare_report_action.setStatusTip('Save the changed, new and lost items with their statistics')
+        self.export_compare_report_action.triggered.connect(self.on_export_compare_report)
+
+        self.export_patch_bundle_action.setStatusTip('Save the differences as patches to apply to another export')
+        self.export_patch_bundle_action.triggered.connect(self.on_export_patch_bundle)
+        self.apply_patch_file_action.setStatusTip('Apply a patch bundle to a file and save the result')
+        self.apply_patch_file_action.triggered.connect(lambda: self.on_apply_patch_bundle(FILE))
+        self.apply_patch_folder_action.setStatusTip('Apply a patch bundle to the files in a repository')
+        self.apply_patch_folder_action.triggered.connect(lambda: self.on_apply_patch_bundle(REPO))
+
+        self.ignore_formatting_action.setStatusTip('Ignore whitespace, keyword case and property order when comparing')
+        self.ignore_formatting_action.setCheckable(True)
+        self.ignore_formatting_action.setChecked(code_normalizer.enabled)
+        self.ignore_formatting_action.triggered.connect(self.on_switch_normalization)
+        self.sqlparse_normalization_action.setStatusTip('Also normalize the code with sqlparse when comparing (slower)')
+        self.sqlparse_normalization_action.setCheckable(True)
+        self.sqlparse_normalization_action.setChecked(code_normalizer.use_sqlparse)
+        self.sqlparse_normalization_action.setEnabled(code_normalizer.enabled)
+        self.sqlparse_normalization_action.triggered.connect(self.on_switch_normalization)
+        self.format_sql_action.setStatusTip('Format the sql of the shown view, also when it is too large to be '
+                                            'formatted automatically')
+        self.format_sql_action.triggered.connect(self.on_format_sql)
 
         # Reset everything
         self.reset_action.setStatusTip('Reset the application to a clean state')
@@ -5296,6 +8673,15 @@ class VQLManagerWindow(QMainWindow):
         for action in self.compare_recent_repository_actions:
             self.compare_recent_repository_menu.addAction(action)
 
+        self.compare_menu.addSeparator()
+        self.compare_menu.addAction(self.open_ancestor_file_action)
+        self.compare_menu.addAction(self.open_ancestor_folder_action)
+        self.compare_menu.addAction(self.export_merged_file_action)
+        self.compare_menu.addAction(self.export_merged_folder_action)
+        self.compare_menu.addSeparator()
+        self.compare_menu.addAction(self.batch_compare_action)
+        self.compare_menu.addAction(self.batch_pair_action)
+
         self.compare_recent_repository_menu.setEnabled(False)
         self.compare_recent_file_menu.setEnabled(False)
         self.reset_compare_action.setEnabled(False)
@@ -5304,6 +8690,16 @@ class VQLManagerWindow(QMainWindow):
 
         self.options_menu = self.menubar.addMenu('&Options')
         self.options_menu.addAction(self.denodo_folder_structure_action)
+        self.options_menu.addAction(self.denodo_selection_view_action)
+        self.options_menu.addAction(self.export_impact_action)
+        self.options_menu.addAction(self.export_compare_report_action)
+        self.options_menu.addAction(self.export_patch_bundle_action)
+        self.options_menu.addAction(self.apply_patch_file_action)
+        self.options_menu.addAction(self.apply_patch_folder_action)
+        self.options_menu.addSeparator()
+        self.options_menu.addAction(self.ignore_formatting_action)
+        self.options_menu.addAction(self.sqlparse_normalization_action)
+        self.options_menu.addAction(self.format_sql_action)
         self.options_menu.addSeparator()
         self.options_menu.addAction(self.reset_compare_action)
         self.options_menu.addAction(self.reset_action)
@@ -5322,6 +8718,15 @@ class VQLManagerWindow(QMainWindow):
         self.tree_model.dataChanged.connect(self.on_selection_changed)
         self.find_button.released.connect(self.on_find_button_click)
         self.find_line_edit.returnPressed.connect(self.on_find_button_click)
+        self.find_line_edit.textChanged.connect(self.find_timer.start)
+        self.find_timer.timeout.connect(self.on_find_name)
+        self.query_line_edit.returnPressed.connect(self.on_query)
+        self.query_line_edit.textChanged.connect(self.query_timer.start)
+        self.query_timer.timeout.connect(self.on_query)
+        self.search_filter_edit.textChanged.connect(self.on_search_filter_changed)
+        self.search_results.itemClicked.connect(self.on_search_result_clicked)
+        self.search_results.itemActivated.connect(self.on_search_result_clicked)
+        self.tree_model.modelReset.connect(self.on_tree_model_reset)
         self.logger.custom_signal.connect(self.on_log_message)
 
         # Radio buttons
@@ -5422,8 +8827,8 @@ class VQLManagerWindow(QMainWindow):
         :param index: the QModelIndex of the item expanded
         :return: none
         """
-        idx = self.color_proxy_model.mapToSource(index)
-        self.treeview2.expand(self.proxy_model.mapFromSource(idx))
+        item = self.tree_model.item_for_index(self.color_proxy_model.mapToSource(index))
+        self.treeview2.expand(self.proxy_model.mapFromSource(self.selection_tree_model.index_for_item(item)))
 
     def on_collapse_treeview(self, index):
         """Event handler for collapse events of treeview1.
@@ -5432,8 +8837,8 @@ class VQLManagerWindow(QMainWindow):
         :param index: the QModelIndex of the item expanded
         :return: none
         """
-        idx = self.color_proxy_model.mapToSource(index)
-        self.treeview2.collapse(self.proxy_model.mapFromSource(idx))
+        item = self.tree_model.item_for_index(self.color_proxy_model.mapToSource(index))
+        self.treeview2.collapse(self.proxy_model.mapFromSource(self.selection_tree_model.index_for_item(item)))
 
     def on_open_recent_files(self, index: int, mode: int):
         """Event handler for the click on a recent files menu item.
@@ -5472,32 +8877,151 @@ class VQLManagerWindow(QMainWindow):
         self.color_proxy_model.set_color_filter(color, CodeItem)
 
     def on_find_button_click(self):
-        """Event handler of the find button. Sets the focus on the first found item and logs all items found
+        """Event handler of the find button. Searches the code of all items with the search index of the root item
+        and lists the items found in the search results pane. The first item found whose name starts with
+        the search text, or else the first item found, is selected.
 
         :return: None
         """
+        self.find_timer.stop()
         mode = self.get_mode()
         if mode & BASE_LOADED or mode & COMP_LOADED:
             what = self.find_line_edit.text().strip()
             if what:
-                model = self.tree_model
-                match_mode = Qt.MatchRecursive | Qt.MatchStartsWith
-                item_indices = model.match(model.index(0, 0), DISPLAY,  QVariant(what), -1, match_mode)
-                if item_indices:
-                    items = (index.internalPointer() for index in item_indices)
-                    item_strings = \
-                        (self.object_type(item) + ': ' + item.name for item in items if item.class_type == CodeItem)
-                    for item_string in item_strings:
-                        self.logger.info(f"Found: {item_string}")
-
-                    item = item_indices[0]
-                    self.treeview1.setCurrentIndex(self.color_proxy_model.mapFromSource(item))
-                    self.treeview1.setFocus()
-                    self.status_bar.showMessage(f"Found {str(len(item_indices))} occurrences. The first shown; see log")
+                start = time()
+                results = self.root_item.search_index.search(what)
+                elapsed = (time() - start) * 1000
+                self.search_query = what
+                self.search_names = False
+                self.show_search_results(results)
+                if results:
+                    prefix = what.lower().rstrip('*')
+                    first = next((code_item for code_item, _ in results
+                                  if code_item.name.lower().startswith(prefix)), results[0][0])
+                    self.show_search_result(first)
+                    self.status_bar.showMessage(f"Found {len(results)} items in {elapsed:.1f} ms.")
                 else:
                     self.treeview1.setFocus()
                     self.status_bar.showMessage(f"The term: {what} was not found.")
 
+    def on_find_name(self):
+        """Event handler of the search as you type, called after a pause in typing in the find line edit.
+        Lists the code items whose name matches the text in the search results pane, best matches first.
+
+        :return: None
+        """
+        mode = self.get_mode()
+        if mode & BASE_LOADED or mode & COMP_LOADED:
+            what = self.find_line_edit.text().strip()
+            if not what:
+                return
+            start = time()
+            results = self.root_item.name_index.search(what)
+            elapsed = (time() - start) * 1000
+            self.search_query = what
+            self.search_names = True
+            self.show_search_results([(code_item, 0) for code_item in results])
+            self.status_bar.showMessage(f"{len(results)} names match {what} ({elapsed:.1f} ms). "
+                                        f"Press Enter to search the code.")
+
+    def on_query(self):
+        """Event handler of the filter bar, called after a pause in typing or on Enter.
+        Only the code items matching the query, and the chapters or folders holding them, are shown in the
+        selection pane. An empty query shows all items again.
+
+        :return: None
+        """
+        self.query_timer.stop()
+        mode = self.get_mode()
+        query = self.query_line_edit.text().strip()
+        if not query or not mode & (BASE_LOADED | COMP_LOADED):
+            self.color_proxy_model.set_query_filter(None)
+            return
+        gui = GUI_COMPARE if mode & GUI_COMPARE else GUI_SELECT
+        start = time()
+        try:
+            results = QueryEngine(self.root_item, gui).search(query)
+        except ValueError as error:
+            self.status_bar.showMessage(str(error))
+            return
+        elapsed = (time() - start) * 1000
+        self.color_proxy_model.set_query_filter(set(results))
+        if results:
+            self.treeview1.expandAll()
+        self.status_bar.showMessage(f"{len(results)} items match the filter ({elapsed:.1f} ms).")
+
+    def show_search_results(self, results: List[Tuple[CodeItem, int]]):
+        """Fills the search results pane, applying the filter of the pane
+
+        :param results: list of tuples with the code items found and the versions of their code found
+        :return: None
+        """
+        self.search_results.clear()
+        compare = any(versions & COMPARE_CODE for _, versions in results)
+        for code_item, versions in results:
+            text = self.object_type(code_item) + ': ' + code_item.name
+            if compare:
+                found_in = [name for version, name in ((ORIGINAL_CODE, 'base'), (COMPARE_CODE, 'compare'))
+                            if versions & version]
+                text += f" ({', '.join(found_in)})"
+            list_item = QListWidgetItem(text)
+            list_item.setData(Qt.UserRole, code_item)
+            self.search_results.addItem(list_item)
+        self.on_search_filter_changed(self.search_filter_edit.text())
+        self.search_results_widget.setHidden(False)
+
+    def show_search_result(self, code_item: CodeItem):
+        """Selects a code item found in the selection pane and shows its code
+
+        :param code_item: the code item
+        :return: None
+        """
+        index = self.color_proxy_model.mapFromSource(self.tree_model.index_for_item(code_item))
+        if index.isValid():
+            self.treeview1.setCurrentIndex(index)
+            self.treeview1.scrollTo(index)
+            self.treeview1.setFocus()
+        self.show_item_data(code_item)
+
+    def on_search_result_clicked(self, list_item: QListWidgetItem):
+        """Event handler for a click on an item in the search results pane
+
+        :param list_item: the item clicked
+        :return: None
+        """
+        self.show_search_result(list_item.data(Qt.UserRole))
+
+    def on_search_filter_changed(self, text: str):
+        """Event handler for the filter of the search results pane, hides the results not containing the text
+
+        :param text: the filter text
+        :return: None
+        """
+        text = text.lower()
+        for row in range(self.search_results.count()):
+            list_item = self.search_results.item(row)
+            list_item.setHidden(text not in list_item.text().lower())
+
+    def on_tree_model_reset(self):
+        """Event handler for a reset of the tree model, the filter and the last search are repeated on the changed model
+
+        :return: None
+        """
+        if self.color_proxy_model.query_filter is not None:
+            self.on_query()
+        if not self.search_query:
+            return
+        if self.get_mode() & (BASE_LOADED | COMP_LOADED):
+            if self.search_names:
+                results = [(code_item, 0) for code_item in self.root_item.name_index.search(self.search_query)]
+            else:
+                results = self.root_item.search_index.search(self.search_query)
+            self.show_search_results(results)
+        else:
+            self.search_query = ''
+            self.search_results.clear()
+            self.search_results_widget.setHidden(True)
+
     def on_diff_buttons_clicked(self, button: QRadioButton):
         """Event handler for the radio buttons in the right pane to filter the view of code, during a compare.
         e.g. as original, new code, or changes
@@ -5654,132 +9178,558 @@ class VQLManagerWindow(QMainWindow):
         else:
             self.logger.info('No comparison found')
 
-    def on_click_item(self, item_index: QModelIndex):
-        """Event handler when an item in any treeview is clicked
-        A click on a CodeItem results in its code, info etc to be shown in the appropriate widgets
+    def on_click_item(self, item_index: QModelIndex):
+        """Event handler when an item in any treeview is clicked
+        A click on a CodeItem results in its code, info etc to be shown in the appropriate widgets
+
+        :param item_index: the QModelIndex of the item
+        :return: None
+        """
+        if not item_index:
+            self.dependency_model.set_root_code_item(None)
+            self.code_text_edit_cache = None
+            self.item_info.setPlainText('')
+            self.code_text_edit.clear()
+            return
+
+        if not item_index.isValid():
+            return
+
+        if item_index.model() is self.dependency_model:
+            item = item_index.internalPointer().code_item
+        else:
+            proxy_model = item_index.model()
+            item = proxy_model.sourceModel().item_for_index(proxy_model.mapToSource(item_index))
+
+        if item:
+            self.show_item_data(item)
+
+    def show_item_data(self, item):
+        """Helper function of on_click_item to show the info about a CodeItem
+
+        :return: None
+        """
+        if isinstance(item, CodeItem):
+            self.logger.debug('CodeItem clicked on View Pane: ' + item.name)
+            if item != self.dependency_model.get_root_code_item():
+                self.dependency_model.set_root_code_item(item)
+                self.treeview3.expandToDepth(DEPENDEE_PREFETCH_DEPTH - 2)
+
+            cache = dict()
+            cache['object_name'] = item.name
+            cache['code'] = item.base_data.code
+            cache['compare_code'] = item.compare_data.code
+            cache['fingerprint'] = item.base_data.fingerprint
+            cache['compare_fingerprint'] = item.compare_data.fingerprint
+            self.code_text_edit_cache = cache
+            self.show_code_text()
+            self.show_info(item)
+        else:
+            if self.dependency_model.get_root_code_item():
+                self.dependency_model.set_root_code_item(None)
+            self.item_info.setPlainText('')
+            self.code_text_edit_cache = None
+            self.code_text_edit.clear()
+
+    def show_info(self, code_item):
+        """Helper function of show_item_data to show the info about a CodeItem
+
+        :param code_item: the CodeItem whose info is shown
+        :return: None
+        """
+        if not code_item:
+            self.item_info.setPlainText('')
+            return
+        name = code_item.name
+
+        if self.states['base_loaded'] in self.state_machine.configuration():
+            gui = GUI_SELECT
+        elif self.states['compare_loaded'] in self.state_machine.configuration():
+            gui = GUI_COMPARE
+        else:
+            self.item_info.setPlainText('')
+            return
+        header = self.object_type(code_item) + ': ' + name
+        data = code_item.get_context_data(gui)
+        denodo_path = data.denodo_path
+        repository_path = str(code_item.get_file_path(Path(code_item.chapter.name)))
+        sources = [f"[{self.object_type(source)} : {source.name}]" for source in self.get_item_sources(code_item, gui)]
+        source_string = '\n>> ' + '\n>> '.join(sources)
+        info = header
+        info += f"\nDenodo path: {denodo_path}"
+        info += f"\nRepository path: {repository_path}"
+        if gui & GUI_COMPARE:
+            info += f"\nFingerprint: {code_item.base_data.fingerprint or '-'} -> {data.fingerprint or '-'}"
+            if self.get_mode() & ANCE_LOADED:
+                info += f"\nThree-way merge: {code_item.get_merge()[0]}"
+        else:
+            info += f"\nFingerprint: {data.fingerprint}"
+
+        info += f"\nSources: {source_string}"
+        self.item_info.setPlainText(info)
+
+    def show_code_text(self, keep_position: bool=False):
+        """Shows the code of the clicked CodeItem in the Code edit widget.
+        This function uses the cached CodeItem
+
+        :param keep_position: keep the scroll position and cursor line, when the same code is shown again formatted
+        :return: None
+        """
+
+        if self.code_text_edit_cache:
+            # convenience names
+            item_data = self.code_text_edit_cache
+            selector = self.code_show_selector
+            viewer = self.code_text_edit
+            self.code_text_fingerprint = None
+            object_name = item_data['object_name']
+            code = ''
+            fingerprint = ''
+            if self.states['base_loaded'] in self.state_machine.configuration():
+                code, fingerprint = item_data['code'], item_data['fingerprint']
+            elif self.states['compare_loaded'] in self.state_machine.configuration():
+                if selector & ORIGINAL_CODE:
+                    code, fingerprint = item_data['code'], item_data['fingerprint']
+                elif selector & COMPARE_CODE:
+                    code, fingerprint = item_data['compare_code'], item_data['compare_fingerprint']
+                elif selector & DIFF_CODE:
+                    fingerprints = (item_data['fingerprint'], item_data['compare_fingerprint'])
+                    if len(item_data['code']) + len(item_data['compare_code']) > CODE_VIEWER_PLAIN_SIZE:
+                        viewer.set_diff(object_name, self.get_diff_patch(
+                            object_name, item_data['code'], item_data['compare_code'], fingerprints))
+                    else:
+                        viewer.set_html(self.get_diff_html(
+                            object_name, item_data['code'], item_data['compare_code'], fingerprints))
+                    return
+            self.code_text_fingerprint = fingerprint
+            if keep_position:
+                viewer.replace_code(object_name, self.get_formatted_sql(code, fingerprint))
+            else:
+                viewer.set_code(object_name, self.get_formatted_sql(code, fingerprint))
+
+    def get_formatted_sql(self, code: str, fingerprint: str, on_demand: bool=False)->str:
+        """Returns the code with the sql of views formatted, if it is available.
+        Small code is formatted at once, larger code is returned as is while it is formatted in the background.
+        Code larger than SQL_FORMAT_SIZE is only formatted on demand. Formatted code is kept in the sql_format_cache.
+
+        :param code: the code
+        :param fingerprint: the fingerprint of the code
+        :param on_demand: format the code regardless of its size
+        :return: the formatted code or the code itself
+        """
+        formatted = sql_format_cache.get(fingerprint)
+        if formatted is not None:
+            return formatted
+        if ' AS SELECT ' not in code:
+            return code
+        if len(code) <= SQL_FORMAT_SYNC_SIZE:
+            formatted = format_sql(code)
+            sql_format_cache.put(fingerprint, formatted)
+            return formatted
+        if on_demand or len(code) <= SQL_FORMAT_SIZE:
+            self.start_sql_format(fingerprint, code)
+        return code
+
+    def start_sql_format(self, fingerprint: str, code: str):
+        """Formats code in the background. One thread runs at a time, only the last request waits for it.
+
+        :param fingerprint: the fingerprint of the code
+        :param code: the code
+        :return: None
+        """
+        if self.sql_format_thread:
+            if self.sql_format_thread.fingerprint != fingerprint:
+                self.sql_format_job = (fingerprint, code)
+            return
+        self.sql_format_job = None
+        self.sql_format_thread = SqlFormatThread(fingerprint, code, self)
+        self.sql_format_thread.formatted.connect(self.on_sql_formatted)
+        self.sql_format_thread.finished.connect(self.on_sql_format_finished)
+        self.sql_format_thread.start()
+
+    def on_sql_formatted(self, fingerprint: str, formatted: str):
+        """Event handler for formatted code from the SqlFormatThread, the code view is updated if it shows the code
+
+        :param fingerprint: the fingerprint of the raw code
+        :param formatted: the formatted code
+        :return: None
+        """
+        sql_format_cache.put(fingerprint, formatted)
+        if fingerprint == self.code_text_fingerprint:
+            self.show_code_text(keep_position=True)
+
+    def on_sql_format_finished(self):
+        """Event handler for the end of the SqlFormatThread, starts the waiting request if there is one
+
+        :return: None
+        """
+        self.sql_format_thread.deleteLater()
+        self.sql_format_thread = None
+        if self.sql_format_job:
+            self.start_sql_format(*self.sql_format_job)
+
+    def on_format_sql(self):
+        """Event handler for the menu item to format the sql of the shown view, regardless of its size
+
+        :return: None
+        """
+        item_data = self.code_text_edit_cache
+        if not item_data or not self.code_text_fingerprint:
+            return
+        if self.code_text_fingerprint == item_data['fingerprint']:
+            code = item_data['code']
+        else:
+            code = item_data['compare_code']
+        self.get_formatted_sql(code, self.code_text_fingerprint, on_demand=True)
+
+    @staticmethod
+    def get_diff_patch(object_name: str, code: str, compare_code: str,
+                       fingerprints: Tuple[str, str])->List[Tuple[int, str]]:
+        """Returns the diff tuples of the code and compare code of a large CodeItem for the plain text code view.
+        The result is kept in the diff_cache, next to the rendered html of smaller items.
+
+        :param object_name: Name of the CodeItem
+        :param code: the original code
+        :param compare_code: the new code
+        :param fingerprints: the fingerprints of the original and the new code
+        :return: list of diff tuples (operation, text)
+        """
+        key = (object_name,) + tuple(fingerprints) + (DIFF_CODE,)
+        diff_patch = diff_cache.get(key)
+        if diff_patch is None:
+            if code and compare_code:
+                diff_patch = CodeItem.get_diff_patch(code, compare_code)
+            elif code:
+                diff_patch = [(-1, code)]
+            else:
+                diff_patch = [(1, compare_code)] if compare_code else []
+            diff_cache.put(key, diff_patch)
+        return diff_patch
+
+    def get_diff_html(self, object_name: str, code: str, compare_code: str, fingerprints: Tuple[str, str])->str:
+        """Returns the html showing the difference between the code and compare code of a CodeItem.
+        The html of the comparison is kept in the html_cache, keyed by the fingerprints of both code versions.
+
+        :param object_name: Name of the CodeItem
+        :param code: the original code
+        :param compare_code: the new code
+        :param fingerprints: the fingerprints of the original and the new code
+        :return: the html
+        """
+        key = tuple(fingerprints)
+        difference = html_cache.get(key)
+        if difference is None:
+            difference = CodeItem.get_diff(code, compare_code)
+            html_cache.put(key, difference)
+        return self.format_source_code(object_name, difference)
+
+    def start_diff_stats(self):
+        """Starts the background computation of the difference statistics of all changed code items
+
+        :return: None
+        """
+        self.stop_diff_stats()
+        self.diff_stats_items = [code_item for code_item in self.root_item.get_code_items()
+                                 if code_item.color == yellow]
+        if not self.diff_stats_items:
+            return
+        jobs = [(i, code_item.base_data.code, code_item.compare_data.code)
+                for i, code_item in enumerate(self.diff_stats_items)]
+        self.logger.info(f"Computing differences of {len(jobs)} changed items.")
+        self.diff_stats_thread = DiffStatsThread(jobs, self)
+        self.diff_stats_thread.progress.connect(self.on_diff_stats_progress)
+        self.diff_stats_thread.stats_ready.connect(self.on_diff_stats_ready)
+        self.diff_stats_thread.finished.connect(self.diff_stats_thread.deleteLater)
+        self.diff_stats_thread.start()
+
+    def stop_diff_stats(self):
+        """Stops a running computation of difference statistics and hides their columns
+
+        :return: None
+        """
+        if self.diff_stats_thread:
+            self.diff_stats_thread.progress.disconnect(self.on_diff_stats_progress)
+            self.diff_stats_thread.stats_ready.disconnect(self.on_diff_stats_ready)
+            self.diff_stats_thread.requestInterruption()
+            self.diff_stats_thread = None
+        self.diff_stats_items = list()
+        self.color_proxy_model.set_show_diff_stats(False)
+
+    def on_diff_stats_progress(self, done: int, total: int):
+        """Event handler for the progress of the difference statistics computation
+
+        :param done: number of items done
+        :param total: total number of items
+        :return: None
+        """
+        if self.sender() is not self.diff_stats_thread:
+            return
+        self.status_bar.showMessage(f"Computing differences: {done} of {total}")
+
+    def on_diff_stats_ready(self, results: list):
+        """Event handler for the finished difference statistics computation, the results are stored
+        in the compare data of the code items and shown in extra columns of the selection pane
+
+        :param results: list with tuples of the index of the code item and its statistics
+        :return: None
+        """
+        if self.sender() is not self.diff_stats_thread:
+            return  # results of a stopped computation
+        for i, stats in results:
+            self.diff_stats_items[i].compare_data.diff_stats = DiffStats(stats)
+        self.diff_stats_thread = None
+        self.diff_stats_items = list()
+        self.color_proxy_model.set_show_diff_stats(True)
+        self.logger.info(f"Computed differences of {len(results)} changed items.")
+        self.status_bar.showMessage('Differences computed')
+
+    def on_export_compare_report(self):
+        """Event handler for the Export Compare Report menu item.
+        Writes the changed, new and lost items with the statistics of the changed items to a json or csv file.
+
+        :return: None
+        """
+        self.logger.info('Exporting compare report.')
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Compare Report", open_path,
+                                                  "Json files (*.json);;Csv files (*.csv);;All files (*)")
+        if not filename:
+            return
+        filename = Path(str(filename))
+        filename = filename if filename.suffix else filename.with_suffix('.json')
+        report = self.root_item.get_compare_report()
+        if filename.suffix.lower() == '.csv':
+            content = StringIO()
+            writer = csv.DictWriter(content, fieldnames=list(COMPARE_REPORT_FIELDS), delimiter=';',
+                                    lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(report)
+            content = content.getvalue()
+        else:
+            content = json.dumps(report, indent=2)
+        if self.write_file(filename, content):
+            msg = f"Compare report saved with {len(report)} items."
+            self.logger.info(msg)
+            self.status_bar.showMessage(msg)
+
+    def on_batch_compare(self):
+        """Event handler for the Batch Compare menu item.
+        Reads the chosen files in the background, the report is saved when they are done.
+
+        :return: None
+        """
+        if self.batch_compare_thread:
+            message_to_user("A batch compare is still running", parent=self)
+            return
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filenames, _ = QFileDialog.getOpenFileNames(self, "Select Files to Compare", open_path,
+                                                    "Denodo Scripts (*.vql);;All files (*)")
+        if len(filenames) < 2:
+            return
+        batch_compare = BatchCompare([Path(str(filename)) for filename in filenames])
+        self.logger.info(f"Batch compare of {len(filenames)} files: {', '.join(batch_compare.labels)}")
+        self.batch_compare_thread = BatchCompareThread(batch_compare.get_jobs(), self)
+        self.batch_compare_thread.progress.connect(self.on_batch_compare_progress)
+        self.batch_compare_thread.scan_ready.connect(partial(self.on_batch_compare_ready, batch_compare))
+        self.batch_compare_thread.finished.connect(self.batch_compare_thread.deleteLater)
+        self.batch_compare_thread.start()
+
+    def on_batch_compare_progress(self, done: int, total: int):
+        """Event handler for the progress of a batch compare
+
+        :param done: number of files read
+        :param total: total number of files
+        :return: None
+        """
+        self.status_bar.showMessage(f"Batch compare: {done} of {total} files read")
+
+    def on_batch_compare_ready(self, batch_compare: BatchCompare, results: list):
+        """Event handler for the end of the reading of a batch compare. Saves the report as json or csv;
+        with csv the object versions are saved in a second file with '_objects' added to the name.
 
-        :param item_index: the QModelIndex of the item
+        :param batch_compare: the batch compare
+        :param results: list with the results of scan_export
         :return: None
         """
-        if not item_index:
-            self.dependency_model.set_root_code_item(None)
-            self.code_text_edit_cache = None
-            self.item_info.setPlainText('')
-            self.code_text_edit.setText('')
-            return
+        self.batch_compare_thread = None
+        for result in results:
+            batch_compare.set_result(result)
+        for path in batch_compare.failed:
+            self.logger.error(f"Batch compare could not read: {path}")
+        self.batch_compare = batch_compare
+        self.batch_pair_action.setEnabled(True)
+        for row in batch_compare.get_matrix():
+            for pair in row:
+                if pair['base'] != pair['compare']:
+                    self.logger.info(f"{pair['base']} -> {pair['compare']}: {pair['added']} added, "
+                                     f"{pair['removed']} removed, {pair['changed']} changed")
+        self.status_bar.showMessage("Batch compare ready")
 
-        if not item_index.isValid():
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Batch Compare Report", open_path,
+                                                  "Json files (*.json);;Csv files (*.csv);;All files (*)")
+        if not filename:
             return
-
-        if item_index.model() is self.dependency_model:
-            item = item_index.internalPointer().code_item
+        filename = Path(str(filename))
+        filename = filename if filename.suffix else filename.with_suffix('.json')
+        if filename.suffix.lower() == '.csv':
+            pairs, objects = batch_compare.get_csv()
+            saved = self.write_file(filename, pairs) and \
+                self.write_file(filename.with_name(filename.stem + '_objects.csv'), objects)
         else:
-            item = item_index.model().mapToSource(item_index).internalPointer()
-
-        if item:
-            self.show_item_data(item)
+            saved = self.write_file(filename, batch_compare.get_json())
+        if saved:
+            msg = f"Batch compare report of {len(batch_compare.paths)} files saved."
+            self.logger.info(msg)
+            self.status_bar.showMessage(msg)
 
-    def show_item_data(self, item):
-        """Helper function of on_click_item to show the info about a CodeItem
+    def on_open_batch_pair(self):
+        """Event handler for the Open Batch Compare Pair menu item.
+        Opens two files of the last batch compare as base and compare model.
 
         :return: None
         """
-        if isinstance(item, CodeItem):
-            self.logger.debug('CodeItem clicked on View Pane: ' + item.name)
-            if item != self.dependency_model.get_root_code_item():
-                self.dependency_model.set_root_code_item(item)
-                self.treeview3.expandAll()
+        if not self.batch_compare:
+            return
+        labels = self.batch_compare.labels
+        # noinspection PyArgumentList
+        base_label, ok = QInputDialog.getItem(self, 'Batch Compare', 'Base file:', labels, 0, False)
+        if not ok:
+            return
+        # noinspection PyArgumentList
+        compare_label, ok = QInputDialog.getItem(self, 'Batch Compare', 'Compare file:', labels,
+                                                 min(labels.index(base_label) + 1, len(labels) - 1), False)
+        if not ok or compare_label == base_label:
+            return
+        base_path = self.batch_compare.paths[labels.index(base_label)]
+        compare_path = self.batch_compare.paths[labels.index(compare_label)]
 
-            cache = dict()
-            cache['object_name'] = item.name
-            cache['code'] = item.base_data.code
-            cache['compare_code'] = item.compare_data.code
-            self.code_text_edit_cache = cache
-            self.show_code_text()
-            self.show_info(item)
-        else:
-            if self.dependency_model.get_root_code_item():
-                self.dependency_model.set_root_code_item(None)
-            self.item_info.setPlainText('')
-            self.code_text_edit_cache = None
-            self.code_text_edit.setText('')
+        def open_compare():
+            """Opens the compare file if the base file got loaded
 
-    def show_info(self, code_item):
-        """Helper function of show_item_data to show the info about a CodeItem
+            :return: None
+            """
+            if self.base_repository_file == base_path and self.get_mode() & BASE_LOADED:
+                self.on_open(GUI_COMPARE | COMP_FILE, compare_path)
+
+        self.on_open(GUI_SELECT | BASE_FILE, base_path)
+        # the compare file is opened after the state machine has handled the loading of the base file
+        QTimer.singleShot(0, open_compare)
+
+    def on_export_patch_bundle(self):
+        """Event handler for the Export Patch Bundle menu item.
+        Writes the differences between the base and compare code to a patch bundle.
 
-        :param code_item: the CodeItem whose info is shown
         :return: None
         """
-        if not code_item:
-            self.item_info.setPlainText('')
+        self.logger.info('Exporting patch bundle.')
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Patch Bundle", open_path,
+                                                  "Patch bundles (*.vqlpatch);;All files (*)")
+        if not filename:
             return
-        name = code_item.name
-
-        if self.states['base_loaded'] in self.state_machine.configuration():
-            gui = GUI_SELECT
-        elif self.states['compare_loaded'] in self.state_machine.configuration():
-            gui = GUI_COMPARE
-        else:
-            self.item_info.setPlainText('')
+        filename = Path(str(filename))
+        filename = filename if filename.suffix else filename.with_suffix('.vqlpatch')
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            bundle = PatchBundle.from_root_item(self.root_item)
+            bundle.save(filename)
+        except (OSError, IOError) as error:
+            msg = f"An error occurred during writing of file: {str(filename)}"
+            self.logger.error(msg)
+            error_message_box("Error", msg, str(error), parent=self)
             return
-        header = self.object_type(code_item) + ': ' + name
-        data = code_item.get_context_data(gui)
-        denodo_path = data.denodo_path
-        repository_path = str(code_item.get_file_path(Path(code_item.chapter.name)))
-        sources = list([f"[{self.object_type(source)} : {source.name}]"
-                        for source in self.get_item_sources(code_item, gui, 0)])
-        sources = set(sources)
-        source_string = '\n>> ' + '\n>> '.join(sources)
-        info = header
-        info += f"\nDenodo path: {denodo_path}"
-        info += f"\nRepository path: {repository_path}"
-
-        info += f"\nSources: {source_string}"
-        self.item_info.setPlainText(info)
+        finally:
+            # noinspection PyArgumentList
+            QApplication.restoreOverrideCursor()
+        msg = f"Patch bundle saved with {len(bundle.entries)} objects."
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
 
-    def show_code_text(self):
-        """Shows the code of the clicked CodeItem in the Code edit widget.
-        This function uses the cached CodeItem
+    def on_apply_patch_bundle(self, source_type: int):
+        """Event handler for the Apply Patch Bundle menu items.
+        A bundle is applied to a file, saving the result as a new file, or to a repository in place.
 
+        :param source_type: either FILE or REPO
         :return: None
         """
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filename, _ = QFileDialog.getOpenFileName(self, "Open Patch Bundle", open_path,
+                                                  "Patch bundles (*.vqlpatch);;All files (*)")
+        if not filename:
+            return
+        bundle_file = Path(str(filename))
+        try:
+            bundle = PatchBundle.load(bundle_file)
+        except (OSError, IOError, ValueError) as error:
+            msg = f"An error occurred during reading of patch bundle: {str(bundle_file)}"
+            self.logger.error(msg)
+            error_message_box("Error", msg, str(error), parent=self)
+            return
 
-        if self.code_text_edit_cache:
-            # convenience names
-            item_data = self.code_text_edit_cache
-            selector = self.code_show_selector
-            put_text = self.code_text_edit.setHtml
-            object_name = item_data['object_name']
-            html_code = ''
-            if self.states['base_loaded'] in self.state_machine.configuration():
-                html_code = self.format_source_code(object_name, item_data['code'], selector)
-            elif self.states['compare_loaded'] in self.state_machine.configuration():
-                if selector & ORIGINAL_CODE:
-                    html_code = self.format_source_code(object_name, item_data['code'], selector)
-                elif selector & COMPARE_CODE:
-                    html_code = self.format_source_code(object_name, item_data['compare_code'], selector)
-                elif selector & DIFF_CODE:
-                    difference = CodeItem.get_diff(item_data['code'], item_data['compare_code'])
-                    html_code = self.format_source_code(object_name, difference, selector)
-            put_text(html_code)
+        if source_type & FILE:
+            target = self.ask_file_open()
+            if not target:
+                return
+            # noinspection PyArgumentList
+            filename, _ = QFileDialog.getSaveFileName(self, "Save Patched File", str(target.parent),
+                                                      "Denodo Scripts (*.vql);;All files (*)")
+            if not filename:
+                return
+            result_file = Path(str(filename))
+            result_file = result_file if result_file.suffix else result_file.with_suffix('.vql')
+            if result_file.resolve() == target.resolve():
+                message_to_user("The patched file must be saved as a new file", parent=self)
+                return
+        else:
+            target = self.ask_repository_open()
+            if not target or not self.ask_overwrite():
+                return
+            result_file = target
+
+        self.logger.info(f"Applying patch bundle {bundle_file} to {target}")
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            if source_type & FILE:
+                with target.open() as source, result_file.open('w') as result:
+                    results = bundle.apply_to_file(source, result.write)
+            else:
+                results = bundle.apply_to_repository(target)
+        except (OSError, IOError) as error:
+            msg = f"An error occurred during applying the patch bundle to: {str(target)}"
+            self.logger.error(msg)
+            error_message_box("Error", msg, str(error), parent=self)
+            return
+        finally:
+            # noinspection PyArgumentList
+            QApplication.restoreOverrideCursor()
+
+        for result in ('fuzzy', 'failed', 'missing'):
+            for name in results[result]:
+                self.logger.warning(f"Patch {result}: {name}")
+        counts = ', '.join(f"{len(names)} {result}" for result, names in results.items() if names)
+        msg = f"Patch bundle applied to {result_file}: {counts or 'nothing to do'}."
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
+        if results['failed'] or results['missing']:
+            message_to_user(f"Not all patches could be applied.\n{counts}\n"
+                            f"Please see log file for the list of affected items.", parent=self)
 
-    def get_item_sources(self, item: CodeItem, gui: int, n_recurse: int):
-        """Generator for all dependencies of a CodeItem
+    def get_item_sources(self, item: CodeItem, gui: int)->Tuple[CodeItem, ...]:
+        """Returns all upstream dependencies of a CodeItem, nearest first
 
-        :param item: the CodeItem whose dependencies are yielded
+        :param item: the CodeItem whose dependencies are returned
         :param gui: the gui indicating compare code or base code
-        :param n_recurse: internal variable to prevent stack overflows
-        :return:
+        :return: tuple of code items
         """
-        n_recurse = n_recurse + 1
-        if n_recurse > 500:
-            return
-        data = item.get_context_data(gui)
-        last = True if len(data.dependencies) == 1 else False
-        for dependency in data.dependencies:
-            if last:
-                yield dependency
-            yield from self.get_item_sources(dependency, gui, n_recurse)
+        return self.root_item.graph.sources(item, gui)
 
     @staticmethod
     def object_type(code_item)->str:
@@ -5794,7 +9744,7 @@ class VQLManagerWindow(QMainWindow):
 
     def on_selection_changed(self, item: TreeItem):
         """Event handler for changes in the selection (check boxes) in the treeview1.
-        This function checks effects on other items through dependencies and dependees
+        This function checks effects on other items through the transitive dependencies and dependees
         and issues warnings in the log
 
         :param item: The Item whose selection is changed
@@ -5802,69 +9752,101 @@ class VQLManagerWindow(QMainWindow):
         """
         info = ''
         selected_string = 'selected' if item.selected else 'unselected'
+        mode = self.get_mode()
+        gui = GUI_COMPARE if mode & GUI_COMPARE else GUI_SELECT
 
         if isinstance(item, Chapter):
             msg = f"Chapter:{item.name} got {selected_string}."
-            self.logger.info(msg)
-            self.status_bar.showMessage(msg)
+            code_items = list(self.get_code_items_below(item))
         elif isinstance(item, DenodoFolder):
             msg = f"Denodo folder:{item.name} got {selected_string}."
-            self.logger.info(msg)
-            self.status_bar.showMessage(msg)
+            code_items = list(self.get_code_items_below(item))
         elif isinstance(item, CodeItem):
-            mode = self.get_mode()
-            item_string = f"{self.object_type(item)}:{item.name}"
-            msg = f"{item_string} got {selected_string}."
-            self.logger.info(msg)
-            self.status_bar.showMessage(msg)
-            if mode & GUI_SELECT:
-                data = item.base_data
-                if item.selected:
-                    info = f"Please check if all dependencies of {item_string} are fulfilled.\n"
-                    info += "This software does not check that."
-                    self.status_bar.showMessage(info)
-                else:
-                    if any([dependee.selected for dependee in data.dependees]):
-                        info = 'Warning: This item has other items that are dependent on it.\n'
-                        info += 'These are now orphaned.\nPlease see log file for the list of affected items.'
-                        dependees_orphaned = [dependee for dependee in data.dependees if dependee.selected]
-                        for dependee in dependees_orphaned:
-                            orphan_string = f"{self.object_type(dependee)}:{dependee.name}"
-                            self.logger.warning(f"Un-selecting of {item_string} caused orphan: {orphan_string}")
+            msg = f"{self.object_type(item)}:{item.name} got {selected_string}."
+            code_items = [item]
+        else:
+            return
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
 
-            elif mode & GUI_COMPARE:
-                data = item.compare_data
-                if item.selected:
-                    if item.color == red:  # lost item got selected
-                        data.code = item.base_data.code  # fill compare code with base code, so code can be saved
-                        items = {code_item.object_name for code_item in item.base_data.dependencies}
-                        dependencies_not_met = [item for item in items if not data.code or not item.selected]
-                        if any(dependencies_not_met):
-                            info = 'Warning: This base data item depends on base data items\n'
-                            info += 'that are not selected or do not exist in the compare base.\n'
-                            info += 'Please see log file for the list of dependencies.'
-                            for dependency_not_met in dependencies_not_met:
-                                dependency_string = f"{self.object_type(dependency_not_met)}:{dependency_not_met.name}"
-                                self.logger.warning(f"Selecting of {item_string} caused dependency to be "
-                                                    f"broken with: {dependency_string}")
-                    else:
-                        info = f"Please check if all dependencies of {item_string} are fulfilled."
-                        self.status_bar.showMessage(info)
-                        info += "\nThis software does not check that."
-                else:
-                    if item.color == red:  # lost item got unselected
-                        data.code = ''  # remove the code again
-                    if any([dependee.selected for dependee in data.dependees]):
-                        info = 'Warning: This item has other items that are dependent on it.'
-                        self.status_bar.showMessage(info)
-                        info += '\nThese are now orphaned.\nPlease see log file for the list of affected items.'
-                        dependees_orphaned = [dependee for dependee in data.dependees if dependee.selected]
-                        for dependee in dependees_orphaned:
-                            orphan_string = f"{self.object_type(dependee)}:{dependee.name}"
-                            self.logger.warning(f"Un-selecting of {item_string} caused orphan: {orphan_string}")
+        if gui & GUI_COMPARE:
+            for code_item in code_items:
+                if code_item.color == red:
+                    # a selected lost item gets the base code as compare code, so the code can be saved
+                    code_item.compare_data.set_code(code_item.base_data.code if code_item.selected else '')
+
+        if item.selected:
+            analysis = ImpactAnalysis(self.root_item.graph, gui, [], code_items)
+        else:
+            analysis = ImpactAnalysis(self.root_item.graph, gui, code_items)
+
+        headlines = list()
+        if analysis.orphans:
+            headlines.append(f"Warning: {len(analysis.orphans)} selected items depend on the unselected item(s).")
+            info = headlines[-1] + '\nThese are now orphaned.\nPlease see log file for the list of affected items.'
+        if analysis.unmet:
+            headlines.append(f"Warning: The selected item(s) depend on {len(analysis.unmet)} items")
+            if info:
+                info += '\n\n'
+            info += headlines[-1] + '\nthat are not selected or do not exist in the compare base.\n'
+            info += 'Please see log file for the list of dependencies.'
+        for kind, code_item, cause, via in analysis.report_lines():
+            item_string = f"{self.object_type(cause)}:{cause.name}"
+            affected_string = f"{self.object_type(code_item)}:{code_item.name}"
+            if kind == 'Orphan':
+                self.logger.warning(f"Un-selecting of {item_string} caused orphan: {affected_string}")
+            else:
+                self.logger.warning(f"Selecting of {item_string} caused dependency to be "
+                                    f"broken with: {affected_string}")
         if info:
+            self.status_bar.showMessage(' '.join(headlines))
             self.item_info.setPlainText(info)
 
+    @staticmethod
+    def get_code_items_below(item: TreeItem)->Iterator[CodeItem]:
+        """Generator for the code items in a chapter or Denodo folder, including sub folders
+
+        :param item: the chapter or Denodo folder
+        :return: Iterator with code items
+        """
+        for child in item.child_items:
+            if isinstance(child, CodeItem):
+                yield child
+            else:
+                yield from VQLManagerWindow.get_code_items_below(child)
+
+    def on_export_impact(self):
+        """Event handler for the Export Impact Report menu item.
+        The impact of all selection changes, compared to a freshly loaded model, is written to a csv file.
+        In compare mode lost items are unselected initially, all other items are selected.
+
+        :return: None
+        """
+        self.logger.info('Exporting impact report.')
+        gui = GUI_COMPARE if self.get_mode() & GUI_COMPARE else GUI_SELECT
+        deselected = list()
+        selected = list()
+        for code_item in self.root_item.get_code_items():
+            lost = gui & GUI_COMPARE and code_item.color == red
+            if lost and code_item.selected:
+                selected.append(code_item)
+            elif not lost and not code_item.selected:
+                deselected.append(code_item)
+        analysis = ImpactAnalysis(self.root_item.graph, gui, deselected, selected)
+
+        open_path = str(self.working_folder if self.working_folder else Path.cwd())
+        # noinspection PyArgumentList
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Impact Report", open_path,
+                                                  "Csv files (*.csv);;Text files (*.txt);;All files (*)")
+        if not filename:
+            return
+        filename = Path(str(filename))
+        filename = filename if filename.suffix else filename.with_suffix('.csv')
+        if self.write_file(filename, analysis.get_report()):
+            msg = f"Impact report saved: {len(analysis.orphans)} orphans, {len(analysis.unmet)} unmet dependencies."
+            self.logger.info(msg)
+            self.status_bar.showMessage(msg)
+
     def on_about_vql_manager(self):
         """Event handler for the click on the About menu item in the help menu.
 
@@ -5883,58 +9865,16 @@ class VQLManagerWindow(QMainWindow):
         QMessageBox.aboutQt(self, self.windowTitle())
 
     @staticmethod
-    def format_source_code(object_name: str, raw_code: str, code_type: int)->str:
-        """Creates html for the code edit widget to view the source code.
+    def format_source_code(object_name: str, raw_code: str)->str:
+        """Creates html for the code edit widget to view the comparison of source code.
 
         :param object_name: Name of the CodeItem
-        :param raw_code: the raw code string
-        :param code_type: and indicator what code is formatted either ORIGINAL_CODE or COMPARE_CODE or DIFF_CODE
+        :param raw_code: the html of the comparison
         :return: the constructed html
         """
-
-        def format_sql(_code: str)->str:
-            """Formats the sql in the code of View type CodeItems
-
-            :param _code: the code to be formatted
-            :return: the formatted code
-            """
-            chars = 4
-            start = _code.find(' AS SELECT ') + chars
-            end = _code.find(';', start)
-            if chars <= start < end:
-                clause = sqlparse.format(_code[start:end], reindent=True, indent_tabs=False, indent_width=2)
-                if clause:
-                    return _code[:start] + '\n' + clause + _code[end:]
-
-            return _code
-
-        def multi_substitution(_substitutions: list, _code: str)->str:
-            """
-            Simultaneously perform all substitutions on the subject string.
-            :param _substitutions: list with substitutions
-            :param _code: the code
-            :return: the substituted code
-            """
-            re_pattern = '|'.join(f"(\\b{escape(original)}\\b)" for original, substitute in _substitutions)
-            _substitutions = [substitute for original, substitute in _substitutions]
-            return sub(re_pattern, lambda x: _substitutions[x.lastindex - 1], _code)
-
         if not raw_code:
             return ''
-
-        html = ''
-        if code_type & (ORIGINAL_CODE | COMPARE_CODE):
-            code = raw_code
-            code = format_sql(code)
-            code = multi_substitution(SUBSTITUTIONS, code)
-            code = code.replace('\n', '<br />\n')
-            code = code.replace('    ', ' &nbsp; &nbsp; &nbsp; &nbsp; ')
-            body = '<p style="color:' + white + '">' + code + '</p>'
-            body = body.replace(object_name, '<font color="' + red + '">' + object_name + '</font>')
-            html = doc_template(object_name, body)
-        elif code_type & DIFF_CODE:
-            html = doc_template(object_name, raw_code)
-        return html
+        return doc_template(object_name, raw_code)
 
     def on_switch_view(self):
         """Event handler for the click on the menu item to switch between SCRIPT view or Denodo view.
@@ -5944,7 +9884,7 @@ class VQLManagerWindow(QMainWindow):
 
         if self.get_mode() & BASE_LOADED:
             if self.denodo_folder_structure_action.isChecked():
-                if self.tree_model.change_view(self.get_mode() | DENODO_VIEW):
+                if self.change_tree_view(self.treeview1, DENODO_VIEW):
                     self.denodo_folder_structure_action.setText('Switch to VQL View')
                     self.logger.debug('Switching to Denodo View')
                 else:
@@ -5954,7 +9894,166 @@ class VQLManagerWindow(QMainWindow):
             else:
                 self.logger.debug('Switching to VQL View')
                 self.denodo_folder_structure_action.setText('Switch to DENODO View')
-                self.tree_model.change_view(self.get_mode() | SCRIPT_VIEW)
+                self.change_tree_view(self.treeview1, SCRIPT_VIEW)
+
+    def on_switch_selection_view(self):
+        """Event handler for the click on the menu item to switch the View Selection pane between SCRIPT view or
+        Denodo view, independent of the view of the selection pane.
+
+        :return: None
+        """
+        if self.get_mode() & BASE_LOADED:
+            if self.denodo_selection_view_action.isChecked():
+                if not self.change_tree_view(self.treeview2, DENODO_VIEW):
+                    message_to_user('Denodo view not possible. Missing folders in the code.', parent=self)
+                    self.denodo_selection_view_action.setChecked(False)
+            else:
+                self.change_tree_view(self.treeview2, SCRIPT_VIEW)
+
+    def change_tree_view(self, tree_view: QTreeView, view: int)->bool:
+        """Changes the view shown in treeview1 or treeview2. The expanded items of the view left are remembered
+        and expanded again when the view is shown again.
+
+        :param tree_view: the tree view
+        :param view: SCRIPT_VIEW or DENODO_VIEW
+        :return: True if success
+        """
+        proxy_model = tree_view.model()
+        source_model = proxy_model.sourceModel()
+        old_view = source_model.view
+        expanded = list()
+        parents = [QModelIndex()]
+        while parents:
+            parent = parents.pop()
+            for row in range(proxy_model.rowCount(parent)):
+                index = proxy_model.index(row, 0, parent)
+                if tree_view.isExpanded(index):
+                    expanded.append(source_model.item_for_index(proxy_model.mapToSource(index)))
+                    parents.append(index)
+        if not source_model.change_view(view):
+            return False
+        if source_model.view != old_view:
+            self.expanded_items[(tree_view, old_view)] = expanded
+            for item in self.expanded_items.get((tree_view, source_model.view), list()):
+                index = proxy_model.mapFromSource(source_model.index_for_item(item))
+                if index.isValid():
+                    tree_view.setExpanded(index, True)
+        return True
+
+    def set_ancestor_actions_enabled(self, enabled: bool):
+        """Enables or disables the menu items of the three-way compare, the export items need a loaded ancestor
+
+        :param enabled: flag
+        :return: None
+        """
+        self.open_ancestor_file_action.setEnabled(enabled)
+        self.open_ancestor_folder_action.setEnabled(enabled)
+        self.export_merged_file_action.setEnabled(enabled and bool(self.get_mode() & ANCE_LOADED))
+        self.export_merged_folder_action.setEnabled(enabled and bool(self.get_mode() & ANCE_LOADED))
+
+    def on_open_ancestor(self, source_type: int):
+        """Event handler for the Open Common Ancestor menu items.
+        Loads the common ancestor of the base and compare code and colors the items on their three-way merge status.
+
+        :param source_type: either FILE or REPO
+        :return: None
+        """
+        if not self.get_mode() & COMP_LOADED:
+            message_to_user("No comparison loaded yet", parent=self)
+            return
+        path = self.ask_file_open() if source_type & FILE else self.ask_repository_open()
+        if not path:
+            return
+        self.logger.info(f"Loading common ancestor {path}")
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        self.treeview1.blockSignals(True)
+        if source_type & FILE:
+            load_model_from_file(path, ANCE_LOADED, self.root_item, self.status_bar, self.icons, self.logger)
+        else:
+            load_model_from_repository(path, ANCE_LOADED, self.root_item, self.status_bar, self.icons, self.logger)
+        self.treeview1.blockSignals(False)
+        self.add_mode(ANCE_LOADED)
+        self.tree_model.layoutChanged.emit()
+        self.set_ancestor_actions_enabled(True)
+        self.setWindowTitle(APPLICATION_NAME + ' Three-way Compare Mode')
+        # noinspection PyArgumentList
+        QApplication.restoreOverrideCursor()
+        both = sum(1 for code_item in self.root_item.get_code_items() if code_item.color == orange)
+        msg = f"Common ancestor loaded, {both} items changed in both models."
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
+
+    def on_export_merged(self, source_type: int):
+        """Event handler for the Export Merged menu items. Saves the three-way merge of all code items.
+        Objects with conflicting changes are saved with their base code and logged.
+
+        :param source_type: either FILE or REPO
+        :return: None
+        """
+        if not self.get_mode() & ANCE_LOADED:
+            message_to_user("No common ancestor loaded yet", parent=self)
+            return
+        path = self.ask_file_save() if source_type & FILE else self.ask_repository_save()
+        if not path:
+            return
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        self.status_bar.showMessage("Merging")
+        merged_code = self.root_item.get_merged_code()
+        if source_type & FILE:
+            files = [(path, self.root_item.get_merged_code_as_file(merged_code))]
+        else:
+            files = self.root_item.get_merged_files(merged_code, path)
+        # noinspection PyArgumentList
+        QApplication.restoreOverrideCursor()
+        conflicts = [code_item for _, merged in merged_code for code_item, status, _ in merged
+                     if status == MERGE_CONFLICT]
+        for code_item in conflicts:
+            self.logger.warning(f"Merge conflict, base code saved: {self.object_type(code_item)}:{code_item.name}")
+
+        for file_path, content in files:
+            if not file_path.parent.is_dir():
+                try:
+                    file_path.parent.mkdir(parents=True)
+                except (OSError, IOError) as error:
+                    msg = f"An error occurred during creation of folder: {file_path.parent}"
+                    error_message_box("Error", msg, str(error), parent=self)
+                    self.status_bar.showMessage("Save Error")
+                    return
+            if not self.write_file(file_path, content):
+                self.status_bar.showMessage("Save Error")
+                return
+        msg = f"Merge saved to {path} with {len(conflicts)} conflicts."
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
+        if conflicts:
+            message_to_user(f"{len(conflicts)} objects have conflicting changes, their base code is saved.\n"
+                            f"Please see log file for the list of affected items.", parent=self)
+
+    def on_switch_normalization(self):
+        """Event handler for the menu items that switch the normalization of code in comparisons.
+        In compare mode the items are recolored.
+
+        :return: None
+        """
+        code_normalizer.enabled = self.ignore_formatting_action.isChecked()
+        code_normalizer.use_sqlparse = self.sqlparse_normalization_action.isChecked()
+        self.sqlparse_normalization_action.setEnabled(code_normalizer.enabled)
+        if not self.get_mode() & COMP_LOADED:
+            return
+        # noinspection PyArgumentList
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        changed = self.root_item.update_compare_colors()
+        if self.get_mode() & ANCE_LOADED:
+            self.root_item.update_three_way_colors()
+        self.tree_model.layoutChanged.emit()
+        self.start_diff_stats()
+        # noinspection PyArgumentList
+        QApplication.restoreOverrideCursor()
+        msg = f"{changed} items changed {'ignoring' if code_normalizer.enabled else 'including'} formatting."
+        self.logger.info(msg)
+        self.status_bar.showMessage(msg)
 
     # dialogs for opening and saving
 
@@ -6042,10 +10141,10 @@ class VQLManagerWindow(QMainWindow):
                 error_message_box('Error', 'Error creating folder', str(error), parent=self)
                 return None
 
-        for file, content in self.root_item.get_selected_code_files(self.get_mode(), folder):
+        for file, _, _ in self.root_item.get_selected_code_files(self.get_mode(), folder):
             print(file)
 
-        if any([path.exists() for path, _ in self.root_item.get_selected_code_files(self.get_mode(), folder)]):
+        if any([path.exists() for path, _, _ in self.root_item.get_selected_code_files(self.get_mode(), folder)]):
             if not self.ask_overwrite():
                 return None
         self.logger.info('Got:' + str(folder))
@@ -6140,6 +10239,32 @@ class VQLManagerWindow(QMainWindow):
             error_message_box("Error", msg, str(error), parent=self)
             return False
 
+    @staticmethod
+    def is_file_unchanged(file: Path, fingerprint: str)->bool:
+        """Checks if a file already holds the code with the given fingerprint, so it does not need to be written
+
+        :param file: the path of the file
+        :param fingerprint: the fingerprint of the code to be written
+        :return: True if the file content has the same fingerprint
+        """
+        if not fingerprint or not file.is_file():
+            return False
+        try:
+            with file.open() as f:
+                return content_fingerprint(f.read().strip()) == fingerprint
+        except (OSError, IOError, UnicodeDecodeError):
+            return False
+
+    def log_dependency_cycles(self):
+        """Logs a warning for every circular dependency in the selection, these objects can not be saved
+        in an order that deploys in one pass.
+
+        :return: None
+        """
+        for cycle in self.root_item.get_dependency_cycles(self.get_mode(), selected=True):
+            cycle_string = ' -> '.join(f"{self.object_type(code_item)}:{code_item.name}" for code_item in cycle)
+            self.logger.warning(f"Circular dependency, execution order not guaranteed: {cycle_string}")
+
     def save_model_to_file(self, file: Path)->bool:
         """Saves the single .vql file.
 
@@ -6150,6 +10275,7 @@ class VQLManagerWindow(QMainWindow):
         self.logger.debug(f"Saving model to file in {file} in mode: {show_mode(self.get_mode())}")
 
         self.status_bar.showMessage("Saving")
+        self.log_dependency_cycles()
         self.treeview1.blockSignals(True)
         content = self.root_item.get_code_as_file(self.get_mode(), selected=True)
         self.treeview1.blockSignals(False)
@@ -6176,9 +10302,10 @@ class VQLManagerWindow(QMainWindow):
             self.status_bar.showMessage("Save Error")
             return False
 
+        self.log_dependency_cycles()
         self.treeview1.blockSignals(True)
 
-        for part_log_filepath, part_log_content in self.root_item.get_part_logs(folder):
+        for part_log_filepath, part_log_content in self.root_item.get_part_logs(folder, self.get_mode()):
 
             if not part_log_content or not part_log_filepath:
                 self.logger.debug(f"No content while saving {part_log_filepath} ")
@@ -6203,11 +10330,15 @@ class VQLManagerWindow(QMainWindow):
                 self.treeview1.blockSignals(False)
                 return False
 
-        for file_path, content in self.root_item.get_selected_code_files(self.get_mode(), folder):
+        skipped = 0
+        for file_path, content, fingerprint in self.root_item.get_selected_code_files(self.get_mode(), folder):
             if not content or not file_path:
                 self.status_bar.showMessage("Save Error")
                 self.logger.warning(f"Missing content or file path: {str(file_path)}")
                 continue
+            if self.is_file_unchanged(file_path, fingerprint):
+                skipped += 1
+                continue
             if not self.write_file(file_path, content):
                 self.status_bar.showMessage(f"Save Error: {file_path}")
                 self.logger.warning(f"Save of {file_path} did not succeed")
@@ -6216,7 +10347,7 @@ class VQLManagerWindow(QMainWindow):
 
         self.treeview1.blockSignals(False)
         self.status_bar.showMessage("Ready")
-        self.logger.debug("Saved OK")
+        self.logger.debug(f"Saved OK, {skipped} unchanged files skipped")
         return True
 
     def add_to_recent_files(self, file_path: Path, mode: int):
@@ -6253,10 +10384,66 @@ class VQLManagerWindow(QMainWindow):
         self.logger.debug("Path added to recent files or folders.")
 
 
+class HeadlessStatusBar:
+    """Stands in for the status bar of the main window when a model is loaded without gui"""
+
+    def showMessage(self, message: str, timeout: int=0):
+        """Ignores the progress messages of loading a model
+
+        :param message: the message
+        :param timeout: not used
+        :return: None
+        """
+        pass
+
+
+def run_query(query: str, base: Path, compare: Path=None)->int:
+    """Loads an export file or repository without gui, and optionally a compare file or repository,
+    and prints the objects matching the query of the QueryEngine. Per object a line is printed with its type,
+    name and Denodo folder separated by tabs, and its status in a compare.
+
+    :param query: the query
+    :param base: the export file or repository
+    :param compare: the export file or repository compared with, optional
+    :return: the exit code, 0 if objects are found, 1 if not and 2 on errors
+    """
+    logger = logging.getLogger(APPLICATION_NAME)
+    root_item = RootItem('Selection Pane')
+    icons = dict.fromkeys(CHAPTER_NAMES, QVariant())
+    for path, file_mode, repository_mode in ((base, BASE_FILE, BASE_REPO), (compare, COMP_FILE, COMP_REPO)):
+        if not path:
+            continue
+        try:
+            if path.is_dir():
+                content = ''.join(iter_repository_lines(path))
+                mode = repository_mode
+            else:
+                content = read_export(path, logger)
+                mode = file_mode
+        except (OSError, IOError, UnicodeDecodeError) as error:
+            print(f"Could not read {path}: {error}", file=stderr)
+            return 2
+        root_item.parse(content, mode, HeadlessStatusBar(), icons, logger)
+
+    engine = QueryEngine(root_item, GUI_COMPARE if compare else GUI_SELECT)
+    try:
+        results = engine.search(query)
+    except ValueError as error:
+        print(error, file=stderr)
+        return 2
+    for code_item in results:
+        line = [code_item.object_type(), code_item.name, engine.get_folder(code_item)]
+        if compare:
+            line.append(QueryEngine.status_name(code_item.color))
+        print('\t'.join(line))
+    return 0 if results else 1
+
+
 def main():
     """Main entry point for the application
 
-    Boilerplate python code to start and end the application and allows it to be in a module or library
+    Boilerplate python code to start and end the application and allows it to be in a module or library.
+    With the --query option the objects matching a query are printed, without starting the gui.
     :return:
     """
 
@@ -6266,6 +10453,17 @@ def main():
         message_to_user('You need at least Python version 3.6 to run this application.')
         return
 
+    parser = ArgumentParser(prog='vqlmanager', description='GUI Application for managing VQL scripts')
+    parser.add_argument('--query', help='print the objects matching the query, for example '
+                                        '\'chapter:views path:/sales dependees:0 code:/flatten/\', without gui')
+    parser.add_argument('base', nargs='?', type=Path, help='the export file or repository queried')
+    parser.add_argument('compare', nargs='?', type=Path, help='the export file or repository compared with')
+    args, _ = parser.parse_known_args(argv[1:])
+    if args.query is not None:
+        if not args.base:
+            parser.error('a query needs an export file or repository')
+        exit(run_query(args.query, args.base, args.compare))
+
     app = QApplication(argv)
     app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
     window = VQLManagerWindow()